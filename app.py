@@ -1,11 +1,16 @@
 import os
-from flask import Flask
 from dotenv import load_dotenv
-from src.main.api.shop_api import blueprint
+from src.main.common.LoggingConfig import configure_logging
+
+# Before the app imports, so LOG_LEVEL from .env also applies to import-time logging
+load_dotenv()
+configure_logging()
 
-load_dotenv()  
+from flask import Flask
+from src.main.api.shop_api import blueprint
+from src.main.service.agent_service.AgentRuntimeService import get_agent_runtime
 
-def create_app():
+def create_app(warm=True):
     """Create and configure the Flask application"""
     app = Flask(__name__)
     
@@ -14,6 +19,10 @@ def create_app():
     
     # Register blueprints
     app.register_blueprint(blueprint)
+
+    # Build the graph, bound LLMs and SQL toolkit once per worker
+    if warm:
+        get_agent_runtime().warm()
     return app
 
 if __name__ == "__main__":
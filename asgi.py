@@ -0,0 +1,17 @@
+from dotenv import load_dotenv
+from src.main.common.LoggingConfig import configure_logging
+
+# Before the app imports, so LOG_LEVEL from .env also applies to import-time logging
+load_dotenv()
+configure_logging()
+
+from starlette.applications import Starlette
+from src.main.api.shop_asgi import routes, lifespan
+
+
+def create_asgi_app():
+    """Create the ASGI application serving the agent routes on one long-lived event loop"""
+    return Starlette(routes=routes, lifespan=lifespan)
+
+
+app = create_asgi_app()
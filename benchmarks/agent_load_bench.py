@@ -0,0 +1,292 @@
+"""Offline load test of the /api/v1/Grog_Agent* routes with a stand-in LLM, fixture catalog and fake Redis.
+
+Run from the repository root; no Groq key, MySQL or Redis server is needed:
+
+    python -m benchmarks.agent_load_bench --requests 300 --concurrency 16
+    python -m benchmarks.agent_load_bench --server flask --llm-latency-ms 150 --json bench.json
+    python -m benchmarks.agent_load_bench --url http://localhost:8000 --routes Grog_Agent
+
+In-process runs (`--server asgi`, the default, or `flask`) build a SQLite
+fixture catalog, start the RESP fake Redis and swap `FakeChatModel` in through
+`LLMGateway.chat_model_factory` before the app is imported; the stage
+breakdown then comes from the span metrics of every route. Against `--url`
+nothing is faked and stages come from the `timings` of Grog_Agent responses.
+
+With `--max-p95-ms` the exit status is 1 when any route's p95 exceeds it, so
+CI can fail on orchestration regressions; `--json` writes the full report.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import functools
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+ROUTES = ("Grog_Agent", "Grog_Agent_test", "Grog_Agent_Query")
+
+QUERIES = [
+    "red dress",
+    "do you have black leather boots?",
+    "blue running sneakers",
+    "something warm, like a wool scarf",
+    "vintage denim jeans",
+    "white linen shirt for summer",
+    "green jacket",
+    "a classic necklace for my mom",
+    "oversized grey hat",
+    "pink bag",
+]
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def setup_offline(args, workdir):
+    """Fixture catalog, fake Redis and stand-in LLM; must run before the app is imported"""
+    from benchmarks.fake_redis import FakeRedisServer
+    from benchmarks.fixture_catalog import build
+
+    redis_server = FakeRedisServer().start()
+    db_path = os.path.join(workdir, "catalog.db")
+    build(f"sqlite:///{db_path}", args.products).dispose()
+    os.environ.update({
+        "db_info": f"sqlite:///{db_path}",
+        "REDIS_URL": redis_server.url,
+        "groq_api_keys": ",".join(f"offline-key-{index}" for index in range(args.llm_keys)),
+        "llm_key_rpm": str(args.llm_rpm),
+        "llm_key_tpm": str(args.llm_tpm),
+        # The limits above are this process's share
+        "web_workers": "1",
+        "schema_context_product_table": "products_synonym",
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+    })
+    if not args.with_embeddings:
+        # All three need a sentence-transformers model; keep the run hermetic
+        os.environ.setdefault("semantic_cache_enabled", "false")
+        os.environ.setdefault("intent_router_enabled", "false")
+        os.environ.setdefault("product_index_warm", "false")
+
+    from benchmarks.fake_chat_model import FakeChatModel
+    from src.main.service.agent_service.LLMGatewayService import LLMGateway
+
+    LLMGateway.chat_model_factory = functools.partial(
+        FakeChatModel, latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms,
+        tool_script=args.tool_script.split(",") if args.tool_script else [],
+    )
+    return redis_server
+
+
+def _app_client(args):
+    """(async request function, cleanup) for the configured target"""
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+        return client.post, client.aclose
+
+    from src.main.service.agent_service.AgentRuntimeService import get_agent_runtime
+
+    if args.server == "asgi":
+        from asgi import app
+        # ASGITransport does not run the lifespan, so warm the runtime the way it would
+        get_agent_runtime().warm()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=args.timeout)
+        return client.post, client.aclose
+
+    from app import create_app
+    sync_client = httpx.Client(transport=httpx.WSGITransport(app=create_app()), base_url="http://bench", timeout=args.timeout)
+    # Flask handles each request on its own thread, like gunicorn's gthread workers
+    executor = ThreadPoolExecutor(max_workers=args.concurrency)
+
+    async def post(path, json):
+        return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(sync_client.post, path, json=json))
+
+    async def close():
+        executor.shutdown()
+        sync_client.close()
+
+    return post, close
+
+
+def _body(route, index, args):
+    body = {"query": QUERIES[index % len(QUERIES)]}
+    if route == "Grog_Agent":
+        body["timings"] = True
+        if args.sql_mode:
+            body["sql_mode"] = args.sql_mode
+        if args.enrich:
+            body["enrich"] = True
+    return body
+
+
+async def _run(args, routes):
+    post, close = _app_client(args)
+    results = []
+    try:
+        for route in routes:
+            for index in range(args.warmup):
+                await post(f"/api/v1/{route}", json=_body(route, index, args))
+
+        from src.main.common.Metrics import span_seconds
+        before = span_seconds.totals()
+        counter = iter(range(args.requests))
+
+        async def user():
+            for index in counter:
+                route = routes[index % len(routes)]
+                start = time.perf_counter()
+                error = None
+                try:
+                    response = await post(f"/api/v1/{route}", json=_body(route, index, args))
+                    payload = response.json()
+                    if response.status_code != 200 or "error" in payload:
+                        error = f"HTTP {response.status_code}: {str(payload.get('error', ''))[:80]}"
+                except Exception as e:
+                    payload, error = {}, f"{e.__class__.__name__}: {str(e)[:80]}"
+                results.append((route, (time.perf_counter() - start) * 1000, error, payload))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(args.concurrency)))
+        wall = time.perf_counter() - start
+        after = span_seconds.totals()
+    finally:
+        await close()
+    return results, wall, before, after
+
+
+def _stages_from_metrics(before, after, requests):
+    stages = {}
+    for key, (count, total) in after.items():
+        previous_count, previous_total = before.get(key, (0, 0.0))
+        if count == previous_count:
+            continue
+        labels = dict(key)
+        name = ".".join([labels.pop("span"), *labels.values()])
+        stages[name] = (count - previous_count, (total - previous_total) * 1000)
+    return {name: {"count": count, "total_ms": round(ms, 1), "avg_ms": round(ms / count, 2),
+                   "ms_per_request": round(ms / requests, 2)}
+            for name, (count, ms) in sorted(stages.items(), key=lambda item: -item[1][1])}
+
+
+def _stages_from_responses(results):
+    stages, requests = {}, 0
+    for route, _, error, payload in results:
+        timings = (payload.get("response") or {}).get("timings") if not error else None
+        if not timings:
+            continue
+        requests += 1
+        for name, span in timings["spans"].items():
+            entry = stages.setdefault(name, [0, 0.0])
+            entry[0] += span["count"]
+            entry[1] += span["ms"]
+    return {name: {"count": count, "total_ms": round(ms, 1), "avg_ms": round(ms / count, 2),
+                   "ms_per_request": round(ms / requests, 2)}
+            for name, (count, ms) in sorted(stages.items(), key=lambda item: -item[1][1])}
+
+
+def _report(args, routes, results, wall, stages):
+    report = {
+        "target": args.url or args.server,
+        "requests": len(results),
+        "concurrency": args.concurrency,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(results) / wall, 2) if wall else 0.0,
+        "errors": sum(1 for _, _, error, _ in results if error),
+        "routes": {},
+        "stages": stages,
+    }
+    for route in routes:
+        latencies = [ms for name, ms, _, _ in results if name == route]
+        errors = [error for name, _, error, _ in results if name == route and error]
+        if not latencies:
+            continue
+        report["routes"][route] = {
+            "requests": len(latencies),
+            "errors": len(errors),
+            "first_error": errors[0] if errors else None,
+            "mean_ms": round(statistics.mean(latencies), 1),
+            "p50_ms": round(_percentile(latencies, 50), 1),
+            "p95_ms": round(_percentile(latencies, 95), 1),
+            "p99_ms": round(_percentile(latencies, 99), 1),
+        }
+    return report
+
+
+def _print(report):
+    print(f"{report['requests']} requests against {report['target']} at concurrency {report['concurrency']}: "
+          f"{report['throughput_rps']:.1f} req/s over {report['wall_seconds']:.2f}s, {report['errors']} errors")
+    print(f"\n{'route':<18}{'n':>6}{'err':>6}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)")
+    for route, stats in report["routes"].items():
+        print(f"{route:<18}{stats['requests']:>6}{stats['errors']:>6}{stats['mean_ms']:>10.1f}"
+              f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+        if stats["first_error"]:
+            print(f"  first error: {stats['first_error']}")
+    if report["stages"]:
+        print(f"\n{'stage':<40}{'count':>8}{'avg ms':>10}{'ms/request':>12}")
+        for name, stage in report["stages"].items():
+            print(f"{name[:40]:<40}{stage['count']:>8}{stage['avg_ms']:>10.2f}{stage['ms_per_request']:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--server", choices=("asgi", "flask"), default="asgi", help="in-process app to drive")
+    parser.add_argument("--url", help="drive a running server instead; nothing is faked")
+    parser.add_argument("--routes", default=",".join(ROUTES))
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=1, help="untimed requests per route first")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--products", type=int, default=2000, help="fixture catalog size")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--llm-keys", type=int, default=1, help="stand-in Groq keys in the gateway pool")
+    parser.add_argument("--llm-rpm", type=float, default=100_000, help="requests per minute per key")
+    parser.add_argument("--llm-tpm", type=float, default=100_000_000, help="tokens per minute per key")
+    parser.add_argument("--tool-script", default="query_database_tool",
+                        help="comma-separated tools the supervisor calls before answering")
+    parser.add_argument("--sql-mode", help="sql_mode sent to Grog_Agent")
+    parser.add_argument("--enrich", action="store_true", help="ask Grog_Agent for enriched products")
+    parser.add_argument("--with-embeddings", action="store_true", help="keep the semantic cache and intent router on")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="exit 1 if any route's p95 is above this")
+    args = parser.parse_args()
+
+    routes = [route.strip() for route in args.routes.split(",") if route.strip()]
+    unknown = set(routes) - set(ROUTES)
+    if unknown:
+        parser.error(f"unknown routes {sorted(unknown)}, expected some of {list(ROUTES)}")
+
+    with tempfile.TemporaryDirectory(prefix="agent-load-") as workdir:
+        redis_server = None if args.url else setup_offline(args, workdir)
+        try:
+            results, wall, before, after = asyncio.run(_run(args, routes))
+        finally:
+            if redis_server is not None:
+                redis_server.stop()
+        # Dispose pooled SQLite connections before the temporary catalog is removed
+        if not args.url:
+            from src.main.repository.db_connector import engine_registry
+            engine_registry.dispose_all()
+
+    stages = _stages_from_responses(results) if args.url else _stages_from_metrics(before, after, len(results))
+    report = _report(args, routes, results, wall, stages)
+    _print(report)
+    if args.json:
+        with open(args.json, "w") as handle:
+            json.dump(report, handle, indent=2)
+
+    if args.max_p95_ms is not None:
+        slow = {route: stats["p95_ms"] for route, stats in report["routes"].items() if stats["p95_ms"] > args.max_p95_ms}
+        if slow:
+            print(f"\np95 above {args.max_p95_ms} ms: {slow}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
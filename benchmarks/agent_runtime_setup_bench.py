@@ -0,0 +1,71 @@
+"""Micro-benchmark of the per-request agent setup cost before and after the shared runtime.
+
+Run from the repository root:
+
+    python -m benchmarks.agent_runtime_setup_bench --iterations 50
+
+No Groq call is made; `db_info` defaults to an in-memory sqlite database so the
+schema reflection cost is measured without a MySQL server.
+"""
+import os
+import time
+import argparse
+import statistics
+
+os.environ.setdefault("db_info", "sqlite:///:memory:")
+os.environ.setdefault("chat_assistant_api_1", "benchmark")
+os.environ.setdefault("grop_db_query_model_api_key", "benchmark")
+
+
+def _timed(func, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(label, samples):
+    print(f"{label:<48} mean {statistics.mean(samples):8.3f} ms   "
+          f"p50 {statistics.median(samples):8.3f} ms   max {max(samples):8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    from src.main.service.agent_service.AgentRuntimeService import get_agent_runtime
+    from src.main.service.agent_service.GraphService import graph_builder
+    from src.main.service.agent_service.LLMsModelService import LLMsModelService
+    from src.main.service.agent_service import AgentToolsService as tool
+
+    runtime = get_agent_runtime().warm()
+
+    def before_request():
+        # What every /api/v1/Grog_Agent request used to pay
+        graph_builder()
+        runtime.models.llm.bind_tools([tool.query_database_tool])
+
+    def after_request():
+        runtime.graph
+        runtime.models.llm_with_tools
+
+    def before_worker():
+        # ChatBotService and AgentToolsService each built their own service and reflected the schema
+        LLMsModelService()
+        LLMsModelService()
+
+    def after_worker():
+        LLMsModelService(db=runtime.db, engine=runtime.engine)
+
+    print(f"iterations: {args.iterations}")
+    _report("per request, before (graph + bind_tools)", _timed(before_request, args.iterations))
+    _report("per request, after (shared runtime)", _timed(after_request, args.iterations))
+    _report("per worker, before (2x LLMsModelService)", _timed(before_worker, args.iterations))
+    _report("per worker, after (shared SQLDatabase)", _timed(after_worker, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
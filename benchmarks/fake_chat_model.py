@@ -0,0 +1,141 @@
+"""Deterministic stand-in for ChatGroq, for offline benchmarks.
+
+Plugged in through `LLMGateway.chat_model_factory`, it answers the three
+kinds of prompt the service sends:
+
+- the supervisor (tools bound): calls the tools in `tool_script` one per turn
+  with the user's question, then answers with the last tool result as JSON;
+- the ReAct SQL agent: one `sql_db_query` action, then a `Final Answer` built
+  from the observation;
+- single-shot text-to-SQL: a fenced SELECT;
+- conversation summaries: the customer's requests, one line each.
+
+SQL filters on the fixture catalog words found in the question. Every call
+sleeps `latency_ms` plus a jitter of up to `jitter_ms` derived from the prompt,
+so runs are repeatable.
+"""
+import re
+import ast
+import json
+import time
+import zlib
+import asyncio
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from benchmarks.fixture_catalog import VOCABULARY
+
+_CONTENT = re.compile(r"""content['"]?[=:]\s*(?:'((?:[^'\\]|\\.)*)'|"((?:[^"\\]|\\.)*)")""")
+
+
+class FakeChatModel(BaseChatModel):
+    model_name: str = "fake-llama3"
+    # Accepted for call compatibility with ChatGroq(...); unused
+    api_key: Optional[Any] = None
+    max_retries: int = 0
+    temperature: float = 0.0
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    tool_script: List[str] = ["query_database_tool"]
+    product_table: str = "products_synonym"
+    max_rows: int = 1000
+    answer_rows: int = 20
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def sql_for(self, question: str, limit: bool = True) -> str:
+        words = [word for word in VOCABULARY if re.search(rf"\b{word}\b", question.lower())]
+        sql = f"SELECT p.id, p.shopify_id, p.title FROM {self.product_table} p"
+        if words:
+            sql += " WHERE " + " AND ".join(f"lower(p.title) LIKE '%{word}%'" for word in words)
+        sql += " ORDER BY p.id"
+        return f"{sql} LIMIT {self.max_rows}" if limit else sql
+
+    @staticmethod
+    def _agent_question(section: str) -> str:
+        """The user's text inside a stringified message list, e.g. "[SystemMessage(content='...'), HumanMessage(content='red dress')]" """
+        matches = _CONTENT.findall(section)
+        return (matches[-1][0] or matches[-1][1]) if matches else section
+
+    def _supervise(self, messages, tool_names):
+        last_human = max(index for index, message in enumerate(messages) if isinstance(message, HumanMessage))
+        question = messages[last_human].content
+        tool_results = [message for message in messages[last_human + 1:] if isinstance(message, ToolMessage)]
+        script = [name for name in self.tool_script if name in tool_names]
+        step = len(tool_results)
+        if step < len(script):
+            call_id = f"call_{step}_{zlib.crc32(question.encode()):08x}"
+            return AIMessage(content="", tool_calls=[{"name": script[step], "args": {"query": question}, "id": call_id}])
+
+        try:
+            output = json.loads(tool_results[-1].content) if tool_results else {}
+        except json.JSONDecodeError:
+            output = {}
+        return AIMessage(content=json.dumps({
+            "message": "Here are some products you might like!",
+            "query": output.get("query", ""),
+            "result": output.get("result", [])[:self.answer_rows],
+        }))
+
+    def _react(self, prompt):
+        section = prompt[prompt.rfind("\nQuestion: "):]
+        sql = self.sql_for(self._agent_question(section.split("\nThought:", 1)[0]))
+        if "\nObservation: " not in section:
+            return AIMessage(content=f"Thought: I should query the products.\nAction: sql_db_query\nAction Input: {sql}")
+
+        observation = section.rsplit("\nObservation: ", 1)[1].split("\nThought:", 1)[0].strip()
+        try:
+            rows = [list(row) for row in ast.literal_eval(observation)] if observation else []
+        except (ValueError, SyntaxError):
+            rows = []
+        answer = {"query": sql, "result": rows[:self.answer_rows], "message": f"Found {len(rows)} products."}
+        return AIMessage(content=f"Thought: I now know the final answer\nFinal Answer: {json.dumps(answer)}")
+
+    def _respond(self, messages, tools=None):
+        tool_names = {tool["function"]["name"] for tool in tools or []}
+        if tool_names:
+            message = self._supervise(messages, tool_names)
+        else:
+            prompt = "\n".join(str(message.content) for message in messages)
+            if "Action Input" in prompt:
+                message = self._react(prompt)
+            elif "running summary" in prompt:
+                previous = re.search(r"Current summary:\n(.*?)\n\nNew turns:", prompt, re.DOTALL)
+                requests = re.findall(r"^Customer: (.*)$", prompt, re.MULTILINE)
+                if previous and previous.group(1) != "(none)":
+                    requests.insert(0, previous.group(1).removeprefix("The customer asked for: "))
+                message = AIMessage(content="The customer asked for: " + "; ".join(requests))
+            else:
+                question = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), prompt)
+                message = AIMessage(content=f"```sql\n{self.sql_for(question, limit=False)}\n```")
+
+        prompt_chars = sum(len(str(m.content)) for m in messages)
+        output_chars = len(message.content) + len(json.dumps(message.tool_calls))
+        message.usage_metadata = {
+            "input_tokens": prompt_chars // 4,
+            "output_tokens": output_chars // 4,
+            "total_tokens": (prompt_chars + output_chars) // 4,
+        }
+        return message, prompt_chars
+
+    def _delay(self, prompt_chars):
+        return (self.latency_ms + (prompt_chars * 2654435761 % 1000) / 1000 * self.jitter_ms) / 1000
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        message, prompt_chars = self._respond(messages, kwargs.get("tools"))
+        time.sleep(self._delay(prompt_chars))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        message, prompt_chars = self._respond(messages, kwargs.get("tools"))
+        await asyncio.sleep(self._delay(prompt_chars))
+        return ChatResult(generations=[ChatGeneration(message=message)])
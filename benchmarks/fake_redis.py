@@ -0,0 +1,342 @@
+"""In-process Redis stand-in speaking RESP on a local port.
+
+The service's real redis-py clients (sync, asyncio, pipelines and pub/sub)
+connect to it unchanged through `REDIS_URL`, so the client and network cost
+stays in the measurement. Only the commands the service uses are implemented,
+with lazy key expiry; WATCH is accepted but never aborts a transaction.
+
+    server = FakeRedisServer().start()
+    os.environ["REDIS_URL"] = server.url
+"""
+import time
+import socket
+import asyncio
+import threading
+
+OK = object()
+QUEUED = object()
+
+
+class CommandError(Exception):
+    pass
+
+
+def _int(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise CommandError("value is not an integer or out of range")
+
+
+class FakeRedisStore:
+    """Keyspace shared by every connection: bytes, lists and hashes with optional expiry"""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.commands = 0
+        # channel -> {subscriber id: deliver(channel, message)}
+        self.channels = {}
+
+    def _alive(self, key):
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def _get(self, key, kind, default=None):
+        if not self._alive(key):
+            return default
+        value = self.data[key]
+        if not isinstance(value, kind):
+            raise CommandError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def execute(self, name, args):
+        self.commands += 1
+        handler = getattr(self, f"cmd_{name}", None)
+        if handler is None:
+            raise CommandError(f"unknown command '{name}'")
+        return handler(*args)
+
+    def cmd_ping(self, *args):
+        return args[0] if args else b"PONG"
+
+    def cmd_client(self, *args):
+        return OK
+
+    def cmd_select(self, index):
+        return OK
+
+    def cmd_watch(self, *keys):
+        return OK
+
+    def cmd_unwatch(self):
+        return OK
+
+    def cmd_publish(self, channel, message):
+        subscribers = list(self.channels.get(channel, {}).values())
+        for deliver in subscribers:
+            deliver(channel, message)
+        return len(subscribers)
+
+    def cmd_flushall(self, *args):
+        self.data.clear()
+        self.expires.clear()
+        return OK
+
+    def cmd_get(self, key):
+        return self._get(key, bytes)
+
+    def cmd_set(self, key, value, *options):
+        options = [option.lower() for option in options]
+        ttl = None
+        for flag, scale in ((b"ex", 1.0), (b"px", 0.001)):
+            if flag in options:
+                ttl = _int(options[options.index(flag) + 1]) * scale
+        exists = self._alive(key)
+        if (b"nx" in options and exists) or (b"xx" in options and not exists):
+            return None
+        self.data[key] = value
+        if ttl is not None:
+            self.expires[key] = time.monotonic() + ttl
+        elif b"keepttl" not in options:
+            self.expires.pop(key, None)
+        return OK
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                del self.data[key]
+                self.expires.pop(key, None)
+                removed += 1
+        return removed
+
+    def cmd_exists(self, *keys):
+        return sum(1 for key in keys if self._alive(key))
+
+    def cmd_expire(self, key, seconds):
+        if not self._alive(key):
+            return 0
+        self.expires[key] = time.monotonic() + _int(seconds)
+        return 1
+
+    def cmd_ttl(self, key):
+        if not self._alive(key):
+            return -2
+        expires_at = self.expires.get(key)
+        return -1 if expires_at is None else int(expires_at - time.monotonic())
+
+    def cmd_incrby(self, key, amount):
+        value = _int(self._get(key, bytes, b"0")) + _int(amount)
+        self.data[key] = str(value).encode()
+        return value
+
+    def cmd_incr(self, key):
+        return self.cmd_incrby(key, b"1")
+
+    def cmd_hincrby(self, key, field, amount):
+        table = self._get(key, dict)
+        if table is None:
+            table = self.data[key] = {}
+        value = _int(table.get(field, b"0")) + _int(amount)
+        table[field] = str(value).encode()
+        return value
+
+    def cmd_hset(self, key, *pairs):
+        table = self._get(key, dict)
+        if table is None:
+            table = self.data[key] = {}
+        added = 0
+        for field, value in zip(pairs[::2], pairs[1::2]):
+            added += field not in table
+            table[field] = value
+        return added
+
+    def cmd_hget(self, key, field):
+        return (self._get(key, dict) or {}).get(field)
+
+    def cmd_hgetall(self, key):
+        return [item for pair in (self._get(key, dict) or {}).items() for item in pair]
+
+    def cmd_rpush(self, key, *values):
+        items = self._get(key, list)
+        if items is None:
+            items = self.data[key] = []
+        items.extend(values)
+        return len(items)
+
+    def cmd_llen(self, key):
+        return len(self._get(key, list, []))
+
+    @staticmethod
+    def _slice(items, start, stop):
+        start, stop = _int(start), _int(stop)
+        length = len(items)
+        start = max(start + length if start < 0 else start, 0)
+        stop = stop + length if stop < 0 else min(stop, length - 1)
+        return start, stop + 1
+
+    def cmd_lrange(self, key, start, stop):
+        items = self._get(key, list, [])
+        start, end = self._slice(items, start, stop)
+        return items[start:end]
+
+    def cmd_ltrim(self, key, start, stop):
+        items = self._get(key, list)
+        if items is not None:
+            start, end = self._slice(items, start, stop)
+            items[:] = items[start:end]
+            if not items:
+                self.cmd_del(key)
+        return OK
+
+
+def _encode(value):
+    if value is OK:
+        return b"+OK\r\n"
+    if value is QUEUED:
+        return b"+QUEUED\r\n"
+    if isinstance(value, CommandError):
+        return f"-ERR {value}\r\n".encode()
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    return b"*%d\r\n" % len(value) + b"".join(_encode(item) for item in value)
+
+
+class FakeRedisServer:
+    """Serves a FakeRedisStore over TCP from an event loop in a daemon thread"""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.store = FakeRedisStore()
+        self.connections = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._writers = set()
+
+    @property
+    def url(self) -> str:
+        return f"redis://{self.host}:{self.port}/0"
+
+    async def _read_command(self, reader):
+        header = await reader.readline()
+        if not header:
+            return None
+        if not header.startswith(b"*"):
+            # Inline command (e.g. from redis-cli or telnet)
+            return header.split()
+        args = []
+        for _ in range(int(header[1:])):
+            length = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._writers.add(writer)
+        # Pipelined replies are written one by one; don't let Nagle hold them for the client's delayed ACK
+        writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        queued = None
+        subscriptions = set()
+
+        def deliver(channel, message):
+            writer.write(_encode([b"message", channel, message]))
+
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                name = args[0].decode().lower()
+                try:
+                    if name in ("subscribe", "unsubscribe"):
+                        channels = args[1:] or (sorted(subscriptions) if name == "unsubscribe" else [])
+                        for channel in channels:
+                            if name == "subscribe":
+                                subscriptions.add(channel)
+                                self.store.channels.setdefault(channel, {})[id(writer)] = deliver
+                            else:
+                                subscriptions.discard(channel)
+                                self.store.channels.get(channel, {}).pop(id(writer), None)
+                            writer.write(_encode([name.encode(), channel, len(subscriptions)]))
+                        if not channels:
+                            writer.write(_encode([name.encode(), None, 0]))
+                        await writer.drain()
+                        continue
+                    if name == "multi":
+                        queued, reply = [], OK
+                    elif name == "exec":
+                        if queued is None:
+                            raise CommandError("EXEC without MULTI")
+                        reply = []
+                        for queued_name, queued_args in queued:
+                            try:
+                                reply.append(self.store.execute(queued_name, queued_args))
+                            except CommandError as e:
+                                reply.append(e)
+                        queued = None
+                    elif name == "discard":
+                        queued, reply = None, OK
+                    elif queued is not None:
+                        queued.append((name, args[1:]))
+                        reply = QUEUED
+                    else:
+                        reply = self.store.execute(name, args[1:])
+                except CommandError as e:
+                    reply = e
+                writer.write(_encode(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in subscriptions:
+                self.store.channels.get(channel, {}).pop(id(writer), None)
+            self._writers.discard(writer)
+            writer.close()
+
+    def start(self):
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            sock = socket.create_server((self.host, self.port))
+            self._server = self._loop.run_until_complete(asyncio.start_server(self._handle, sock=sock))
+            self.port = sock.getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="fake-redis", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    async def _shutdown(self):
+        self._server.close()
+        # Closing the transports ends each connection handler at its next read
+        for writer in list(self._writers):
+            writer.close()
+        handlers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+    def stop(self):
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
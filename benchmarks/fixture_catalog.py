@@ -0,0 +1,127 @@
+"""Deterministic fixture catalog in a local SQLite database, built from the `db/convert` DDL.
+
+    python -m benchmarks.fixture_catalog --products 2000 /tmp/catalog.db
+
+The MySQL DDL is translated statement by statement (ENUM, AUTO_INCREMENT and
+ON UPDATE clauses dropped, MODIFY COLUMN skipped). The `*_synonym` views point
+at a Shopify mirror database that is not part of the DDL, so they are created
+over the local tables, with `shopify_id`/`product_type` derived from them.
+"""
+import re
+import json
+import random
+import argparse
+from pathlib import Path
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+DDL_DIR = Path(__file__).resolve().parent.parent / "db" / "convert"
+
+COLORS = ["red", "blue", "black", "white", "green", "pink", "beige", "navy", "grey", "yellow"]
+PRODUCT_TYPES = ["dress", "shirt", "jeans", "jacket", "sneakers", "boots", "hat", "scarf", "bag", "necklace"]
+STYLES = ["classic", "slim", "oversized", "vintage", "running", "leather", "summer", "winter", "linen", "wool"]
+VENDORS = ["Northwind", "Acme Apparel", "Blue Harbor", "Maison Lune", "Trailhead"]
+SIZES = ["XS", "S", "M", "L", "XL"]
+
+# Words the stand-in model recognises in questions when it writes SQL
+VOCABULARY = COLORS + PRODUCT_TYPES + STYLES
+
+VIEWS = [
+    "CREATE VIEW products_synonym AS SELECT p.*, p.id AS shopify_id, json_extract(p.type, '$') AS product_type FROM products p",
+    "CREATE VIEW variants_synonym AS SELECT * FROM variants",
+]
+
+
+def _sqlite_statement(statement: str):
+    """MySQL DDL statement translated for SQLite, or None when it has no SQLite equivalent"""
+    statement = re.sub(r"--[^\n]*", "", statement).strip()
+    if not statement or re.match(r"(?i)create\s+view", statement) or re.search(r"(?i)\bmodify\s+column\b", statement):
+        return None
+    statement = re.sub(r"(?i)\b(?:big)?int\s+auto_increment\s+primary\s+key", "INTEGER PRIMARY KEY AUTOINCREMENT", statement)
+    statement = re.sub(r"(?i)\benum\s*\([^)]*\)", "TEXT", statement)
+    statement = re.sub(r"(?i)\s+on\s+update\s+current_timestamp", "", statement)
+    return statement
+
+
+def ddl_statements(ddl_dir=DDL_DIR):
+    statements = []
+    for path in sorted(ddl_dir.glob("*.sql"), key=lambda p: int(p.name.split("-", 1)[0])):
+        for statement in path.read_text().split(";"):
+            translated = _sqlite_statement(statement)
+            if translated:
+                statements.append(translated)
+    return statements + VIEWS
+
+
+def generate(products=2000, seed=7):
+    """(product rows, variant rows) for a synthetic apparel catalog"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    product_rows, variant_rows = [], []
+    variant_id = 10_000_000
+    for product_id in range(1, products + 1):
+        color, kind, style = rng.choice(COLORS), rng.choice(PRODUCT_TYPES), rng.choice(STYLES)
+        created = start + timedelta(minutes=product_id)
+        product_rows.append({
+            "id": product_id,
+            "title": f"{style.title()} {color.title()} {kind.title()} {product_id}",
+            "description": f"<p>A {style} {color} {kind} from our {rng.choice(['spring', 'autumn', 'core'])} range.</p>",
+            "vendor": rng.choice(VENDORS),
+            "handle": f"{style}-{color}-{kind}-{product_id}",
+            "tags": ", ".join(sorted({style, color, kind})),
+            "status": "active",
+            "created_at": created,
+            "updated_at": created,
+            "image_url": f"https://cdn.example.com/products/{product_id}.jpg",
+            "type": json.dumps(kind),
+        })
+        for size in rng.sample(SIZES, rng.randint(1, 4)):
+            variant_id += 1
+            variant_rows.append({
+                "id": variant_id,
+                "product_id": product_id,
+                "title": f"{size} / {color.title()}",
+                "price": round(rng.uniform(9, 250), 2),
+                "inventory_quantity": rng.randint(0, 120),
+                "sku": f"SKU-{product_id}-{size}",
+                "created_at": created,
+                "updated_at": created,
+                "color": color,
+            })
+    return product_rows, variant_rows
+
+
+def build(url, products=2000, seed=7):
+    """Create the schema at `url` (a fresh SQLite database) and load the fixture catalog; returns the engine"""
+    engine = sa.create_engine(url)
+    product_rows, variant_rows = generate(products, seed)
+    with engine.begin() as conn:
+        for statement in ddl_statements():
+            conn.exec_driver_sql(statement)
+        metadata = sa.MetaData()
+        products_table = sa.Table("products", metadata, autoload_with=conn)
+        variants_table = sa.Table("variants", metadata, autoload_with=conn)
+        conn.execute(products_table.insert(), product_rows)
+        conn.execute(variants_table.insert(), variant_rows)
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="SQLite file to create")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if Path(args.path).exists():
+        parser.error(f"{args.path} already exists")
+    engine = build(f"sqlite:///{args.path}", args.products, args.seed)
+    with engine.connect() as conn:
+        counts = {table: conn.exec_driver_sql(f"SELECT COUNT(*) FROM {table}").scalar()
+                  for table in ("products_synonym", "variants_synonym")}
+    print(f"built {args.path}: {counts}")
+
+
+if __name__ == "__main__":
+    main()
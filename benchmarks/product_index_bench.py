@@ -0,0 +1,77 @@
+"""Recall and latency of the vector product index against the SQL agent path.
+
+Run from the repository root against a live database and Groq key:
+
+    python -m benchmarks.product_index_bench --k 20 "red dress" "running shoes for men"
+    python -m benchmarks.product_index_bench --queries-file queries.txt
+
+The SQL agent (`query_database_tool`) result is taken as the reference set;
+recall@k is the share of its product ids that the vector index also returns.
+"""
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def _run(queries, k):
+    from src.main.service.ProductIndexService import product_index
+    from src.main.service.agent_service import AgentToolsService as tool
+
+    start = time.perf_counter()
+    # warm() leaves a missing snapshot to a background build; wait for it here
+    if not await asyncio.to_thread(product_index.load):
+        await asyncio.to_thread(product_index.refresh, True)
+    print(f"index ready in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    sql_latencies, vector_latencies, recalls = [], [], []
+    for query in queries:
+        start = time.perf_counter()
+        sql_output = json.loads(await tool.query_database_tool.ainvoke({"query": query}))
+        sql_latencies.append((time.perf_counter() - start) * 1000)
+        sql_ids = {row[0] for row in sql_output.get("result", []) if row}
+
+        start = time.perf_counter()
+        vector_rows = await asyncio.to_thread(product_index.search, query, k)
+        vector_latencies.append((time.perf_counter() - start) * 1000)
+        vector_ids = {row[0] for row in vector_rows}
+
+        recall = len(sql_ids & vector_ids) / len(sql_ids) if sql_ids else None
+        if recall is not None:
+            recalls.append(recall)
+        recall_text = f"{recall:.2f}" if recall is not None else "n/a"
+        print(f"{query[:40]:<40} sql {sql_latencies[-1]:9.1f} ms ({len(sql_ids):4d})   "
+              f"vector {vector_latencies[-1]:7.2f} ms ({len(vector_ids):4d})   recall@{k} {recall_text}")
+
+    print()
+    for label, samples in (("sql agent", sql_latencies), ("vector index", vector_latencies)):
+        print(f"{label:<14} p50 {statistics.median(samples):9.2f} ms   p95 {_percentile(samples, 95):9.2f} ms")
+    if recalls:
+        print(f"mean recall@{k}: {statistics.mean(recalls):.3f} over {len(recalls)} queries with SQL results")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("queries", nargs="*")
+    parser.add_argument("--queries-file")
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+
+    queries = list(args.queries)
+    if args.queries_file:
+        with open(args.queries_file, encoding="utf-8") as handle:
+            queries.extend(line.strip() for line in handle if line.strip())
+    if not queries:
+        parser.error("no queries given")
+
+    asyncio.run(_run(queries, args.k))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Throughput of review scoring through the resident, micro-batched sentiment model.
+
+Run from the repository root (downloads the model on first run):
+
+    python -m benchmarks.sentiment_bench --texts 2000 --clients 8
+    sentiment_quantize=false python -m benchmarks.sentiment_bench --texts 2000
+
+`--clients` threads submit reviews one at a time, as concurrent request
+handlers would; the batcher merges them into batches. `--per-call` also times
+the old behaviour of building a fresh pipeline for every call.
+"""
+import time
+import random
+import argparse
+import threading
+
+REVIEWS = [
+    "Absolutely love it, fits perfectly and the color is gorgeous.",
+    "Arrived late and the stitching came apart after one wash.",
+    "It's okay for the price, nothing special.",
+    "Terrible quality, I want a refund.",
+    "Great shoes for running, very comfortable even on long runs.",
+    "The size chart is wrong, had to return it twice.",
+    "Beautiful necklace, my mom was thrilled!",
+    "Not bad, but the fabric feels cheaper than in the photos.",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--per-call", type=int, default=0, help="also time N fresh-pipeline calls")
+    args = parser.parse_args()
+
+    from src.main.service.SentimentService.SentimentService import SentimentService
+
+    service = SentimentService()
+    start = time.perf_counter()
+    service.score(REVIEWS[:1])
+    print(f"model load + first call: {(time.perf_counter() - start) * 1000:.0f} ms (quantized={SentimentService._quantized})")
+
+    texts = [random.choice(REVIEWS) for _ in range(args.texts)]
+    chunks = [texts[index::args.clients] for index in range(args.clients)]
+
+    def client(chunk):
+        for text in chunk:
+            service.batcher.submit(text).result()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(chunk,)) for chunk in chunks]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    print(f"{args.clients} clients, one text per request: {args.texts / elapsed:8.1f} texts/s")
+
+    start = time.perf_counter()
+    service.score(texts)
+    elapsed = time.perf_counter() - start
+    print(f"one bulk call of {args.texts} texts:        {args.texts / elapsed:8.1f} texts/s")
+    print(service.stats())
+
+    if args.per_call:
+        from transformers import pipeline
+        start = time.perf_counter()
+        for text in texts[:args.per_call]:
+            pipeline("sentiment-analysis", service.model_five_classes, device=-1)([text])
+        print(f"fresh pipeline per call: {args.per_call / (time.perf_counter() - start):8.2f} texts/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Local stand-in for the Shopify Admin GraphQL bulk-operation flow.
+
+Serves `bulkOperationRunQuery`, `currentBulkOperation` (RUNNING on the first
+poll, then COMPLETED) and the result URL from a canned JSONL file, so the bulk
+sync engine can be exercised without a store:
+
+    python -m benchmarks.shopify_bulk_stub --sync
+    python -m benchmarks.shopify_bulk_stub --port 8765   # serve only; point SHOP_GRAPHQL_URL at it
+"""
+import os
+import json
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_JSONL = os.path.join(os.path.dirname(__file__), "fixtures", "shopify_bulk_products.jsonl")
+
+
+class BulkStubHandler(BaseHTTPRequestHandler):
+    jsonl_path = DEFAULT_JSONL
+    polls = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        query = request.get("query", "")
+        operation_id = "gid://shopify/BulkOperation/1"
+
+        if "bulkOperationRunQuery" in query:
+            type(self).polls = 0
+            self._send_json({"data": {"bulkOperationRunQuery": {
+                "bulkOperation": {"id": operation_id, "status": "CREATED"}, "userErrors": []}}})
+        elif "currentBulkOperation" in query:
+            type(self).polls += 1
+            completed = type(self).polls > 1
+            host, port = self.server.server_address[:2]
+            self._send_json({"data": {"currentBulkOperation": {
+                "id": operation_id,
+                "status": "COMPLETED" if completed else "RUNNING",
+                "errorCode": None,
+                "objectCount": "0",
+                "url": f"http://{host}:{port}/bulk.jsonl" if completed else None,
+                "partialDataUrl": None,
+            }}})
+        else:
+            self._send_json({"errors": [{"message": "stub only implements the bulk operation flow"}]})
+
+    def do_GET(self):
+        if self.path != "/bulk.jsonl":
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/jsonl")
+        self.end_headers()
+        with open(self.jsonl_path, "rb") as handle:
+            for line in handle:
+                self.wfile.write(line)
+
+
+def start_stub_server(port=0, jsonl_path=DEFAULT_JSONL):
+    """Start the stub in a daemon thread; returns the server (its GraphQL URL is http://host:port/graphql.json)"""
+    handler = type("ConfiguredBulkStubHandler", (BulkStubHandler,), {"jsonl_path": jsonl_path, "polls": 0})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class InMemoryCatalogRepository:
+    """Collects upserts instead of writing to MySQL"""
+
+    def __init__(self):
+        self.products = {}
+        self.variants = {}
+        self.batches = 0
+        self.watermarks = {}
+
+    def upsert_products_with_variants(self, product_rows, variant_rows):
+        self.batches += 1
+        self.products.update((row["id"], row) for row in product_rows)
+        self.variants.update((row["id"], row) for row in variant_rows)
+        return True
+
+    def get_watermark(self, name):
+        return self.watermarks.get(name)
+
+    def set_watermark(self, name, watermark):
+        self.watermarks[name] = watermark
+
+
+class NoopCatalogVersion:
+    def bump(self):
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--jsonl", default=DEFAULT_JSONL)
+    parser.add_argument("--sync", action="store_true", help="run a bulk sync against the stub into memory and exit")
+    parser.add_argument("--batch-size", type=int, default=2)
+    args = parser.parse_args()
+
+    server = start_stub_server(0 if args.sync else args.port, args.jsonl)
+    url = f"http://127.0.0.1:{server.server_address[1]}/graphql.json"
+
+    if not args.sync:
+        print(f"Shopify bulk stub listening, SHOP_GRAPHQL_URL={url}")
+        threading.Event().wait()
+
+    os.environ["SHOP_GRAPHQL_URL"] = url
+    from src.main.common.ShopifyGraphQLClient import ShopifyGraphQLClient
+    from src.main.service.CatalogSyncService import CatalogSyncService
+
+    repository = InMemoryCatalogRepository()
+    service = CatalogSyncService(ShopifyGraphQLClient(), repository, NoopCatalogVersion())
+    print(service.sync_bulk(batch_size=args.batch_size, poll_interval=0.05))
+    print(f"products: {len(repository.products)}, variants: {len(repository.variants)}, DB batches: {repository.batches}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
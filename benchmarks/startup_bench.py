@@ -0,0 +1,164 @@
+"""Cold import time of the web app and per-worker memory with and without preloading.
+
+Run from the repository root (Linux; reads /proc/<pid>/smaps_rollup). No
+database, Redis or Groq access is needed; only imports are measured:
+
+    python -m benchmarks.startup_bench --runs 5 --workers 4
+    python -m benchmarks.startup_bench --module asgi --top 30
+
+Import time uses `python -X importtime` in a fresh interpreter per run. Memory
+forks `--workers` children the way gunicorn does, once with every child
+importing the app itself and once with the app preloaded in the parent (with
+and without `gc.freeze`), and reports each child's RSS, PSS and private (USS)
+memory after a full collection.
+"""
+import os
+import gc
+import sys
+import json
+import time
+import signal
+import argparse
+import importlib
+import statistics
+import subprocess
+
+MODES = ("no-preload", "preload", "preload+freeze")
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _import_profile(module):
+    """(wall ms, {module: cumulative us}) of importing `module` in a fresh interpreter"""
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    cumulative = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cumulative_us)
+    return wall_ms, cumulative
+
+
+def _smaps_rollup(pid):
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as handle:
+        for line in handle:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss_mb": fields.get("Rss", 0) / 1024,
+        "pss_mb": fields.get("Pss", 0) / 1024,
+        "uss_mb": (fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)) / 1024,
+    }
+
+
+def _load(module):
+    app_module = importlib.import_module(module)
+    if hasattr(app_module, "create_app"):
+        # Same as wsgi.py under preload: no clients or warm-up in the master
+        app_module.create_app(warm=False)
+
+
+def _measure_mode(mode, module, workers):
+    """Fork `workers` children in this (fresh) process and print their memory as one JSON line"""
+    if mode != "no-preload":
+        gc.disable()
+        _load(module)
+        if mode == "preload+freeze":
+            gc.collect()
+            gc.freeze()
+
+    ready_read, ready_write = os.pipe()
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_read)
+            gc.enable()
+            if mode == "no-preload":
+                _load(module)
+            # A worker's first full collection is what unshares pages inherited from the master
+            gc.collect()
+            os.write(ready_write, b"1")
+            while True:
+                time.sleep(60)
+        children.append(pid)
+
+    os.close(ready_write)
+    for _ in children:
+        os.read(ready_read, 1)
+    samples = [_smaps_rollup(pid) for pid in children]
+    for pid in children:
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+    print(json.dumps({"mode": mode, "parent": _smaps_rollup(os.getpid()), "workers": samples}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app", help="module the server imports (app, wsgi, asgi)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--skip-memory", action="store_true")
+    parser.add_argument("--measure-mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure_mode:
+        _measure_mode(args.measure_mode, args.module, args.workers)
+        return
+
+    walls, profiles = [], []
+    for _ in range(args.runs):
+        wall_ms, cumulative = _import_profile(args.module)
+        walls.append(wall_ms)
+        profiles.append(cumulative)
+    print(f"cold `import {args.module}` over {args.runs} runs: "
+          f"p50 {statistics.median(walls):.0f} ms, p95 {_percentile(walls, 95):.0f} ms (interpreter start included)")
+
+    slowest = sorted(
+        ((statistics.median(profile.get(name, 0) for profile in profiles), name) for name in profiles[-1]),
+        reverse=True,
+    )[:args.top]
+    for cumulative_us, name in slowest:
+        print(f"  {cumulative_us / 1000:9.1f} ms  {name}")
+    for heavy in ("torch", "transformers", "tensorflow", "numba"):
+        if heavy in profiles[-1]:
+            print(f"  WARNING: {heavy} is imported at startup")
+
+    if args.skip_memory:
+        return
+    print(f"\nper-worker memory, {args.workers} forked workers (MB):")
+    for mode in MODES:
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup_bench", "--module", args.module,
+             "--workers", str(args.workers), "--measure-mode", mode],
+            capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            print(f"  {mode:15s} failed: {completed.stderr.strip().splitlines()[-1]}")
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        workers = result["workers"]
+        print(
+            f"  {mode:15s} rss {statistics.mean(w['rss_mb'] for w in workers):7.1f}  "
+            f"pss {statistics.mean(w['pss_mb'] for w in workers):7.1f}  "
+            f"uss {statistics.mean(w['uss_mb'] for w in workers):7.1f}  "
+            f"total pss incl. master {result['parent']['pss_mb'] + sum(w['pss_mb'] for w in workers):8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
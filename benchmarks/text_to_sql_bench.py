@@ -0,0 +1,86 @@
+"""Latency of single-shot text-to-SQL against the multi-step SQL agent.
+
+Run from the repository root against a live database and Groq key:
+
+    python -m benchmarks.text_to_sql_bench "red dresses under 50" "leather boots in size 42"
+    python -m benchmarks.text_to_sql_bench --queries-file queries.txt
+
+Each query goes through `query_database_tool` once per SQL mode. Single-shot
+queries that fail validation fall back to the agent inside the tool, so their
+latency includes the fallback; the fallback count is reported separately.
+The SQL result cache is disabled so both modes hit the database.
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+os.environ["sql_cache_enabled"] = "false"
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def _timed_query(query, mode):
+    from src.main.service.agent_service import AgentToolsService as tool
+    from src.main.service.agent_service.TextToSQLService import current_sql_mode
+
+    current_sql_mode.set(mode)
+    start = time.perf_counter()
+    output = json.loads(await tool.query_database_tool.ainvoke({"query": query}))
+    return (time.perf_counter() - start) * 1000, {row[0] for row in output.get("result", []) if row}
+
+
+async def _run(queries):
+    from src.main.service.agent_service.AgentRuntimeService import get_agent_runtime
+    from src.main.service.agent_service.TextToSQLService import AGENT, SINGLE_SHOT
+
+    runtime = get_agent_runtime()
+    await asyncio.to_thread(runtime.models.schema_context.build)
+
+    latencies = {AGENT: [], SINGLE_SHOT: []}
+    overlaps = []
+    for query in queries:
+        # Each mode runs in its own task so the contextvar does not leak between them
+        agent_ms, agent_ids = await asyncio.create_task(_timed_query(query, AGENT))
+        single_ms, single_ids = await asyncio.create_task(_timed_query(query, SINGLE_SHOT))
+        latencies[AGENT].append(agent_ms)
+        latencies[SINGLE_SHOT].append(single_ms)
+        overlap = len(agent_ids & single_ids) / len(agent_ids) if agent_ids else None
+        if overlap is not None:
+            overlaps.append(overlap)
+        overlap_text = f"{overlap:.2f}" if overlap is not None else "n/a"
+        print(f"{query[:40]:<40} agent {agent_ms:9.1f} ms ({len(agent_ids):4d})   "
+              f"single-shot {single_ms:9.1f} ms ({len(single_ids):4d})   overlap {overlap_text}")
+
+    print()
+    for label, samples in latencies.items():
+        print(f"{label:<12} p50 {statistics.median(samples):9.1f} ms   p95 {_percentile(samples, 95):9.1f} ms   "
+              f"max {max(samples):9.1f} ms")
+    print(f"single-shot fallbacks to the agent: {runtime.text_to_sql.fallbacks} of {len(queries)}")
+    if overlaps:
+        print(f"mean share of agent products also returned single-shot: {statistics.mean(overlaps):.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("queries", nargs="*")
+    parser.add_argument("--queries-file")
+    args = parser.parse_args()
+
+    queries = list(args.queries)
+    if args.queries_file:
+        with open(args.queries_file, encoding="utf-8") as handle:
+            queries.extend(line.strip() for line in handle if line.strip())
+    if not queries:
+        parser.error("no queries given")
+
+    asyncio.run(_run(queries))
+
+
+if __name__ == "__main__":
+    main()
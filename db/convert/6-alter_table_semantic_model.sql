@@ -0,0 +1,5 @@
+-- BLOB caps at 64KB, too small for a serialized product embedding index
+ALTER TABLE semantic_model MODIFY COLUMN model LONGBLOB NOT NULL;
+ALTER TABLE semantic_model ADD COLUMN name VARCHAR(100) NOT NULL DEFAULT 'default';
+ALTER TABLE semantic_model ADD COLUMN watermark DATETIME NULL;
+CREATE INDEX idx_semantic_model_name ON semantic_model (name, id);
@@ -0,0 +1,5 @@
+CREATE TABLE sync_state (
+    name VARCHAR(100) PRIMARY KEY,
+    watermark DATETIME NULL,
+    last_run_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
@@ -0,0 +1,4 @@
+-- Snapshot metadata (indexed products, watermark) as a JSON document next to the serialized index
+ALTER TABLE semantic_model ADD COLUMN meta LONGTEXT NULL;
+-- Earlier product index snapshots were pickled and are never loaded again, so drop them and rebuild on warm-up
+DELETE FROM semantic_model WHERE name = 'product_index' AND meta IS NULL;
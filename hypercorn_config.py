@@ -0,0 +1,17 @@
+from src.main.repository.db_connector import web_concurrency
+
+# ASGI serving mode: hypercorn -c python:hypercorn_config asgi:app
+# Each worker runs a single event loop, so concurrency per worker is bounded by
+# in-flight LLM calls rather than by a thread count.
+workers, _ = web_concurrency()
+
+bind = ["0.0.0.0:8000"]
+
+worker_class = "asyncio"
+
+keep_alive_timeout = 120
+graceful_timeout = 30
+
+loglevel = "info"
+accesslog = "-"
+errorlog = "-"
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from contextlib import asynccontextmanager
+from src.main.service.agent_service.AgentRuntimeService import get_agent_runtime
+from src.main.common.AsyncLoopRunner import install_blocking_executor
+from src.main.common.ServerSentEvents import SSE_HEADERS
+from src.main.api.shop_handlers import JSON_ROUTES, STREAM_ROUTES, METRICS_MEDIA_TYPE, respond, open_stream, cache_stats, metrics_text
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+logger.info("Initializing Shopify agent ASGI routes")
+
+
+async def _read_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return {}
+
+
+def _json_endpoint(name, handler):
+    async def endpoint(request):
+        body, status = await respond(name, handler, await _read_json(request))
+        return JSONResponse(body, status_code=status)
+    return endpoint
+
+
+def _stream_endpoint(name, handler):
+    async def endpoint(request):
+        frames, error = open_stream(name, handler, await _read_json(request))
+        if error is not None:
+            body, status = error
+            return JSONResponse(body, status_code=status)
+        return StreamingResponse(frames, media_type="text/event-stream", headers=SSE_HEADERS)
+    return endpoint
+
+
+async def Grog_Agent_cache_stats(request):
+    return JSONResponse(cache_stats())
+
+
+async def prometheus_metrics(request):
+    return PlainTextResponse(metrics_text(), media_type=METRICS_MEDIA_TYPE)
+
+
+routes = [
+    *(Route(path, _json_endpoint(name, handler), methods=["POST"], name=name) for path, name, handler in JSON_ROUTES),
+    *(Route(path, _stream_endpoint(name, handler), methods=["POST"], name=name) for path, name, handler in STREAM_ROUTES),
+    Route("/api/v1/Grog_Agent_cache_stats", Grog_Agent_cache_stats, methods=["GET"]),
+    Route("/metrics", prometheus_metrics, methods=["GET"]),
+]
+
+
+@asynccontextmanager
+async def lifespan(app):
+    install_blocking_executor(asyncio.get_running_loop())
+    # Build the graph, bound LLMs and SQL toolkit once per worker, on the worker's own loop
+    get_agent_runtime().warm()
+    yield
@@ -0,0 +1,182 @@
+import logging
+from src.main.service.agent_service.AgentRuntimeService import get_agent_runtime
+from src.main.repository.db_connector import engine_registry
+from src.main.service.agent_service.TextToSQLService import SQL_MODES
+from src.main.service.agent_service.AgentToolsService import result_pages, single_flight
+from src.main.service.agent_service.LLMGatewayService import llm_gateway
+from src.main.service.ProductEnrichmentService import product_enrichment, parse_fields
+from src.main.common.Metrics import metrics
+from src.main.service.agent_service.Groq_Agent import agent_calling
+from src.main.service.agent_service.Groq_Agent_Query import agent_calling_query, agent_query_batch, QUERY_BATCH_MAX_ITEMS
+from src.main.service.agent_service.Groq_Agent_Service import agent_calling_service, agent_event_stream, semantic_cache, intent_router, conversation_context
+from src.main.common.ServerSentEvents import format_event
+
+# Request parsing, validation and response shaping shared by the Flask (shop_api)
+# and ASGI (shop_asgi) route modules, which only adapt them to their framework.
+
+logger = logging.getLogger(__name__)
+
+METRICS_MEDIA_TYPE = "text/plain; version=0.0.4"
+
+
+class ApiError(Exception):
+    """A client error, answered with {"error": message} and `status`"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _query(data):
+    user_prompt = data.get("query", "")
+    if not user_prompt:
+        logger.warning("Request missing required 'query' field")
+        raise ApiError("Missing query")
+    return user_prompt
+
+
+def _sql_mode(data):
+    sql_mode = data.get("sql_mode", None)
+    if sql_mode is not None and sql_mode not in SQL_MODES:
+        raise ApiError(f"Unknown sql_mode, expected one of {list(SQL_MODES)}")
+    return sql_mode
+
+
+def _enrich(data):
+    try:
+        return parse_fields(data.get("enrich"))
+    except ValueError as e:
+        raise ApiError(str(e))
+
+
+async def agent_test(data):
+    user_prompt = _query(data)
+    logger.info(f"Processing agent request with prompt: {user_prompt[:50]}...")
+    return {"response": await agent_calling(user_prompt, data.get("session_id", None))}
+
+
+async def agent_query(data):
+    user_prompt = _query(data)
+    logger.info(f"Processing query agent request with prompt: {user_prompt[:50]}...")
+    return {"response": await agent_calling_query(user_prompt)}
+
+
+async def agent(data):
+    user_prompt = _query(data)
+    sql_mode = _sql_mode(data)
+    enrich = _enrich(data)
+    logger.info(f"Processing agent request with prompt: {user_prompt[:50]}...")
+    response = await agent_calling_service(user_prompt, data.get("session_id", None), sql_mode,
+                                           bool(data.get("timings", False)), enrich)
+    return {"response": response}
+
+
+async def agent_page(data):
+    cursor = data.get("cursor", "")
+    page_size = data.get("page_size", None)
+    if not cursor:
+        logger.warning("Request missing required 'cursor' field")
+        raise ApiError("Missing cursor")
+    if not isinstance(cursor, str):
+        raise ApiError("cursor must be a string")
+    if page_size is not None and (not isinstance(page_size, int) or isinstance(page_size, bool) or page_size < 1):
+        raise ApiError("page_size must be a positive integer")
+    enrich = _enrich(data)
+
+    page = await result_pages.page(cursor, page_size)
+    if page is None:
+        raise ApiError("Unknown or expired cursor", 404)
+    return {"response": await product_enrichment.aenrich_response(page, enrich)}
+
+
+def query_batch_events(data):
+    queries = data.get("queries")
+    concurrency = data.get("concurrency", None)
+    if not isinstance(queries, list) or not queries:
+        logger.warning("Request missing required 'queries' field")
+        raise ApiError("Missing queries")
+    if not all(isinstance(query, str) and query for query in queries):
+        raise ApiError("queries must be non-empty strings")
+    if len(queries) > QUERY_BATCH_MAX_ITEMS:
+        raise ApiError(f"At most {QUERY_BATCH_MAX_ITEMS} queries per batch")
+    if concurrency is not None and (not isinstance(concurrency, int) or isinstance(concurrency, bool) or concurrency < 1):
+        raise ApiError("concurrency must be a positive integer")
+    return agent_query_batch(queries, concurrency)
+
+
+def agent_stream_events(data):
+    user_prompt = _query(data)
+    sql_mode = _sql_mode(data)
+    enrich = _enrich(data)
+    return agent_event_stream(user_prompt, data.get("session_id", None), sql_mode,
+                              timings=bool(data.get("timings", False)), enrich=enrich)
+
+
+def cache_stats():
+    return {
+        "semantic_cache": semantic_cache.stats(),
+        "sql_result_cache": get_agent_runtime().db.result_cache.stats(),
+        "intent_router": intent_router.stats(),
+        "sql_agent_steps": get_agent_runtime().models.agent_step_stats(),
+        "text_to_sql": get_agent_runtime().text_to_sql.stats(),
+        "db_pool": engine_registry.stats(),
+        "single_flight": single_flight.stats(),
+        "llm_gateway": llm_gateway.stats(),
+        "conversation_context": conversation_context.stats(),
+        "product_enrichment": product_enrichment.stats(),
+    }
+
+
+def metrics_text():
+    return metrics.render()
+
+
+def _request_data(name, data):
+    logger.info(f"Received request to /api/v1/{name} endpoint")
+    logger.debug(f"Request data: {data}")
+    return data if isinstance(data, dict) else {}
+
+
+async def respond(name, handler, data):
+    """Run a JSON endpoint handler on the parsed request body; returns (body, status)"""
+    try:
+        body = await handler(_request_data(name, data))
+        logger.info(f"Successfully processed {name} request")
+        return body, 200
+    except ApiError as e:
+        return {"error": str(e)}, e.status
+    except Exception as e:
+        logger.error(f"Error in {name} endpoint: {str(e)}", exc_info=True)
+        return {"error": str(e)}, 500
+
+
+def open_stream(name, handler, data):
+    """Validate a streaming request; returns (async generator of SSE frames, None) or (None, (error body, status))"""
+    try:
+        source = handler(_request_data(name, data))
+    except ApiError as e:
+        return None, ({"error": str(e)}, e.status)
+    return _sse_frames(name, source), None
+
+
+async def _sse_frames(name, source):
+    try:
+        async for event, payload in source:
+            yield format_event(event, payload)
+    except Exception as e:
+        logger.error(f"Error in {name} endpoint: {str(e)}", exc_info=True)
+        yield format_event("error", {"message": str(e)})
+
+
+# (path, endpoint name, handler)
+JSON_ROUTES = [
+    ("/api/v1/Grog_Agent_test", "Grog_Agent_test", agent_test),
+    ("/api/v1/Grog_Agent_Query", "Grog_Agent_Query", agent_query),
+    ("/api/v1/Grog_Agent", "Grog_Agent", agent),
+    ("/api/v1/Grog_Agent_page", "Grog_Agent_page", agent_page),
+]
+
+STREAM_ROUTES = [
+    ("/api/v1/Grog_Agent_Query_batch", "Grog_Agent_Query_batch", query_batch_events),
+    ("/api/v1/Grog_Agent_stream", "Grog_Agent_stream", agent_stream_events),
+]
@@ -0,0 +1,91 @@
+import os
+import queue
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def blocking_threads() -> int:
+    """Size of each worker's default executor, which runs every `asyncio.to_thread` call (SQL included)"""
+    return int(os.getenv("web_blocking_threads", "0")) or min(32, multiprocessing.cpu_count() + 4)
+
+
+def install_blocking_executor(loop):
+    """Give `loop` a default executor of `blocking_threads()` threads, the count the DB pool is sized from"""
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=blocking_threads(), thread_name_prefix="blocking"))
+
+
+class AsyncLoopRunner:
+    """Runs coroutines from sync code on one long-lived event loop in a daemon thread"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        install_blocking_executor(self.loop)
+        self.thread = threading.Thread(target=self._run_forever, name="async-loop-runner", daemon=True)
+        self.thread.start()
+        logger.info("Started long-lived event loop thread")
+
+    def _run_forever(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coro, timeout=None):
+        """Submit a coroutine to the shared loop and block until it finishes"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        return future.result(timeout)
+
+    def iterate(self, agen):
+        """Drive an async generator on the shared loop and yield its items to sync code as they arrive.
+
+        The generator runs to completion inside one task, so context variables
+        it sets stay visible for its whole run.
+        """
+        items = queue.Queue()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    items.put(("item", item))
+            except BaseException as e:
+                items.put(("error", e))
+                raise
+            finally:
+                items.put(("done", None))
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self.loop)
+        try:
+            while True:
+                kind, item = items.get()
+                if kind == "done":
+                    return
+                if kind == "error":
+                    raise item
+                yield item
+        finally:
+            # The consumer went away (e.g. the client disconnected); stop the generator
+            future.cancel()
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_loop_runner() -> AsyncLoopRunner:
+    """Return the process-wide loop runner, starting it on first call"""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = AsyncLoopRunner()
+    return _runner
+
+
+def reset_loop_runner():
+    """Forget a runner inherited across fork; its thread only exists in the parent"""
+    global _runner
+    with _runner_lock:
+        _runner = None
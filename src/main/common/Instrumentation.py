@@ -0,0 +1,117 @@
+import time
+import redis
+import redis.asyncio as aioredis
+from sqlalchemy import event
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.main.common.Metrics import metrics, observe_span, span
+
+llm_tokens = metrics.counter("shop_llm_tokens_total", "LLM tokens by model and kind (prompt, completion)")
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """Times every chat model call as an `llm` span and counts its prompt/completion tokens"""
+
+    # Called on the caller's task, so the request's timing breakdown is in context
+    run_inline = True
+
+    def __init__(self):
+        self._started = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._started[run_id] = (time.perf_counter(), (metadata or {}).get("ls_model_name", "unknown"))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._started[run_id] = (time.perf_counter(), (metadata or {}).get("ls_model_name", "unknown"))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return
+        start, model = started
+        observe_span("llm", time.perf_counter() - start, model=model)
+
+        usage = {}
+        generations = response.generations[0] if response.generations else []
+        message = getattr(generations[0], "message", None) if generations else None
+        if message is not None and getattr(message, "usage_metadata", None):
+            usage = {"prompt": message.usage_metadata.get("input_tokens", 0),
+                     "completion": message.usage_metadata.get("output_tokens", 0)}
+        elif response.llm_output and response.llm_output.get("token_usage"):
+            token_usage = response.llm_output["token_usage"]
+            usage = {"prompt": token_usage.get("prompt_tokens", 0),
+                     "completion": token_usage.get("completion_tokens", 0)}
+        for kind, count in usage.items():
+            if count:
+                llm_tokens.inc(count, model=model, kind=kind)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            observe_span("llm", time.perf_counter() - started[0], error=True, model=started[1])
+
+
+llm_metrics_callback = LLMMetricsCallback()
+
+
+def instrument_engine(engine):
+    """Time every statement an engine executes as a `sql` span"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("span_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["span_started"].pop()
+        observe_span("sql", time.perf_counter() - started, statement=statement.lstrip().split(None, 1)[0].upper())
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        started = context.connection.info.get("span_started") if context.connection is not None else None
+        if started:
+            observe_span("sql", time.perf_counter() - started.pop(), error=True, statement="ERROR")
+
+    return engine
+
+
+def _command(args):
+    return str(args[0]).lower() if args else "unknown"
+
+
+class InstrumentedRedis(redis.Redis):
+    """Redis client timing each command (and each pipeline as one) as a `redis` span"""
+
+    def execute_command(self, *args, **options):
+        with span("redis", command=_command(args)):
+            return super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        pipe = super().pipeline(transaction, shard_hint)
+        execute = pipe.execute
+
+        def timed_execute(raise_on_error=True):
+            with span("redis", command="pipeline"):
+                return execute(raise_on_error)
+
+        pipe.execute = timed_execute
+        return pipe
+
+
+class InstrumentedAsyncRedis(aioredis.Redis):
+    """asyncio counterpart of InstrumentedRedis"""
+
+    async def execute_command(self, *args, **options):
+        with span("redis", command=_command(args)):
+            return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        pipe = super().pipeline(transaction, shard_hint)
+        execute = pipe.execute
+
+        async def timed_execute(raise_on_error=True):
+            with span("redis", command="pipeline"):
+                return await execute(raise_on_error)
+
+        pipe.execute = timed_execute
+        return pipe
@@ -0,0 +1,14 @@
+import os
+import logging
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+def configure_logging():
+    """Configure the root logger once per process from `LOG_LEVEL` (default INFO).
+
+    Modules only create their own loggers; keeping DEBUG off in production
+    avoids formatting and writing a log line for every Redis call and SQL step.
+    """
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    logging.basicConfig(level=getattr(logging, level, logging.INFO), format=LOG_FORMAT)
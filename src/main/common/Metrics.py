@@ -0,0 +1,193 @@
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Seconds; covers sub-millisecond Redis calls up to multi-step LLM turns
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(labels: dict):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = []
+    for name, value in pairs:
+        value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts, sum, count]
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def totals(self) -> dict:
+        """{labels: (count, sum)} for every series; the benchmarks diff two snapshots"""
+        with self._lock:
+            return {key: (count, total) for key, (_, total, count) in self._series.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', repr(bound))])} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class Gauge:
+    """Gauge read at scrape time from `collect()`, which returns [(labels dict, value), ...]"""
+
+    def __init__(self, name, help, collect):
+        self.name = name
+        self.help = help
+        self.collect = collect
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for labels, value in self.collect():
+            lines.append(f"{self.name}{_format_labels(_label_key(labels))} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """In-process counters, histograms and gauges rendered in the Prometheus text format.
+
+    Every worker process keeps its own registry, so under gunicorn each scrape
+    sees the worker that served it; scrape workers individually or serve the
+    ASGI app for process-wide numbers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get_or_create(self, name, factory):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = factory()
+        return metric
+
+    def counter(self, name, help) -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, help))
+
+    def histogram(self, name, help, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(name, help, buckets))
+
+    def gauge(self, name, help, collect) -> Gauge:
+        return self._get_or_create(name, lambda: Gauge(name, help, collect))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+span_seconds = metrics.histogram("shop_span_duration_seconds", "Duration of instrumented operations by span")
+span_errors = metrics.counter("shop_span_errors_total", "Instrumented operations that raised, by span")
+
+
+class RequestTimings:
+    """Per-request breakdown of span time, returned to clients that ask for `timings`"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans = {}
+
+    def add(self, name, seconds):
+        with self._lock:
+            entry = self.spans.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def summary(self) -> dict:
+        with self._lock:
+            spans = {name: {"count": count, "ms": round(seconds * 1000, 1)} for name, (count, seconds) in self.spans.items()}
+        return {"total_ms": round((time.perf_counter() - self.started) * 1000, 1), "spans": spans}
+
+
+# Set for the duration of a request that asked for a timing breakdown; tasks and threads inherit it
+current_timings: ContextVar = ContextVar("current_timings", default=None)
+
+
+def observe_span(name, seconds, error=False, **labels):
+    """Record a finished span in the histograms and, if one is active, the request's breakdown"""
+    span_seconds.observe(seconds, span=name, **labels)
+    if error:
+        span_errors.inc(span=name, **labels)
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add(".".join([name, *map(str, labels.values())]), seconds)
+
+
+@contextmanager
+def span(name, **labels):
+    """Time the enclosed block as span `name`; works around sync and async code alike"""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        observe_span(name, time.perf_counter() - start, error, **labels)
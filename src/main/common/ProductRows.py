@@ -0,0 +1,4 @@
+def product_ids(rows):
+    """Product id of each result row: the first column of a SQL row, the `id` of a dict, or the row itself"""
+    return [row[0] if isinstance(row, (list, tuple)) and row else row.get("id") if isinstance(row, dict) else row
+            for row in rows]
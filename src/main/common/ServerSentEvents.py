@@ -0,0 +1,12 @@
+import json
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Keep reverse proxies from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+
+
+def format_event(name: str, data) -> str:
+    """Encode one server-sent event with a JSON payload"""
+    return f"event: {name}\ndata: {json.dumps(data, default=str)}\n\n"
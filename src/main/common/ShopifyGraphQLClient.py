@@ -1,26 +1,28 @@
 import os
+import json
+import time
+import asyncio
+import logging
 import requests
+from src.main.common.Metrics import span
 
-class ShopifyGraphQLClient:
-    def __init__(self):
-        self.url = os.getenv("SHOP_GRAPHQL_URL")
-        self.access_token = os.getenv("SHOP_TOKEN")
-        self.headers = {
-            "X-Shopify-Access-Token": self.access_token,
-            "Content-Type": "application/json"
-        }
-    
-    def fetch_products(self):
-      all_products = []
-      cursor = None  
-
-      while True:
-          query = f"""
-          {{
-            products(first: 50{', after: "' + cursor + '"' if cursor else ''}) {{
-              edges {{
-                cursor
-                node {{
+logger = logging.getLogger(__name__)
+
+VARIANT_FIELDS = """
+                        id
+                        title
+                        price
+                        inventoryQuantity
+                        sku
+                        createdAt
+                        updatedAt
+                        selectedOptions {
+                          name
+                          value
+                        }
+"""
+
+PRODUCT_BASE_FIELDS = """
                   id
                   title
                   bodyHtml
@@ -31,52 +33,285 @@ class ShopifyGraphQLClient:
                   createdAt
                   updatedAt
                   productType
-                  images(first: 1) {{
-                    edges {{
-                      node {{
+                  images(first: 1) {
+                    edges {
+                      node {
                         src
-                      }}
-                    }}
-                  }}
-                  variants(first: 10) {{
-                    edges {{
-                      node {{
-                        id
-                        title
-                        price
-                        inventoryQuantity
-                        sku
-                        createdAt
-                        updatedAt
-                        selectedOptions {{
-                          name
-                          value
-                        }}
-                      }}
-                    }}
-                  }}
-                }}
-              }}
-              pageInfo {{
-                hasNextPage
-                endCursor
-              }}
-            }}
-          }}
-          """
-
-          response = requests.post(self.url, json={'query': query}, headers=self.headers)
-          if response.status_code != 200:
-              response.raise_for_status()
-
-          data = response.json()
-          products = data['data']['products']
-
-          all_products.extend(products['edges'])  
-
-          if products['pageInfo']['hasNextPage']:
-              cursor = products['pageInfo']['endCursor']
-          else:
-              break  
+                      }
+                    }
+                  }
+"""
+
+# Bulk exports only: they ignore connection page sizes, so every variant is exported
+PRODUCT_FIELDS = PRODUCT_BASE_FIELDS + """
+                  variants {
+                    edges {
+                      node {
+%s
+                      }
+                    }
+                  }
+""" % VARIANT_FIELDS
+
+BULK_PRODUCTS_QUERY = """
+{
+  products%s {
+    edges {
+      node {
+%s
+      }
+    }
+  }
+}
+"""
+
+BULK_RUN_MUTATION = """
+mutation ($query: String!) {
+  bulkOperationRunQuery(query: $query) {
+    bulkOperation {
+      id
+      status
+    }
+    userErrors {
+      field
+      message
+    }
+  }
+}
+"""
+
+BULK_STATUS_QUERY = """
+{
+  currentBulkOperation {
+    id
+    status
+    errorCode
+    objectCount
+    url
+    partialDataUrl
+  }
+}
+"""
+
+# Variant connections report pageInfo so products with more variants than the
+# first page can be completed with PRODUCT_VARIANTS_QUERY
+PRODUCTS_PAGE_QUERY = """
+query ($first: Int!, $after: String, $query: String, $variantsFirst: Int!) {
+  products(first: $first, after: $after, query: $query, sortKey: UPDATED_AT) {
+    edges {
+      cursor
+      node {
+%s
+                  variants(first: $variantsFirst) {
+                    edges {
+                      node {
+%s
+                      }
+                    }
+                    pageInfo {
+                      hasNextPage
+                      endCursor
+                    }
+                  }
+      }
+    }
+    pageInfo {
+      hasNextPage
+      endCursor
+    }
+  }
+}
+""" % (PRODUCT_BASE_FIELDS, VARIANT_FIELDS)
+
+PRODUCT_VARIANTS_QUERY = """
+query ($id: ID!, $first: Int!, $after: String) {
+  product(id: $id) {
+    variants(first: $first, after: $after) {
+      edges {
+        node {
+%s
+        }
+      }
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+    }
+  }
+}
+""" % VARIANT_FIELDS
+
+
+class ShopifyGraphQLClient:
+    def __init__(self):
+        self.url = os.getenv("SHOP_GRAPHQL_URL")
+        self.access_token = os.getenv("SHOP_TOKEN")
+        self.headers = {
+            "X-Shopify-Access-Token": self.access_token,
+            "Content-Type": "application/json"
+        }
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+
+    def execute(self, query, variables=None):
+        with span("shopify_request"):
+            response = self.session.post(self.url, json={'query': query, 'variables': variables or {}}, timeout=60)
+        if response.status_code != 200:
+            response.raise_for_status()
+        data = response.json()
+        if data.get("errors"):
+            raise RuntimeError(f"Shopify GraphQL errors: {data['errors']}")
+        return data
+
+    def _complete_variants(self, node):
+        """Page through the rest of a product's variants when the first page was not all of them"""
+        connection = node["variants"]
+        while connection["pageInfo"]["hasNextPage"]:
+            data = self.execute(
+                PRODUCT_VARIANTS_QUERY,
+                {"id": node["id"], "first": 100, "after": connection["pageInfo"]["endCursor"]},
+            )
+            page = data["data"]["product"]["variants"]
+            connection["edges"].extend(page["edges"])
+            connection["pageInfo"] = page["pageInfo"]
+
+    def iter_product_pages(self, updated_since=None, page_size=50, variants_first=10):
+        """Yield product edges page by page, optionally only those updated since a datetime; every variant is included"""
+        search = f"updated_at:>='{updated_since.strftime('%Y-%m-%dT%H:%M:%SZ')}'" if updated_since else None
+        cursor = None
+
+        while True:
+            data = self.execute(PRODUCTS_PAGE_QUERY, {"first": page_size, "after": cursor, "query": search,
+                                                      "variantsFirst": variants_first})
+            products = data['data']['products']
+            logger.debug(f"Fetched page of {len(products['edges'])} products")
+            for edge in products['edges']:
+                self._complete_variants(edge['node'])
+
+            yield products['edges']
+
+            if products['pageInfo']['hasNextPage']:
+                cursor = products['pageInfo']['endCursor']
+            else:
+                break
+
+    def start_bulk_product_export(self, updated_since=None):
+        """Start a bulk operation exporting products with their variants and first image"""
+        search = ""
+        if updated_since:
+            since = updated_since.strftime('%Y-%m-%dT%H:%M:%SZ')
+            search = f'(query: "updated_at:>=\'{since}\'")'
+        data = self.execute(BULK_RUN_MUTATION, {"query": BULK_PRODUCTS_QUERY % (search, PRODUCT_FIELDS)})
+        result = data['data']['bulkOperationRunQuery']
+        if result['userErrors']:
+            raise RuntimeError(f"Bulk operation rejected: {result['userErrors']}")
+        logger.info(f"Started bulk operation {result['bulkOperation']['id']}")
+        return result['bulkOperation']
+
+    def wait_for_bulk_operation(self, poll_interval=2.0, timeout=3600):
+        """Poll the current bulk operation until it finishes; returns its final status"""
+        deadline = time.monotonic() + timeout
+        while True:
+            operation = self.execute(BULK_STATUS_QUERY)['data']['currentBulkOperation']
+            logger.debug(f"Bulk operation {operation['id']}: {operation['status']} ({operation.get('objectCount')} objects)")
+            if operation['status'] == "COMPLETED":
+                return operation
+            if operation['status'] in ("FAILED", "CANCELED", "EXPIRED"):
+                raise RuntimeError(f"Bulk operation {operation['id']} {operation['status']}: {operation.get('errorCode')}")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Bulk operation {operation['id']} still {operation['status']} after {timeout}s")
+            time.sleep(poll_interval)
+
+    def iter_bulk_results(self, url):
+        """Stream-download a bulk operation JSONL result, yielding one parsed object per line"""
+        if not url:
+            return
+        # The result URL is pre-signed storage, not the Admin API: no auth headers
+        with requests.get(url, stream=True, timeout=300) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def fetch_products(self):
+      all_products = []
+      for edges in self.iter_product_pages():
+          all_products.extend(edges)
 
       return {"data": {"products": {"edges": all_products}}}
+
+
+class AsyncShopifyGraphQLClient:
+    """Concurrent, cost-aware product reader on top of ShopifyGraphQLTransport.
+
+    Page size adapts to the observed per-product query cost so each page stays
+    within a share of the throttle bucket, and products with more variants than
+    the first page are completed by concurrent nested pagination.
+    """
+
+    def __init__(self, transport=None, variants_first=10, min_page_size=5, max_page_size=250):
+        from src.main.common.ShopifyGraphQLTransport import ShopifyGraphQLTransport
+
+        self.transport = transport or ShopifyGraphQLTransport()
+        self.variants_first = variants_first
+        self.min_page_size = min_page_size
+        self.max_page_size = max_page_size
+        self.page_cost_share = float(os.getenv("shopify_page_cost_share", "0.5"))
+        self.nested_pages = 0
+
+    async def close(self):
+        await self.transport.close()
+
+    def _adapt_page_size(self, page_size, cost):
+        requested = cost.get("requestedQueryCost")
+        if not requested or not page_size:
+            return page_size, requested
+        per_product = float(requested) / page_size
+        target = self.transport.bucket.maximum_available * self.page_cost_share
+        adapted = int(max(self.min_page_size, min(self.max_page_size, target // max(per_product, 1.0))))
+        if adapted != page_size:
+            logger.debug(f"Adapting page size {page_size} -> {adapted} ({per_product:.1f} cost per product)")
+        return adapted, per_product
+
+    async def _complete_variants(self, node):
+        connection = node["variants"]
+        while connection["pageInfo"]["hasNextPage"]:
+            data, _ = await self.transport.execute(
+                PRODUCT_VARIANTS_QUERY,
+                {"id": node["id"], "first": 100, "after": connection["pageInfo"]["endCursor"]},
+                estimated_cost=102,
+            )
+            page = data["data"]["product"]["variants"]
+            connection["edges"].extend(page["edges"])
+            connection["pageInfo"] = page["pageInfo"]
+            self.nested_pages += 1
+
+    async def aiter_product_pages(self, updated_since=None, page_size=50):
+        """Yield lists of complete product nodes page by page"""
+        search = f"updated_at:>='{updated_since.strftime('%Y-%m-%dT%H:%M:%SZ')}'" if updated_since else None
+        cursor = None
+        per_product = None
+
+        while True:
+            estimated = page_size * per_product if per_product else page_size * (self.variants_first + 3)
+            data, cost = await self.transport.execute(
+                PRODUCTS_PAGE_QUERY,
+                {"first": page_size, "after": cursor, "query": search, "variantsFirst": self.variants_first},
+                estimated_cost=estimated,
+            )
+            products = data['data']['products']
+            nodes = [edge["node"] for edge in products["edges"]]
+
+            truncated = [node for node in nodes if node["variants"]["pageInfo"]["hasNextPage"]]
+            if truncated:
+                await asyncio.gather(*(self._complete_variants(node) for node in truncated))
+
+            yield nodes
+
+            if not products['pageInfo']['hasNextPage']:
+                break
+            cursor = products['pageInfo']['endCursor']
+            page_size, per_product = self._adapt_page_size(page_size, cost)
+
+    def stats(self) -> dict:
+        return dict(self.transport.stats(), nested_variant_pages=self.nested_pages)
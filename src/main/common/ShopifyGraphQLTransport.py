@@ -0,0 +1,191 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import httpx
+from src.main.common.Metrics import span
+
+logger = logging.getLogger(__name__)
+
+
+class ThrottledError(Exception):
+    pass
+
+
+class CostBucket:
+    """Client-side mirror of Shopify's leaky-bucket query-cost throttle.
+
+    Seeded from and corrected by `extensions.cost.throttleStatus` on every
+    response, so requests wait locally instead of being rejected.
+    """
+
+    def __init__(self, maximum_available=1000.0, restore_rate=50.0):
+        self.maximum_available = maximum_available
+        self.restore_rate = restore_rate
+        self.currently_available = maximum_available
+        self.in_flight = 0.0
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.currently_available = min(
+            self.maximum_available,
+            self.currently_available + (now - self.updated_at) * self.restore_rate,
+        )
+        self.updated_at = now
+
+    async def acquire(self, cost) -> float:
+        """Reserve `cost` points, sleeping until they are restored; returns seconds waited"""
+        cost = min(cost, self.maximum_available)
+        waited = 0.0
+        async with self._lock:
+            self._refill()
+            deficit = cost - self.currently_available
+            if deficit > 0:
+                delay = deficit / self.restore_rate
+                await asyncio.sleep(delay)
+                waited = delay
+                self._refill()
+            self.currently_available -= cost
+            self.in_flight += cost
+        return waited
+
+    def settle(self, reserved, throttle_status=None, actual=None):
+        """Release a reservation and resync with the server's view of the bucket.
+
+        The server value does not yet include requests still in flight, so their
+        reservations stay deducted. Without a throttle status, over-reserved
+        points (reserved - actual) are refunded.
+        """
+        reserved = min(reserved, self.maximum_available)
+        self.in_flight = max(self.in_flight - reserved, 0.0)
+        if throttle_status:
+            self.maximum_available = float(throttle_status.get("maximumAvailable", self.maximum_available))
+            self.restore_rate = float(throttle_status.get("restoreRate", self.restore_rate))
+            server_available = float(throttle_status.get("currentlyAvailable", self.currently_available))
+            self.currently_available = server_available - self.in_flight
+            self.updated_at = time.monotonic()
+        elif actual is not None:
+            self.currently_available = min(self.maximum_available, self.currently_available + max(reserved - actual, 0.0))
+
+
+class ShopifyGraphQLTransport:
+    """Pooled async HTTP transport for the Admin GraphQL API with cost-aware throttling and retry"""
+
+    def __init__(self, url=None, access_token=None, max_connections=None, max_retries=5):
+        self.url = url or os.getenv("SHOP_GRAPHQL_URL")
+        self.access_token = access_token or os.getenv("SHOP_TOKEN")
+        self.max_retries = max_retries
+        max_connections = max_connections or int(os.getenv("shopify_max_connections", "8"))
+        self.client = httpx.AsyncClient(
+            headers={"X-Shopify-Access-Token": self.access_token or "", "Content-Type": "application/json"},
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(60.0),
+        )
+        self.bucket = CostBucket()
+        self.requests = 0
+        self.retries = 0
+        self.throttled_responses = 0
+        self.error_responses = 0
+        self.cost_consumed = 0.0
+        self.throttled_seconds = 0.0
+        self.error_backoff_seconds = 0.0
+        self.started_at = time.monotonic()
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @staticmethod
+    def _is_throttled(data):
+        return any(
+            (error.get("extensions") or {}).get("code") == "THROTTLED"
+            for error in data.get("errors") or []
+        )
+
+    async def execute(self, query, variables=None, estimated_cost=100):
+        """Run one GraphQL request; returns (data, cost extension).
+
+        When retries run out, raises ThrottledError if the last attempt was
+        throttled (THROTTLED or HTTP 429), otherwise the last transport or
+        HTTP error.
+        """
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            self.throttled_seconds += await self.bucket.acquire(estimated_cost)
+            self.requests += 1
+            try:
+                with span("shopify_request"):
+                    response = await self.client.post(self.url, json={"query": query, "variables": variables or {}})
+            except httpx.TransportError as e:
+                self.bucket.settle(estimated_cost, actual=0.0)
+                last_error = e
+                await self._backoff(f"transport error ({e.__class__.__name__})", min(30.0, 2 ** attempt), throttled=False)
+                continue
+
+            if response.status_code == 429 or response.status_code >= 500:
+                self.bucket.settle(estimated_cost)
+                throttled = response.status_code == 429
+                last_error = None if throttled else httpx.HTTPStatusError(
+                    f"Shopify returned HTTP {response.status_code}", request=response.request, response=response
+                )
+                delay = float(response.headers.get("Retry-After", 0)) or min(30.0, 2 ** attempt) * (0.5 + random.random())
+                await self._backoff(f"HTTP {response.status_code}", delay, throttled)
+                continue
+            if response.status_code != 200:
+                self.bucket.settle(estimated_cost, actual=0.0)
+                response.raise_for_status()
+
+            data = response.json()
+            cost = (data.get("extensions") or {}).get("cost") or {}
+            throttle_status = cost.get("throttleStatus")
+
+            if self._is_throttled(data):
+                self.bucket.settle(estimated_cost, throttle_status)
+                requested = float(cost.get("requestedQueryCost", estimated_cost))
+                deficit = requested - self.bucket.currently_available
+                delay = max(deficit / self.bucket.restore_rate, 0.5) if deficit > 0 else 0.5
+                last_error = None
+                await self._backoff("THROTTLED", delay, throttled=True)
+                continue
+
+            actual = float(cost.get("actualQueryCost") or cost.get("requestedQueryCost") or estimated_cost)
+            self.cost_consumed += actual
+            self.bucket.settle(estimated_cost, throttle_status, actual)
+            if data.get("errors"):
+                raise RuntimeError(f"Shopify GraphQL errors: {data['errors']}")
+            return data, cost
+
+        if last_error is not None:
+            raise last_error
+        raise ThrottledError(f"Shopify request still throttled after {self.max_retries} retries")
+
+    async def _backoff(self, reason, delay, throttled):
+        self.retries += 1
+        if throttled:
+            self.throttled_responses += 1
+            self.throttled_seconds += delay
+        else:
+            self.error_responses += 1
+            self.error_backoff_seconds += delay
+        logger.warning(f"Shopify request {reason}, backing off {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled_responses": self.throttled_responses,
+            "error_responses": self.error_responses,
+            "cost_consumed": round(self.cost_consumed, 1),
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "error_backoff_seconds": round(self.error_backoff_seconds, 3),
+            "wall_seconds": round(time.monotonic() - self.started_at, 3),
+        }
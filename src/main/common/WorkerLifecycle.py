@@ -0,0 +1,37 @@
+import gc
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def preload_enabled() -> bool:
+    """Whether the app is imported once in the gunicorn master and forked into workers"""
+    return os.getenv("web_preload", "true").lower() == "true"
+
+
+def freeze_shared_state():
+    """Move everything the master has imported into the permanent GC generation.
+
+    Called right before forking: a collection in a worker would otherwise touch
+    the refcounts/GC headers of every inherited object and unshare their pages.
+    """
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Froze {gc.get_freeze_count()} objects before forking workers")
+
+
+def prepare_worker():
+    """Per-worker setup after fork: drop inherited connections, then build clients and warm the agent"""
+    from src.main.repository.db_connector import engine_registry
+    from src.main.common.AsyncLoopRunner import reset_loop_runner
+    from src.main.service.agent_service.AgentRuntimeService import get_agent_runtime
+
+    start = time.perf_counter()
+    # Sockets and threads must not be shared with the master or sibling workers
+    engine_registry.dispose_all()
+    reset_loop_runner()
+    gc.enable()
+    get_agent_runtime().warm()
+    logger.info(f"Worker {os.getpid()} ready in {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -2,38 +2,172 @@ from src.main.repository.db_connector import DBConnection
 import sqlalchemy as sa
 from sqlalchemy import Table, MetaData
 from sqlalchemy.exc import SQLAlchemyError
+import threading
 import logging
 
 
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Reflected tables are shared by every repository instance in the process
+_metadata = MetaData()
+_metadata_lock = threading.Lock()
+
+
+def _table(name, engine):
+    """Reflect a table once per process and reuse it afterwards"""
+    table = _metadata.tables.get(name)
+    if table is None:
+        with _metadata_lock:
+            table = _metadata.tables.get(name)
+            if table is None:
+                table = Table(name, _metadata, autoload_with=engine)
+    return table
+
 
 class ProductRepository:
     def __init__(self):
         self.db_connection = DBConnection()
         self.engine = self.db_connection.get_engine()
-        self.metadata = MetaData()
-        self.metadata.reflect(bind=self.engine)
+        self.metadata = _metadata
+
+    @property
+    def products(self):
+        return _table('products_synonym', self.engine)
+
+    @property
+    def variants(self):
+        return _table('variants_synonym', self.engine)
+
+    @property
+    def catalog_products(self):
+        return _table('products', self.engine)
+
+    @property
+    def catalog_variants(self):
+        return _table('variants', self.engine)
+
+    def _products_with_variants_query(self, since=None):
+        products, variants = self.products, self.variants
+        query = (
+            sa.select(products, *[column.label(f"variant_{column.name}") for column in variants.c])
+            .outerjoin(variants, products.c.id == variants.c.product_id)
+            .order_by(products.c.id)
+        )
+        if since is not None:
+            # Inclusive, like the catalog sync watermark: rows written later with the same timestamp are still picked up
+            changed = sa.union(
+                sa.select(products.c.id).where(products.c.updated_at >= since),
+                sa.select(variants.c.product_id).where(variants.c.updated_at >= since),
+            ).subquery()
+            query = query.where(products.c.id.in_(sa.select(changed.c[0])))
+        return query
+
+    def iter_products_with_variants(self, batch_size=500, since=None):
+        """Stream (product row, variant rows) pairs over a server-side cursor, `batch_size` rows per fetch.
+
+        Rows come ordered by product id, so each product's variants are
+        consecutive and only one product is buffered at a time. Variant columns
+        are prefixed with `variant_`; `since` limits the walk to products
+        touched at or after that timestamp.
+        """
+        query = self._products_with_variants_query(since)
+        with self.engine.connect() as conn:
+            result = conn.execution_options(yield_per=batch_size).execute(query).mappings()
+            product_id, variant_rows = None, []
+            for row in result:
+                if row["id"] != product_id and variant_rows:
+                    yield variant_rows[0], variant_rows
+                    variant_rows = []
+                product_id = row["id"]
+                variant_rows.append(dict(row))
+            if variant_rows:
+                yield variant_rows[0], variant_rows
+
+    def iter_product_batches(self, batch_size=500, since=None):
+        """Group the product stream into lists of up to `batch_size` (product row, variant rows) pairs"""
+        batch = []
+        for item in self.iter_products_with_variants(batch_size, since):
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
 
     def call_all_products_with_variants(self):
         try:
+            query = sa.select(self.products, self.variants).join(
+                self.variants, self.products.c.id == self.variants.c.product_id
+            )
             with self.engine.connect() as conn:
-                products = Table('products_synonym', self.metadata, autoload_with=self.engine)
-                variants = Table('variants_synonym', self.metadata, autoload_with=self.engine)
-                query = (
-                    sa.select(products, variants)
-                    .join(variants, products.c.id == variants.c.product_id)
-                )
-                result = conn.execute(query)
-                return result.mappings()  # Return a Result object with mappings
+                # Materialize before the connection is returned to the pool
+                return conn.execute(query).mappings().all()
         except SQLAlchemyError as e:
             logging.error(f"Error fetching products with variants: {e}")
             return []
 
+    def call_products_with_variants_updated_since(self, since=None):
+        """Rows of every product (with all its variants) touched at or after `since`; all products when None"""
+        try:
+            with self.engine.connect() as conn:
+                return conn.execute(self._products_with_variants_query(since)).mappings().all()
+        except SQLAlchemyError as e:
+            logging.error(f"Error fetching products updated since {since}: {e}")
+            return []
+
+    def get_product_ids(self):
+        """Ids of every product currently in the catalog, or None when they cannot be read"""
+        try:
+            with self.engine.connect() as conn:
+                return {row[0] for row in conn.execute(sa.select(self.products.c.id))}
+        except SQLAlchemyError as e:
+            logging.error(f"Error fetching product ids: {e}")
+            return None
+
+    def get_updated_at(self, product_ids):
+        """{product id: (product updated_at, latest variant updated_at)} for the given catalog products"""
+        if not product_ids:
+            return {}
+        products, variants = self.catalog_products, self.catalog_variants
+        query = (
+            sa.select(products.c.id, products.c.updated_at, sa.func.max(variants.c.updated_at))
+            .outerjoin(variants, products.c.id == variants.c.product_id)
+            .where(products.c.id.in_(product_ids))
+            .group_by(products.c.id, products.c.updated_at)
+        )
+        try:
+            with self.engine.connect() as conn:
+                return {row[0]: (row[1], row[2]) for row in conn.execute(query)}
+        except SQLAlchemyError as e:
+            logging.error(f"Error reading updated_at for {len(product_ids)} products: {e}")
+            return {}
+
+    def get_products_with_variants(self, product_ids):
+        """Rows of the given catalog products joined with their variants, in one query; variant columns are prefixed with `variant_`"""
+        if not product_ids:
+            return []
+        products, variants = self.catalog_products, self.catalog_variants
+        query = (
+            sa.select(
+                products.c.id, products.c.title, products.c.handle, products.c.vendor, products.c.status,
+                products.c.image_url, products.c.updated_at,
+                *[variants.c[name].label(f"variant_{name}") for name in
+                  ("id", "title", "price", "inventory_quantity", "sku", "color", "updated_at")],
+            )
+            .outerjoin(variants, products.c.id == variants.c.product_id)
+            .where(products.c.id.in_(product_ids))
+            .order_by(products.c.id, variants.c.id)
+        )
+        try:
+            with self.engine.connect() as conn:
+                return conn.execute(query).mappings().all()
+        except SQLAlchemyError as e:
+            logging.error(f"Error fetching {len(product_ids)} products for enrichment: {e}")
+            return []
+
     def call_distinct_product_type(self):
         try:
-            products = Table("product_synonym", self.metadata, autoload_with=self.engine)
-            query = sa.select(products.c.product_type).distinct()
+            query = sa.select(self.products.c.product_type).distinct()
             with self.engine.connect() as conn:
                 result = conn.execute(query)
                 return result.fetchall()
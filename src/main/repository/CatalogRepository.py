@@ -0,0 +1,55 @@
+from src.main.repository.db_connector import DBConnection
+import sqlalchemy as sa
+from sqlalchemy import Table, MetaData
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.exc import SQLAlchemyError
+import logging
+
+
+
+
+class CatalogRepository:
+    def __init__(self):
+        self.db_connection = DBConnection()
+        self.engine = self.db_connection.get_engine()
+        self.metadata = MetaData()
+        self.products = Table('products', self.metadata, autoload_with=self.engine)
+        self.variants = Table('variants', self.metadata, autoload_with=self.engine)
+        self.sync_state = Table('sync_state', self.metadata, autoload_with=self.engine)
+
+    def _upsert(self, conn, table, rows):
+        if not rows:
+            return
+        statement = insert(table).values(rows)
+        update_columns = {
+            column.name: statement.inserted[column.name]
+            for column in table.columns
+            if column.name in rows[0] and not column.primary_key
+        }
+        conn.execute(statement.on_duplicate_key_update(**update_columns))
+
+    def upsert_products_with_variants(self, product_rows, variant_rows):
+        """Bulk upsert one batch of products and their variants in a single transaction"""
+        try:
+            with self.engine.begin() as conn:
+                self._upsert(conn, self.products, product_rows)
+                self._upsert(conn, self.variants, variant_rows)
+            return True
+        except SQLAlchemyError as e:
+            logging.error(f"Error upserting {len(product_rows)} products: {e}")
+            raise
+
+    def get_watermark(self, name):
+        try:
+            with self.engine.connect() as conn:
+                return conn.execute(
+                    sa.select(self.sync_state.c.watermark).where(self.sync_state.c.name == name)
+                ).scalar()
+        except SQLAlchemyError as e:
+            logging.error(f"Error reading sync watermark {name}: {e}")
+            return None
+
+    def set_watermark(self, name, watermark):
+        with self.engine.begin() as conn:
+            statement = insert(self.sync_state).values(name=name, watermark=watermark)
+            conn.execute(statement.on_duplicate_key_update(watermark=statement.inserted.watermark))
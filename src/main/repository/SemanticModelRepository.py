@@ -0,0 +1,44 @@
+from src.main.repository.db_connector import DBConnection
+import sqlalchemy as sa
+from sqlalchemy.exc import SQLAlchemyError
+import logging
+
+
+
+
+class SemanticModelRepository:
+    def __init__(self):
+        self.db_connection = DBConnection()
+        self.engine = self.db_connection.get_engine()
+
+    def save_model(self, name, model_blob, watermark=None, meta=None):
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(
+                    sa.text("INSERT INTO semantic_model (name, model, watermark, meta) "
+                            "VALUES (:name, :model, :watermark, :meta)"),
+                    {"name": name, "model": model_blob, "watermark": watermark, "meta": meta},
+                )
+                # Keep only the latest snapshot per name
+                conn.execute(
+                    sa.text("DELETE FROM semantic_model WHERE name = :name AND id < "
+                            "(SELECT max_id FROM (SELECT MAX(id) AS max_id FROM semantic_model WHERE name = :name) AS latest)"),
+                    {"name": name},
+                )
+            return True
+        except SQLAlchemyError as e:
+            logging.error(f"Error saving semantic model {name}: {e}")
+            return False
+
+    def load_latest_model(self, name):
+        """(model blob, meta document, watermark) of the latest snapshot, or Nones"""
+        try:
+            with self.engine.connect() as conn:
+                row = conn.execute(
+                    sa.text("SELECT model, meta, watermark FROM semantic_model WHERE name = :name ORDER BY id DESC LIMIT 1"),
+                    {"name": name},
+                ).first()
+                return (row.model, row.meta, row.watermark) if row else (None, None, None)
+        except SQLAlchemyError as e:
+            logging.error(f"Error loading semantic model {name}: {e}")
+            return None, None, None
@@ -0,0 +1,231 @@
+import json
+import time
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from src.main.common.ShopifyGraphQLClient import ShopifyGraphQLClient
+from src.main.repository.CatalogRepository import CatalogRepository
+from src.main.service.CatalogVersionService import CatalogVersionService
+
+logger = logging.getLogger(__name__)
+
+
+def gid_to_id(gid):
+    """gid://shopify/Product/123 -> 123"""
+    return int(str(gid).rsplit("/", 1)[-1])
+
+
+def parse_timestamp(value):
+    """Shopify ISO-8601 timestamp -> naive UTC datetime for DATETIME columns"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def product_to_rows(node):
+    """Map one GraphQL product node to a products row and its variants rows"""
+    product_id = gid_to_id(node["id"])
+    images = node.get("images", {}).get("edges", [])
+    tags = node.get("tags") or []
+    product = {
+        "id": product_id,
+        "title": node.get("title"),
+        "description": node.get("bodyHtml"),
+        "vendor": node.get("vendor"),
+        "handle": node.get("handle"),
+        "tags": (", ".join(tags) if isinstance(tags, list) else tags)[:255],
+        "status": (node.get("status") or "active").lower(),
+        "created_at": parse_timestamp(node.get("createdAt")),
+        "updated_at": parse_timestamp(node.get("updatedAt")),
+        "image_url": images[0]["node"]["src"] if images else None,
+        "type": json.dumps(node.get("productType") or ""),
+    }
+
+    variants = []
+    for edge in node.get("variants", {}).get("edges", []):
+        variant = edge["node"]
+        options = {option["name"].lower(): option["value"] for option in variant.get("selectedOptions") or []}
+        variants.append({
+            "id": gid_to_id(variant["id"]),
+            "product_id": product_id,
+            "title": variant.get("title"),
+            "price": variant.get("price") or 0,
+            "inventory_quantity": variant.get("inventoryQuantity") or 0,
+            "sku": variant.get("sku"),
+            "created_at": parse_timestamp(variant.get("createdAt")),
+            "updated_at": parse_timestamp(variant.get("updatedAt")),
+            "color": options.get("color"),
+        })
+    return product, variants
+
+
+def assemble_bulk_products(objects):
+    """Re-associate bulk JSONL child rows (variants, images) with their parent product.
+
+    Bulk results list each parent before its children, so a product is complete
+    as soon as the next product line arrives; yields nodes shaped like the
+    paginated GraphQL product nodes.
+    """
+    current = None
+    for obj in objects:
+        parent_id = obj.pop("__parentId", None)
+        if parent_id is None:
+            if current is not None:
+                yield current
+            current = dict(obj, images={"edges": []}, variants={"edges": []})
+        elif current is not None and parent_id == current["id"]:
+            key = "variants" if "/ProductVariant/" in str(obj.get("id", "")) else "images"
+            current[key]["edges"].append({"node": obj})
+        else:
+            logger.warning(f"Bulk row for {parent_id} arrived outside its parent product; skipped")
+    if current is not None:
+        yield current
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class CatalogSyncService:
+    """Streams the Shopify catalog into the products/variants tables.
+
+    Only products updated since the stored `updated_at` watermark are fetched,
+    so memory is bounded by one batch and re-syncs of a mostly unchanged
+    catalog touch only the changed products. `sync` pages through the
+    GraphQL API, `async_sync` does the same over the pooled cost-aware async
+    transport, and `sync_bulk` uses a bulk operation export for large stores.
+    """
+
+    watermark_name = "shopify_products"
+
+    def __init__(self, client=None, repository=None, catalog_version=None):
+        self.client = client or ShopifyGraphQLClient()
+        self.repository = repository or CatalogRepository()
+        self.catalog_version = catalog_version or CatalogVersionService()
+
+    def write_batch(self, nodes):
+        product_rows, variant_rows = [], []
+        for node in nodes:
+            product, variants = product_to_rows(node)
+            product_rows.append(product)
+            variant_rows.extend(variants)
+        self.repository.upsert_products_with_variants(product_rows, variant_rows)
+        return product_rows
+
+    def _record(self, totals, rows, watermark):
+        totals["pages"] += 1
+        totals["products"] += len(rows)
+        # The >= watermark filter re-fetches the boundary products; only newer ones count as changes
+        totals["changed"] += sum(1 for row in rows if watermark is None or (row["updated_at"] and row["updated_at"] > watermark))
+        page_max = max((row["updated_at"] for row in rows if row["updated_at"]), default=None)
+        if page_max is not None and (totals["watermark"] is None or page_max > totals["watermark"]):
+            totals["watermark"] = page_max
+
+    def _finish(self, totals, start, mode):
+        """Advance the watermark and catalog version if anything changed"""
+        if totals["changed"]:
+            # Rows without updated_at leave no watermark; the next sync then starts from the old one
+            if totals["watermark"] is not None:
+                self.repository.set_watermark(self.watermark_name, totals["watermark"])
+            self.catalog_version.bump()
+
+        totals["seconds"] = round(time.perf_counter() - start, 3)
+        logger.info(f"Catalog {mode} sync finished: {totals['products']} products ({totals['changed']} changed) "
+                    f"in {totals['pages']} batches, {totals['seconds']:.2f}s")
+        return totals
+
+    def _consume(self, batches, watermark, start, mode):
+        """Write node batches in order, then finish the run"""
+        totals = {"pages": 0, "products": 0, "changed": 0, "watermark": watermark}
+        for nodes in batches:
+            if nodes:
+                self._record(totals, self.write_batch(nodes), watermark)
+        return self._finish(totals, start, mode)
+
+    def sync(self, full=False, page_size=50):
+        """Run one paginated sync; returns counts and timings"""
+        start = time.perf_counter()
+        watermark = None if full else self.repository.get_watermark(self.watermark_name)
+        logger.info(f"Starting catalog sync (watermark: {watermark})")
+
+        pages = (
+            [edge["node"] for edge in edges]
+            for edges in self.client.iter_product_pages(updated_since=watermark, page_size=page_size)
+        )
+        return self._consume(pages, watermark, start, "paginated")
+
+    def sync_bulk(self, full=False, batch_size=250, poll_interval=2.0):
+        """Run one bulk-operation sync, streaming the JSONL export into the DB in batches"""
+        start = time.perf_counter()
+        watermark = None if full else self.repository.get_watermark(self.watermark_name)
+        logger.info(f"Starting bulk catalog sync (watermark: {watermark})")
+
+        self.client.start_bulk_product_export(updated_since=watermark)
+        operation = self.client.wait_for_bulk_operation(poll_interval=poll_interval)
+        products = assemble_bulk_products(self.client.iter_bulk_results(operation.get("url")))
+        return self._consume(batched(products, batch_size), watermark, start, "bulk")
+
+    async def async_sync(self, full=False, page_size=50, client=None):
+        """Paginated sync over the pooled, cost-aware async transport.
+
+        Each page's DB write runs in a worker thread while the next page is
+        fetched; the result includes request count, query cost consumed and
+        time spent throttled.
+        """
+        from src.main.common.ShopifyGraphQLClient import AsyncShopifyGraphQLClient
+
+        start = time.perf_counter()
+        watermark = None if full else await asyncio.to_thread(self.repository.get_watermark, self.watermark_name)
+        logger.info(f"Starting async catalog sync (watermark: {watermark})")
+
+        client = client or AsyncShopifyGraphQLClient()
+        totals = {"pages": 0, "products": 0, "changed": 0, "watermark": watermark}
+        pending = None
+        try:
+            async for nodes in client.aiter_product_pages(updated_since=watermark, page_size=page_size):
+                if pending is not None:
+                    self._record(totals, await pending, watermark)
+                    pending = None
+                if nodes:
+                    pending = asyncio.ensure_future(asyncio.to_thread(self.write_batch, nodes))
+            if pending is not None:
+                self._record(totals, await pending, watermark)
+        finally:
+            await client.close()
+
+        totals = await asyncio.to_thread(self._finish, totals, start, "async")
+        totals["transport"] = client.stats()
+        logger.info(f"Shopify transport: {totals['transport']}")
+        return totals
+
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+    from src.main.common.LoggingConfig import configure_logging
+
+    load_dotenv()
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Sync the Shopify catalog into the products/variants tables")
+    parser.add_argument("--full", action="store_true", help="ignore the watermark and re-download everything")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--bulk", action="store_true", help="use a bulk operation export instead of pagination")
+    parser.add_argument("--batch-size", type=int, default=250, help="DB write batch size in bulk mode")
+    parser.add_argument("--async-transport", action="store_true", help="paginate over the pooled cost-aware async transport")
+    args = parser.parse_args()
+    service = CatalogSyncService()
+    if args.async_transport:
+        print(asyncio.run(service.async_sync(full=args.full, page_size=args.page_size)))
+    elif args.bulk:
+        print(service.sync_bulk(full=args.full, batch_size=args.batch_size))
+    else:
+        print(service.sync(full=args.full, page_size=args.page_size))
@@ -0,0 +1,48 @@
+import os
+import logging
+from src.main.common.Instrumentation import InstrumentedRedis, InstrumentedAsyncRedis
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogVersionService:
+    """Shared catalog version stamp; a catalog sync bumps it to invalidate derived caches"""
+
+    key = "catalog:version"
+
+    def __init__(self):
+        self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+        self._client = None
+        self._async_client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = InstrumentedRedis.from_url(self.redis_url, decode_responses=True)
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            self._async_client = InstrumentedAsyncRedis.from_url(self.redis_url, decode_responses=True)
+        return self._async_client
+
+    def get_version(self) -> int:
+        try:
+            return int(self.client.get(self.key) or 0)
+        except Exception as e:
+            logger.error(f"Catalog version read error: {str(e)}", exc_info=True)
+            return 0
+
+    async def aget_version(self) -> int:
+        try:
+            return int(await self.async_client.get(self.key) or 0)
+        except Exception as e:
+            logger.error(f"Catalog version read error: {str(e)}", exc_info=True)
+            return 0
+
+    def bump(self) -> int:
+        """Advance the catalog version after the products/variants tables change"""
+        version = self.client.incr(self.key)
+        logger.info(f"Catalog version bumped to {version}")
+        return version
@@ -0,0 +1,41 @@
+import os
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingService:
+    """Process-wide sentence-transformers encoder, loaded on first use"""
+
+    _model = None
+    _model_lock = threading.Lock()
+
+    def __init__(self):
+        self.model_name = os.getenv("embedding_model", "sentence-transformers/all-MiniLM-L6-v2")
+
+    @property
+    def model(self):
+        if EmbeddingService._model is None:
+            with EmbeddingService._model_lock:
+                if EmbeddingService._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    logger.info(f"Loading embedding model: {self.model_name}")
+                    EmbeddingService._model = SentenceTransformer(self.model_name, device="cpu")
+        return EmbeddingService._model
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size=64) -> np.ndarray:
+        """Encode texts into L2-normalized float32 vectors (inner product == cosine)"""
+        vectors = self.model.encode(
+            list(texts),
+            batch_size=batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return np.ascontiguousarray(vectors, dtype=np.float32)
@@ -1,11 +1,8 @@
 import gc
-import torch 
-import tensorflow as tf  
-from numba import cuda  
+import sys
 import logging
 from typing import List, Tuple
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class GarbageCollectorServicec:
     def __init__(self,*data:Tuple):
@@ -14,16 +11,21 @@ class GarbageCollectorServicec:
     def garbage_collecting(self):
         del self.data
         gc.collect()  
-        if torch.cuda.is_available():  
+        # Only release frameworks the process already loaded; importing them here would cost more than the GC
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():  
             torch.cuda.empty_cache()
             torch.cuda.ipc_collect()
 
-        if tf.config.list_physical_devices('GPU'):  
+        tf = sys.modules.get("tensorflow")
+        if tf is not None and tf.config.list_physical_devices('GPU'):  
             tf.keras.backend.clear_session()
 
-        try:
-            cuda.select_device(0)  
-            cuda.close()
-        except Exception as e:
-            logging.debug(f"an error has raised: {e}")
+        if "numba" in sys.modules:
+            try:
+                from numba import cuda
+                cuda.select_device(0)  
+                cuda.close()
+            except Exception as e:
+                logging.debug(f"an error has raised: {e}")
             
\ No newline at end of file
@@ -0,0 +1,214 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from decimal import Decimal
+from collections import OrderedDict
+
+from src.main.repository.AgentRepository import ProductRepository
+from src.main.common.Metrics import span
+from src.main.common.ProductRows import product_ids
+
+logger = logging.getLogger(__name__)
+
+# Fields a client can ask for; `id` is always included
+ENRICH_FIELDS = ("title", "handle", "vendor", "status", "image", "price", "inventory", "variants")
+
+# Response keys each field adds to a product
+_FIELD_KEYS = {
+    "title": ("title",),
+    "handle": ("handle",),
+    "vendor": ("vendor",),
+    "status": ("status",),
+    "image": ("image_url",),
+    "price": ("price", "price_max"),
+    "inventory": ("inventory", "available"),
+    "variants": ("variants",),
+}
+
+
+def parse_fields(value):
+    """Requested enrichment fields: True for all of them, a list for some; None when not requested"""
+    if value is None or value is False:
+        return None
+    if value is True:
+        return ENRICH_FIELDS
+    if isinstance(value, str):
+        value = [field.strip() for field in value.split(",") if field.strip()]
+    if not isinstance(value, (list, tuple)) or not value:
+        raise ValueError(f"enrich must be true or a list of fields from {list(ENRICH_FIELDS)}")
+    unknown = sorted(set(value) - set(ENRICH_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown enrich fields {unknown}, expected some of {list(ENRICH_FIELDS)}")
+    return tuple(value)
+
+
+def _number(value):
+    return float(value) if isinstance(value, Decimal) else value
+
+
+def _latest(*stamps):
+    return max((stamp for stamp in stamps if stamp is not None), default=None)
+
+
+class ProductEnrichmentService:
+    """Resolves the product ids in an agent response to display data in one batched query.
+
+    Records (image, price range, inventory, variants) are cached per product
+    id together with the product's freshness stamp, the later of its own and
+    its variants' `updated_at`. Entries checked within
+    `enrichment_revalidate_seconds` are served as they are; older ones are
+    revalidated with one stamp query for all of them, and only products that
+    changed or were never cached are fetched, again in a single query.
+    """
+
+    def __init__(self, repository=None):
+        self.enabled = os.getenv("product_enrichment_enabled", "true").lower() == "true"
+        self.max_entries = int(os.getenv("enrichment_cache_max_entries", "20000"))
+        self.revalidate_seconds = float(os.getenv("enrichment_revalidate_seconds", "10"))
+        self.max_ids = int(os.getenv("enrichment_max_ids", "200"))
+        self._repository = repository
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # product id -> (stamp, record, checked_at)
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.queries = 0
+
+    @property
+    def repository(self):
+        if self._repository is None:
+            self._repository = ProductRepository()
+        return self._repository
+
+    @staticmethod
+    def _records(rows):
+        """{product id: (stamp, record)} from product rows joined with their variants"""
+        records = {}
+        for row in rows:
+            entry = records.get(row["id"])
+            if entry is None:
+                record = {
+                    "id": row["id"],
+                    "title": row["title"],
+                    "handle": row["handle"],
+                    "vendor": row["vendor"],
+                    "status": row["status"],
+                    "image_url": row["image_url"],
+                    "variants": [],
+                }
+                entry = records[row["id"]] = [row["updated_at"], record]
+            if row["variant_id"] is None:
+                continue
+            entry[1]["variants"].append({
+                "id": row["variant_id"],
+                "title": row["variant_title"],
+                "price": _number(row["variant_price"]),
+                "inventory_quantity": row["variant_inventory_quantity"],
+                "sku": row["variant_sku"],
+                "color": row["variant_color"],
+            })
+            entry[0] = _latest(entry[0], row["variant_updated_at"])
+
+        for _, record in records.values():
+            prices = [variant["price"] for variant in record["variants"] if variant["price"] is not None]
+            record["price"] = min(prices) if prices else None
+            record["price_max"] = max(prices) if prices else None
+            record["inventory"] = sum(variant["inventory_quantity"] or 0 for variant in record["variants"])
+            record["available"] = record["inventory"] > 0
+        return {product_id: (stamp, record) for product_id, (stamp, record) in records.items()}
+
+    def _store(self, product_id, stamp, record, now):
+        self._entries[product_id] = (stamp, record, now)
+        self._entries.move_to_end(product_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def enrich(self, product_ids, fields=ENRICH_FIELDS):
+        """Display data for `product_ids`, in their order; unknown ids are left out"""
+        ids = []
+        for product_id in product_ids:
+            try:
+                product_id = int(product_id)
+            except (TypeError, ValueError):
+                continue
+            if product_id not in ids:
+                ids.append(product_id)
+        ids = ids[:self.max_ids]
+        if not ids:
+            return []
+
+        now = time.monotonic()
+        records, stale = {}, {}
+        with self._lock:
+            for product_id in ids:
+                entry = self._entries.get(product_id)
+                if entry is None:
+                    continue
+                if now - entry[2] <= self.revalidate_seconds:
+                    records[product_id] = entry[1]
+                    self._entries.move_to_end(product_id)
+                else:
+                    stale[product_id] = entry
+        self.hits += len(records)
+
+        if stale:
+            self.queries += 1
+            stamps = self.repository.get_updated_at(list(stale))
+            with self._lock:
+                for product_id, (stamp, record, _) in stale.items():
+                    current = stamps.get(product_id)
+                    if current is not None and _latest(*current) == stamp:
+                        records[product_id] = record
+                        self._store(product_id, stamp, record, now)
+                        self.revalidated += 1
+
+        missing = [product_id for product_id in ids if product_id not in records]
+        if missing:
+            self.queries += 1
+            self.misses += len(missing)
+            fetched = self._records(self.repository.get_products_with_variants(missing))
+            with self._lock:
+                for product_id in missing:
+                    if product_id in fetched:
+                        stamp, record = fetched[product_id]
+                        records[product_id] = record
+                        self._store(product_id, stamp, record, now)
+                    else:
+                        # Deleted from the catalog
+                        self._entries.pop(product_id, None)
+
+        keys = ["id"] + [key for field in fields for key in _FIELD_KEYS[field]]
+        return [{key: records[product_id][key] for key in keys} for product_id in ids if product_id in records]
+
+    async def aenrich_response(self, response: dict, fields):
+        """Copy of `response` with `products`, the requested fields for every row in its `result`.
+
+        Timed as the `enrichment` span. The response itself may be shared
+        (semantic cache, coalesced turns), so it is never modified.
+        """
+        if not fields or not self.enabled:
+            return response
+        rows = response.get("result") or []
+        with span("enrichment"):
+            try:
+                products = await asyncio.to_thread(self.enrich, product_ids(rows), fields)
+            except Exception as e:
+                logger.error(f"Product enrichment failed: {str(e)}", exc_info=True)
+                products = []
+        return {**response, "products": products}
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.revalidated + self.misses
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.revalidated) / lookups, 4) if lookups else 0.0,
+            "queries": self.queries,
+            "size": len(self._entries),
+        }
+
+
+product_enrichment = ProductEnrichmentService()
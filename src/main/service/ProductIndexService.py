@@ -0,0 +1,300 @@
+import os
+import re
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime
+
+import numpy as np
+import orjson
+
+from src.main.service.EmbeddingService import EmbeddingService
+from src.main.common.Instrumentation import InstrumentedRedis
+
+logger = logging.getLogger(__name__)
+
+
+class ProductIndexService:
+    """Embedding index over the catalog for fast semantic product retrieval.
+
+    Documents are built from product title, description, tags, product type and
+    variant options read from the products_synonym/variants_synonym views. The
+    faiss index is persisted in the semantic_model table and refreshed
+    incrementally from the `updated_at` watermark. Workers load the snapshot
+    at warm time; when there is none, the one worker holding a Redis build
+    lock embeds the catalog in the background and saves it while the others
+    retry the load. Refreshes run in a background thread, one at a time,
+    while searches keep serving the current snapshot, and the refreshed
+    snapshot is saved by at most one worker per refresh interval.
+    """
+
+    model_name = "product_index"
+    build_lock_key = "product_index:build"
+    save_lock_key = "product_index:save"
+
+    def __init__(self):
+        self.refresh_interval = int(os.getenv("product_index_refresh_interval", "300"))
+        self.batch_size = int(os.getenv("product_index_batch_size", "256"))
+        self.warm_enabled = os.getenv("product_index_warm", "true").lower() == "true"
+        # How long a builder may take before another worker takes over, and how often waiting workers retry the load
+        self.build_lock_seconds = int(os.getenv("product_index_build_lock_seconds", "1800"))
+        self.retry_seconds = float(os.getenv("product_index_retry_seconds", "10"))
+        self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+        self._redis = None
+        self.embedding = EmbeddingService()
+        self._lock = threading.Lock()
+        # Held for a whole refresh; other callers skip instead of re-embedding the same rows
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread = None
+        self._index = None
+        self._products = {}  # product id -> (shopify_id, title)
+        self._watermark = None
+        self._last_refresh = 0.0
+        self._product_repository = None
+        self._model_repository = None
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            self._redis = InstrumentedRedis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+
+    @property
+    def product_repository(self):
+        if self._product_repository is None:
+            from src.main.repository.AgentRepository import ProductRepository
+            self._product_repository = ProductRepository()
+        return self._product_repository
+
+    @property
+    def model_repository(self):
+        if self._model_repository is None:
+            from src.main.repository.SemanticModelRepository import SemanticModelRepository
+            self._model_repository = SemanticModelRepository()
+        return self._model_repository
+
+    @staticmethod
+    def _document(product, variant_rows) -> str:
+        parts = [
+            product.get("title"),
+            re.sub(r"<[^>]+>", " ", product.get("description") or product.get("body_html") or ""),
+            product.get("tags"),
+            product.get("product_type"),
+        ]
+        options = set()
+        for row in variant_rows:
+            for key in ("variant_title", "variant_color", "variant_option1", "variant_option2", "variant_option3"):
+                value = row.get(key)
+                if value and value != "Default Title":
+                    options.add(str(value))
+        parts.extend(sorted(options))
+        return " | ".join(str(part) for part in parts if part)
+
+    def _new_index(self, dimension):
+        import faiss
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+
+    def load(self) -> bool:
+        """Restore the latest persisted index snapshot: serialized faiss index plus a JSON document"""
+        import faiss
+        blob, meta, _ = self.model_repository.load_latest_model(self.model_name)
+        if not blob or not meta:
+            return False
+        document = orjson.loads(meta)
+        index = faiss.deserialize_index(np.frombuffer(blob, dtype=np.uint8))
+        products = {int(product_id): (shopify_id, title) for product_id, shopify_id, title in document["products"]}
+        watermark = datetime.fromisoformat(document["watermark"]) if document.get("watermark") else None
+        with self._lock:
+            self._index = index
+            self._products = products
+            self._watermark = watermark
+        logger.info(f"Loaded product index with {len(self._products)} products (watermark {self._watermark})")
+        return True
+
+    def save(self):
+        import faiss
+        with self._lock:
+            blob = faiss.serialize_index(self._index).tobytes()
+            document = {
+                "products": [[product_id, shopify_id, title] for product_id, (shopify_id, title) in self._products.items()],
+                "watermark": self._watermark.isoformat() if self._watermark else None,
+            }
+        self.model_repository.save_model(self.model_name, blob, self._watermark, orjson.dumps(document).decode())
+
+    def _claim(self, key, seconds):
+        """Token for a cross-worker lock on `key` held for up to `seconds`, or None while another worker holds it"""
+        token = uuid.uuid4().hex
+        try:
+            if not self.redis.set(key, token, nx=True, ex=seconds):
+                return None
+        except Exception as e:
+            # Without Redis every worker works on its own copy, as a single worker would
+            logger.warning(f"Product index lock {key} unavailable, proceeding alone: {str(e)}")
+        return token
+
+    def _release(self, key, token):
+        try:
+            with self.redis.pipeline(transaction=True) as pipe:
+                # Only while still ours; it may have expired and been taken over
+                pipe.watch(key)
+                if pipe.get(key) == token:
+                    pipe.multi()
+                    pipe.delete(key)
+                    pipe.execute()
+        except Exception as e:
+            logger.debug(f"Product index lock {key} release error: {str(e)}")
+
+    def refresh(self, full=False) -> int:
+        """Re-embed products changed since the watermark, streamed in batches; returns the number of products indexed.
+
+        Returns 0 straight away when another refresh is already running.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            logger.debug("Product index refresh already running, skipping")
+            return 0
+        try:
+            return self._refresh(full)
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh(self, full):
+        full = full or self._index is None
+        since = None if full else self._watermark
+        self._last_refresh = time.time()
+
+        # A full rebuild fills a fresh index and swaps it in once complete
+        index, products = None, {}
+        watermark = self._watermark
+        count = 0
+        for batch in self.product_repository.iter_product_batches(self.batch_size, since):
+            ids = np.asarray([product["id"] for product, _ in batch], dtype=np.int64)
+            vectors = self.embedding.encode([self._document(product, variant_rows) for product, variant_rows in batch])
+            entries = {int(product["id"]): (product.get("shopify_id"), product.get("title")) for product, _ in batch}
+            for _, variant_rows in batch:
+                for row in variant_rows:
+                    for key in ("updated_at", "variant_updated_at"):
+                        if row.get(key) is not None and (watermark is None or row[key] > watermark):
+                            watermark = row[key]
+
+            if full:
+                if index is None:
+                    index = self._new_index(vectors.shape[1])
+                index.add_with_ids(vectors, ids)
+                products.update(entries)
+            else:
+                with self._lock:
+                    self._index.remove_ids(ids)
+                    self._index.add_with_ids(vectors, ids)
+                    self._products.update(entries)
+            count += len(batch)
+
+        removed = [] if full else self._remove_deleted()
+        if not count and not removed:
+            return 0
+        with self._lock:
+            if full:
+                self._index, self._products = index, products
+            self._watermark = watermark
+
+        # Every worker refreshes its own copy; one of them persists it per interval
+        if full or self._claim(self.save_lock_key, self.refresh_interval):
+            self.save()
+        logger.info(f"Product index refreshed: {count} products embedded, {len(removed)} removed, watermark {watermark}")
+        return count
+
+    def _remove_deleted(self):
+        """Drop products that are no longer in the catalog; an incremental walk never sees them"""
+        current = self.product_repository.get_product_ids()
+        if current is None:
+            return []
+        with self._lock:
+            removed = [product_id for product_id in self._products if product_id not in current]
+            if removed:
+                self._index.remove_ids(np.asarray(removed, dtype=np.int64))
+                for product_id in removed:
+                    del self._products[product_id]
+        return removed
+
+    def warm(self):
+        """Load the persisted index ahead of the first search; never embeds the catalog in the caller.
+
+        Runs in every worker after fork, so when nothing is persisted yet the
+        build is left to the background, where a single worker does it.
+        """
+        if not self.warm_enabled or self._index is not None:
+            return
+        start = time.perf_counter()
+        try:
+            if self.load():
+                self._last_refresh = time.time()
+                logger.info(f"Product index warmed in {(time.perf_counter() - start) * 1000:.1f} ms")
+                return
+        except Exception as e:
+            logger.warning(f"Product index load failed: {str(e)}")
+        logger.info("No product index snapshot yet, building it in the background")
+        self.refresh_in_background()
+
+    def _build(self):
+        """Load the snapshot, or build and save it if no other worker is already doing so"""
+        if self.load():
+            self._last_refresh = time.time()
+            return
+        token = self._claim(self.build_lock_key, self.build_lock_seconds)
+        if token is None:
+            logger.info(f"Product index is being built by another worker, retrying the load in {self.retry_seconds:g}s")
+            return
+        try:
+            self.refresh(full=True)
+        finally:
+            self._release(self.build_lock_key, token)
+
+    def _background_refresh(self):
+        try:
+            if self._index is None:
+                self._build()
+            else:
+                self.refresh()
+        except Exception as e:
+            logger.error(f"Background product index refresh failed: {str(e)}", exc_info=True)
+
+    def refresh_in_background(self) -> bool:
+        """Start a refresh thread unless one is already running"""
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return False
+            # Claimed up front so concurrent searches do not start threads of their own
+            self._last_refresh = time.time()
+            self._refresh_thread = threading.Thread(target=self._background_refresh, name="product-index-refresh",
+                                                    daemon=True)
+            self._refresh_thread.start()
+        return True
+
+    def ensure_ready(self):
+        """Schedule a background refresh when the index is older than the refresh interval, or a load/build retry
+        while it is missing; never blocks"""
+        interval = self.retry_seconds if self._index is None else self.refresh_interval
+        if time.time() - self._last_refresh > interval:
+            self.refresh_in_background()
+
+    def search(self, query: str, k: int = 20):
+        """Return the top-k products as [id, shopify_id, title] from the current snapshot"""
+        self.ensure_ready()
+        if self._index is None:
+            # Still being built; the supervisor falls back to the SQL tool
+            return []
+        vector = self.embedding.encode([query])
+        with self._lock:
+            if self._index is None or self._index.ntotal == 0:
+                return []
+            scores, ids = self._index.search(vector, min(k, self._index.ntotal))
+            results = []
+            for product_id in ids[0]:
+                if product_id < 0 or int(product_id) not in self._products:
+                    continue
+                shopify_id, title = self._products[int(product_id)]
+                results.append([int(product_id), shopify_id, title])
+            return results
+
+
+product_index = ProductIndexService()
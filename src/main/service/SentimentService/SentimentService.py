@@ -1,24 +1,177 @@
-from transformers import pipeline
-from src.main.service.GarbageCollectorServicec import GarbageCollectorServicec
-import torch
+import os
+import time
+import queue
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class SentimentBatcher:
+    """Micro-batching queue in front of the resident sentiment model.
+
+    Texts submitted from any thread are collected by one worker thread into
+    batches of up to `max_batch_size`, waiting at most `max_wait_ms` after the
+    first text for the batch to fill, and scored in a single forward pass.
+    """
+
+    def __init__(self, predict, max_batch_size=32, max_wait_ms=10.0):
+        self.predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.batch_ms_total = 0.0
+        self.batch_ms_max = 0.0
+        self.queue_ms_total = 0.0
+        self._recent_batch_ms = deque(maxlen=512)
+        self._thread = threading.Thread(target=self._run, name="sentiment-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                # Callers that gave up (e.g. a cancelled `ascore`) are dropped; the rest can no longer be cancelled
+                batch = [item for item in self._collect() if item[1].set_running_or_notify_cancel()]
+                if batch:
+                    self._score(batch)
+            except Exception as e:
+                # Nothing may stop the worker: every later submit would wait forever
+                logger.error(f"Sentiment batch of {len(batch)} failed: {str(e)}", exc_info=True)
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _score(self, batch):
+        start = time.perf_counter()
+        results = self.predict([text for text, _, _ in batch])
+        elapsed = (time.perf_counter() - start) * 1000
+        for (_, future, _), result in zip(batch, results, strict=True):
+            future.set_result(result)
+        with self._stats_lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.batch_ms_total += elapsed
+            self.batch_ms_max = max(self.batch_ms_max, elapsed)
+            self.queue_ms_total += sum((start - queued) * 1000 for _, _, queued in batch)
+            self._recent_batch_ms.append(elapsed)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            recent = sorted(self._recent_batch_ms)
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "batch_avg_ms": round(self.batch_ms_total / self.batches, 2) if self.batches else 0.0,
+                "batch_p95_ms": round(recent[int(0.95 * (len(recent) - 1))], 2) if recent else 0.0,
+                "batch_max_ms": round(self.batch_ms_max, 2),
+                "queue_avg_ms": round(self.queue_ms_total / self.items, 2) if self.items else 0.0,
+                "texts_per_second": round(self.items / (self.batch_ms_total / 1000), 1) if self.batch_ms_total else 0.0,
+            }
+
+
 class SentimentService:
+    """5-class review sentiment with a process-wide resident model behind a micro-batching queue.
+
+    The model is loaded on first use and, on CPU with `sentiment_quantize`
+    enabled, dynamically quantized to int8 Linear layers.
+    """
+
+    _model = None
+    _tokenizer = None
+    _device = None
+    _quantized = False
+    _batcher = None
+    _lock = threading.Lock()
+
     def __init__(self):
-        self.model_five_classes = "nlptown/bert-base-multilingual-uncased-sentiment"
-        self.device = 0 if torch.cuda.is_available() else -1
-
-    def model_pipline(self):
-        model = pipeline("sentiment-analysis", self.model_five_classes, device = self.device)
-        return model
-    
-    def sentiment_analaysis (self,list_of_comments):
-        try:
-            model = self.model_pipline()
-            sentiment_results = model(list_of_comments)
-            list_results_and_reviews = []
-            for reviews,results in zip (list_of_comments,sentiment_results):
-                list_results_and_reviews.append(list((reviews,results)))
-        finally:
-                gc = GarbageCollectorServicec(sentiment_results)
-                gc.garbage_collecting()
-        return list_results_and_reviews
+        self.model_five_classes = os.getenv("sentiment_model", "nlptown/bert-base-multilingual-uncased-sentiment")
+        self.quantize = os.getenv("sentiment_quantize", "true").lower() == "true"
+        self.max_length = int(os.getenv("sentiment_max_length", "256"))
+        self.max_batch_size = int(os.getenv("sentiment_max_batch_size", "32"))
+        self.max_wait_ms = float(os.getenv("sentiment_max_wait_ms", "10"))
+
+    def _load(self):
+        if SentimentService._model is None:
+            with SentimentService._lock:
+                if SentimentService._model is None:
+                    # torch/transformers are imported on first use, not when the web app loads
+                    import torch
+                    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+                    start = time.perf_counter()
+                    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+                    quantized = self.quantize and device.type == "cpu"
+                    tokenizer = AutoTokenizer.from_pretrained(self.model_five_classes)
+                    model = AutoModelForSequenceClassification.from_pretrained(self.model_five_classes)
+                    model.eval()
+                    if quantized:
+                        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+                    SentimentService._tokenizer = tokenizer
+                    SentimentService._device = device
+                    SentimentService._quantized = quantized
+                    SentimentService._model = model.to(device)
+                    logger.info(f"Loaded sentiment model {self.model_five_classes} on {device} "
+                                f"(quantized={quantized}) in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return SentimentService._model, SentimentService._tokenizer
+
+    def predict(self, texts):
+        """Score one batch directly; returns pipeline-style {"label", "score"} dicts"""
+        import torch
+        model, tokenizer = self._load()
+        inputs = tokenizer(list(texts), padding=True, truncation=True, max_length=self.max_length, return_tensors="pt")
+        inputs = {key: value.to(SentimentService._device) for key, value in inputs.items()}
+        with torch.inference_mode():
+            probabilities = torch.softmax(model(**inputs).logits, dim=-1)
+        scores, labels = probabilities.max(dim=-1)
+        return [
+            {"label": model.config.id2label[int(label)], "score": float(score)}
+            for label, score in zip(labels.tolist(), scores.tolist())
+        ]
+
+    @property
+    def batcher(self) -> SentimentBatcher:
+        if SentimentService._batcher is None:
+            with SentimentService._lock:
+                if SentimentService._batcher is None:
+                    SentimentService._batcher = SentimentBatcher(self.predict, self.max_batch_size, self.max_wait_ms)
+        return SentimentService._batcher
+
+    def score(self, texts):
+        """Score texts through the shared batching queue"""
+        futures = [self.batcher.submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    async def ascore(self, texts):
+        futures = [asyncio.wrap_future(self.batcher.submit(text)) for text in texts]
+        return await asyncio.gather(*futures)
+
+    def sentiment_analaysis(self, list_of_comments):
+        """[[review, {"label", "score"}], ...] for each comment"""
+        sentiment_results = self.score(list_of_comments)
+        return [[review, result] for review, result in zip(list_of_comments, sentiment_results)]
 
+    def stats(self) -> dict:
+        return self.batcher.stats()
@@ -1,6 +1,5 @@
 import logging
 from textblob import TextBlob
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class TextPreprocessingService:
     def __init__(self):
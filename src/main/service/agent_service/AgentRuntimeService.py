@@ -0,0 +1,69 @@
+import os
+import time
+import logging
+import threading
+from dotenv import load_dotenv
+from src.main.repository.db_connector import get_engine
+from src.main.service.agent_service.SQLResultCacheService import CachedSQLDatabase
+from src.main.service.agent_service.TextToSQLService import TextToSQLService
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+db_api = os.getenv("db_info")
+
+
+class AgentRuntime:
+    """Per-worker holder of the compiled graph, tool-bound LLMs, SQL toolkit and DB handle"""
+
+    def __init__(self):
+        from src.main.service.agent_service.LLMsModelService import LLMsModelService
+
+        logger.info("Building agent runtime")
+        # SELECT results are shared across workers through the Redis SQL result cache;
+        # the engine is the process-wide one the repositories use as well
+        self.engine = get_engine(db_api)
+        self.db = CachedSQLDatabase(self.engine)
+        self.models = LLMsModelService(db=self.db, engine=self.engine)
+        self.toolkit = self.models.toolkit
+        self.agent_executor = self.models.agent_executor
+        self.text_to_sql = TextToSQLService(self.db, self.models.llm_query, self.models.schema_context, self.engine)
+        self._graph = None
+        self._graph_lock = threading.Lock()
+
+    @property
+    def graph(self):
+        """Compiled supervisor graph, built once per process"""
+        if self._graph is None:
+            with self._graph_lock:
+                if self._graph is None:
+                    from src.main.service.agent_service.GraphService import graph_builder
+                    self._graph = graph_builder()
+        return self._graph
+
+    def warm(self):
+        """Bind the tools, compile the graph and load the token estimator and product index ahead of the first request"""
+        from src.main.service.agent_service.LLMGatewayService import llm_gateway
+        from src.main.service.ProductIndexService import product_index
+
+        start = time.perf_counter()
+        self.models.llm_with_tools
+        self.graph
+        llm_gateway.warm()
+        product_index.warm()
+        logger.info(f"Agent runtime warmed in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return self
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def get_agent_runtime() -> AgentRuntime:
+    """Return the process-wide agent runtime, creating it on first call"""
+    global _runtime
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                _runtime = AgentRuntime()
+    return _runtime
@@ -1,28 +1,55 @@
 import json
+import time
+import asyncio
 import logging
+import sqlalchemy as sa
 from langchain.tools import tool
 from langchain_core.messages import SystemMessage, HumanMessage
-from src.main.service.agent_service.LLMsModelService import LLMsModelService
+from src.main.service.agent_service.AgentRuntimeService import get_agent_runtime
+from src.main.service.ProductIndexService import product_index
+from src.main.service.agent_service.TextToSQLService import AGENT, SINGLE_SHOT, SQLValidationError
+from src.main.service.agent_service.ResultPageService import ResultPageService
+from src.main.service.agent_service.SingleFlightService import SingleFlightService
 
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
-models = LLMsModelService()
 
 logger.info("Initializing Tools")
+result_pages = ResultPageService()
+single_flight = SingleFlightService()
 
+# Single-flight namespaces
+FIRST_TURN = "turn"
+QUERY_DATABASE = "sql"
 
-logger.info(f"Using Groq model: llama3-70b-8192")
-llm_query = models.llm_query
-db = models.db
-toolkit = models.toolkit
-agent_executor = models.agent_executor
+
+async def _first_page(payload: dict) -> str:
+    """Keep only the first page of rows in the tool output; the rest stays behind `next_cursor`"""
+    page, cursor, total = await result_pages.paginate(payload.get("result") or [])
+    payload["result"] = page
+    payload["total"] = total
+    if cursor:
+        payload["next_cursor"] = cursor
+    return json.dumps(payload)
 
 
 @tool
 async def query_database_tool(query: str) -> str:
     """Tool to query a SQL database and return result as a JSON string."""
+    # Identical questions in flight at once (e.g. during a campaign) share one text-to-SQL run
+    mode = get_agent_runtime().text_to_sql.mode()
+    return await single_flight.run(QUERY_DATABASE, f"{mode}|{query}", lambda: _query_database(query))
+
+
+async def _query_database(query: str) -> str:
     logger.info(f"Running SQL query from tool: {query[:50]}...")
+    text_to_sql = get_agent_runtime().text_to_sql
+    if text_to_sql.mode() == SINGLE_SHOT:
+        # One LLM call and a locally validated SELECT; anything rejected falls through to the agent
+        payload = await text_to_sql.agenerate(query)
+        if payload is not None:
+            return await _first_page(payload)
+    start = time.perf_counter()
     try:
         structured_input = [
             SystemMessage(content=(
@@ -34,12 +61,18 @@ async def query_database_tool(query: str) -> str:
                 "Example format: {\"query\": \"SELECT...\", \"result\": [[1, 123, \"Product A\"], [2, 456, \"Product B\"]], \"message\": \"...\"}\n"
                 "IMPORTANT: MUST RETURN THE EXACT ID AND SHOPIFY_ID from the PRODUCT TABLE. THEY SHOULD THE REAL MATCH FOR THE PRODUCT YOU RETURN.\n"
                 "Ensure output is valid JSON that can be parsed safely."
-                "IMPORTANT: DO NOT use LIMIT in your SQL queries. Return ALL products that match the criteria.\n"
+                f"IMPORTANT: Use LIMIT {result_pages.max_rows} in your SQL queries. In `result` list only the first {result_pages.page_size} rows; "
+                "the full result is fetched again from your `query`.\n"
                 "IMPORTANT: YOU MUST RETURN SOMTHING AT LEAST"
             )),
             HumanMessage(content=query)
         ]
+        models = get_agent_runtime().models
+        if models.schema_context_enabled:
+            schema = await asyncio.to_thread(models.schema_context.render, query)
+            structured_input.insert(1, SystemMessage(content=f"Relevant schema:\n{schema}"))
         response = await models.ainvoke_agent({"input": structured_input})
+        text_to_sql.record(AGENT, (time.perf_counter() - start) * 1000)
         output = response.get("output", "")
         logger.debug(f"Tool response: {output[:100]}")
         
@@ -54,8 +87,17 @@ async def query_database_tool(query: str) -> str:
                         [item.get("id", ""), item.get("shopify_id", ""), item.get("title", "")]
                         for item in parsed["result"]
                     ]
-            
-            return json.dumps(parsed)
+
+            # The agent only transcribes a few rows; re-run its query for the complete ordered result
+            if parsed.get("query"):
+                try:
+                    parsed["query"], parsed["result"] = await asyncio.to_thread(text_to_sql.run, parsed["query"])
+                except SQLValidationError as e:
+                    logger.debug(f"Keeping the agent's own rows, query not re-runnable: {str(e)}")
+                except Exception as e:
+                    logger.warning(f"Re-running the agent query failed: {str(e)}")
+
+            return await _first_page(parsed)
         except json.JSONDecodeError:
             logger.warning("Tool output is not valid JSON, wrapping it")
             return json.dumps({
@@ -71,41 +113,54 @@ async def query_database_tool(query: str) -> str:
             "message": f"Tool error: {str(e)}"
         })
 
+@tool
+async def search_products_tool(query: str, k: int = 20) -> str:
+    """Fast semantic product search over the catalog embedding index. Returns the top-k matching products as a JSON string."""
+    logger.info(f"Running vector product search from tool: {query[:50]}...")
+    try:
+        start = time.perf_counter()
+        results = await asyncio.to_thread(product_index.search, query, k)
+        logger.debug(f"Vector search returned {len(results)} products in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return json.dumps({
+            "query": "",
+            "result": results,
+            "message": "" if results else "No matching products found in the product index."
+        })
+    except Exception as e:
+        logger.error(f"Vector product search failed: {str(e)}", exc_info=True)
+        return json.dumps({
+            "query": "",
+            "result": [],
+            "message": f"Tool error: {str(e)}"
+        })
+
+def _random_products(limit=4):
+    """(sql, rows) for `limit` random products; rows are read from the engine as [id, shopify_id, title]"""
+    runtime = get_agent_runtime()
+    order = "RAND()" if runtime.engine.dialect.name == "mysql" else "RANDOM()"
+    # The same product table text-to-SQL projects from ("products" unless configured)
+    table = runtime.text_to_sql.product_table
+    sql = f"SELECT id, shopify_id, title FROM {table} ORDER BY {order} LIMIT {int(limit)}"
+    with runtime.engine.connect() as conn:
+        rows = [[row[0], row[1], row[2]] for row in conn.execute(sa.text(sql))]
+    return sql, rows
+
+
 @tool
 async def get_random_product(query: str = "") -> dict:
     """Fetch a random product from the database."""
+    sql = ""
     try:
-        query = """
-                    SELECT id, shopify_id, TITLE 
-                    FROM products 
-                    ORDER BY RAND() 
-                    LIMIT 4 
-                """
-
-        result = db.run(query)
-        rows = result if result else []
-        
-        # Format the result as a list of lists [id, shopify_id, title]
-        formatted_results = []
-        for row in rows:
-            if isinstance(row, dict):
-                formatted_results.append([
-                    row.get("id", ""), 
-                    row.get("shopify_id", ""), 
-                    row.get("title", "")
-                ])
-            elif isinstance(row, (list, tuple)):
-                formatted_results.append(list(row))
-        
+        sql, rows = await asyncio.to_thread(_random_products)
         return {
-            "query": query,
-            "result": formatted_results,
+            "query": sql,
+            "result": rows,
             "message": "No specific results found, here are some random products you might be interested in!"
         }
     except Exception as e:
         logger.error(f"Random product query failed: {str(e)}")
         return {
-            "query": query,
+            "query": sql,
             "result": [],
             "message": f"Error fetching random product: {str(e)}"
-        }
\ No newline at end of file
+        }
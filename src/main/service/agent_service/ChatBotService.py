@@ -1,6 +1,6 @@
 from src.main.service.agent_service.StateClass import State
-from src.main.service.agent_service import AgentToolsService as tool
-from src.main.service.agent_service.LLMsModelService import LLMsModelService 
+from src.main.service.agent_service.AgentRuntimeService import get_agent_runtime
+from src.main.service.agent_service.ConversationContextService import ConversationContextService
 
 import json
 import re
@@ -8,14 +8,11 @@ import re
 from langchain_core.messages import SystemMessage, AIMessage
 
 import logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 logger.info("Initializing Groq Agent")
+conversation_context = ConversationContextService()
 
-model = LLMsModelService()
-# tools = [tool.query_database_tool]
-# llm_with_tools = model.llm.bind_tools(tools)
 
 async def chatbot(state: State) -> State:
     logger.info("Supervisor chatbot activated")
@@ -24,9 +21,9 @@ async def chatbot(state: State) -> State:
                         "Responsibilities:\n"
                         "1. Determine whether the user's message is a product-related query (e.g., asking about products, prices, inventory) or a general inquiry (e.g., store hours, policies).\n"
                         "2. Try to find any semantic similarities in the user's message to product-related queries.\n"
-                        "3. If the semantic similarities in the user's message is product-related, use the `query_database_tool` to fetch relevant products.\n"
-                        "4. If it's product-related, prioritize using the `query_database_tool`.\n"
-                        "5. If `query_database_tool` returns no results, just query again for 4 random product`.\n"
+                        "3. If the semantic similarities in the user's message is product-related, use `search_products_tool` first to fetch relevant products; it is fast and matches by meaning.\n"
+                        "4. Use the `query_database_tool` only when the request needs exact filters the search cannot express (e.g., price ranges, inventory, SKUs) or when `search_products_tool` returns no results.\n"
+                        "5. If both tools return no results, just query again for 4 random product`.\n"
                         "6. If the input is a general inquiry, answer it directly, but still return a random product.\n"
                         "7. When responding ONLY include a simple friendly customer message, the exact SQL query used, and the product results.\n"
                         "8. DO NOT include explanations of your process or reasoning.\n"
@@ -34,17 +31,19 @@ async def chatbot(state: State) -> State:
                         "```json\n"
                         "{\n"
                         "  \"message\": \"[friendly customer message only]\",\n"
-                        "  \"query\": \"[exact SQL query used]\",\n"
+                        "  \"query\": \"[exact SQL query used, or empty if none]\",\n"
                         "  \"result\": [[id, shopify_id, title], [id, shopify_id, title], ...]\n"
                         "}\n"
                         "```\n"
                     ))
 
-    messages = [system_prompt] + state["messages"]
-    logger.debug(f"Processing {len(messages)} messages")
-
     try:
-        result = await model.ainvoke_llm(messages)
+        models = get_agent_runtime().models
+        # Recent turns verbatim, older ones summarized, within the supervisor model's token budget
+        messages = await conversation_context.build(system_prompt, state["messages"], state.get("session_id"),
+                                                    models.llm.model_name)
+        logger.debug(f"Processing {len(messages)} of {len(state['messages']) + 1} messages")
+        result = await models.ainvoke_llm(messages)
         if hasattr(result, "tool_calls") and result.tool_calls:
             return {
                 "messages": [AIMessage(content=result.content, tool_calls=result.tool_calls)],
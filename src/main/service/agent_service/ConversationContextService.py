@@ -0,0 +1,252 @@
+import os
+import re
+import json
+import asyncio
+import hashlib
+import logging
+import contextvars
+import orjson
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage
+
+from src.main.service.agent_service.RedisService import RediceService
+from src.main.service.agent_service.SessionHistoryService import encode_message
+from src.main.service.agent_service.LLMGatewayService import llm_gateway, BACKGROUND
+from src.main.common.Instrumentation import llm_metrics_callback
+from src.main.common.Metrics import metrics
+from src.main.common.ProductRows import product_ids
+
+logger = logging.getLogger(__name__)
+
+context_tokens = metrics.counter(
+    "shop_context_tokens_total", "Supervisor prompt tokens before and after context trimming (kind: full, sent)"
+)
+
+_FENCED_JSON = re.compile(r'```(?:json)?\s*({[\s\S]*?})\s*```')
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a shop assistant and a customer.\n"
+    "Update the current summary with the new turns. Keep what later turns may refer to: what the customer "
+    "asked for, their preferences and constraints (budget, size, color, style), and the product ids they were shown.\n"
+    "Reply with the updated summary only, in at most 150 words."
+)
+
+
+def split_turns(messages):
+    """Group messages into turns, each starting at a user message"""
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+
+def turn_digest(turn) -> str:
+    return hashlib.sha1("\n".join(encode_message(message) for message in turn).encode()).hexdigest()
+
+
+def _payload(content):
+    """Product payload (dict with a `result` list) in a tool output or final answer, or None"""
+    if not isinstance(content, str) or '"result"' not in content:
+        return None
+    match = _FENCED_JSON.search(content)
+    try:
+        payload = json.loads(match.group(1) if match else content)
+    except json.JSONDecodeError:
+        return None
+    return payload if isinstance(payload, dict) and isinstance(payload.get("result"), list) else None
+
+
+class ConversationContextService:
+    """Fits the supervisor's conversation history into a per-model token budget.
+
+    The current turn is always sent verbatim. The `context_recent_turns`
+    before it are kept, with product lists in tool outputs and answers
+    collapsed to product id references. Older turns are replaced by a
+    running summary cached in Redis per session; it is brought up to date
+    by a background-priority LLM call after the turn, so no request waits
+    for it, and older turns not yet summarized are sent collapsed until it
+    is. If the prompt is still over budget, the oldest turns are dropped.
+    """
+
+    prefix = "context:summary:"
+
+    def __init__(self, redis=None):
+        self.enabled = os.getenv("context_budget_enabled", "true").lower() == "true"
+        self.recent_turns = int(os.getenv("context_recent_turns", "3"))
+        self.default_budget = int(os.getenv("context_max_tokens", "6000"))
+        # e.g. "llama3-70b-8192=6000,llama3-8b-8192=6000"
+        self.budgets = {
+            model.strip(): int(tokens)
+            for model, _, tokens in (item.partition("=") for item in os.getenv("context_token_budgets", "").split(","))
+            if model.strip() and tokens.strip()
+        }
+        self.summary_model = os.getenv("context_summary_model", "llama3-8b-8192")
+        self.ttl = int(os.getenv("session_ttl", "3600"))
+        self.redis = redis or RediceService()
+        self._summary_llm = None
+        self._summarizing = set()
+        self._tasks = set()
+        self.prompts = 0
+        self.tokens_full = 0
+        self.tokens_sent = 0
+        self.turns_summarized = 0
+        self.turns_dropped = 0
+        self.summaries = 0
+        self.summary_errors = 0
+
+    def budget_for(self, model_name=None) -> int:
+        return self.budgets.get(model_name, self.default_budget)
+
+    @staticmethod
+    def count(messages) -> int:
+        total = 0
+        for message in messages:
+            total += llm_gateway.count_tokens(str(message.content)) + 4
+            if isinstance(message, AIMessage) and message.tool_calls:
+                total += llm_gateway.count_tokens(json.dumps([call["args"] for call in message.tool_calls]))
+        return total
+
+    @staticmethod
+    def collapse(message):
+        """The message with any product list replaced by the products' ids"""
+        if not isinstance(message, (ToolMessage, AIMessage)):
+            return message
+        payload = _payload(message.content)
+        if payload is None or not payload["result"]:
+            return message
+        compact = {
+            "message": payload.get("message", ""),
+            "query": payload.get("query", ""),
+            "product_ids": product_ids(payload["result"]),
+            "total": payload.get("total", len(payload["result"])),
+        }
+        return message.model_copy(update={"content": json.dumps(compact)})
+
+    async def build(self, system_prompt, messages, session_id=None, model_name=None):
+        """System prompt plus as much of `messages` as the model's budget allows"""
+        if not self.enabled:
+            return [system_prompt] + messages
+
+        turns = split_turns(messages)
+        current, previous = turns[-1:], turns[:-1]
+        recent = previous[-self.recent_turns:] if self.recent_turns else []
+        older = previous[:len(previous) - len(recent)]
+
+        summary, pending = "", older
+        if older and session_id:
+            stored = await self._load_summary(session_id)
+            if stored:
+                summary = stored["summary"]
+                digests = [turn_digest(turn) for turn in older]
+                if stored["through"] in digests:
+                    pending = older[digests.index(stored["through"]) + 1:]
+            if pending:
+                self._schedule_summary(session_id, summary, pending)
+
+        sections = [[self.collapse(message) for message in turn] for turn in pending + recent]
+        header = [system_prompt]
+        if summary:
+            header.append(SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"))
+        tail = [message for turn in current for message in turn]
+
+        budget = self.budget_for(model_name)
+        fixed = self.count(header) + self.count(tail)
+        sizes = [self.count(section) for section in sections]
+        dropped = 0
+        while sections and fixed + sum(sizes) > budget:
+            sections.pop(0)
+            sizes.pop(0)
+            dropped += 1
+        if fixed + sum(sizes) > budget:
+            logger.warning(f"Current turn alone ({fixed} tokens) is over the {budget} token context budget")
+
+        prompt = header + [message for section in sections for message in section] + tail
+        full = self.count([system_prompt] + messages)
+        sent = fixed + sum(sizes)
+        self.prompts += 1
+        self.tokens_full += full
+        self.tokens_sent += sent
+        self.turns_summarized += len(older) - len(pending)
+        self.turns_dropped += dropped
+        context_tokens.inc(full, kind="full")
+        context_tokens.inc(sent, kind="sent")
+        logger.debug(f"Context: {full} -> {sent} tokens ({len(older) - len(pending)} turns summarized, {dropped} dropped)")
+        return prompt
+
+    # Running summary
+
+    def _key(self, session_id):
+        return f"{self.prefix}{session_id}"
+
+    async def _load_summary(self, session_id):
+        value = await self.redis.get(self._key(session_id))
+        try:
+            return orjson.loads(value) if value else None
+        except orjson.JSONDecodeError:
+            return None
+
+    @property
+    def summary_llm(self):
+        if self._summary_llm is None:
+            self._summary_llm = llm_gateway.chat_model(model_name=self.summary_model, temperature=0.0,
+                                                       priority=BACKGROUND, callbacks=[llm_metrics_callback])
+        return self._summary_llm
+
+    def _schedule_summary(self, session_id, summary, pending):
+        if session_id in self._summarizing:
+            return
+        self._summarizing.add(session_id)
+        # A fresh context keeps the summary's spans out of the current request's timings
+        task = asyncio.get_running_loop().create_task(
+            self._summarize(session_id, summary, pending), context=contextvars.Context()
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def _render(turns) -> str:
+        lines = []
+        for turn in turns:
+            for message in turn:
+                content = ConversationContextService.collapse(message).content
+                if isinstance(message, HumanMessage):
+                    lines.append(f"Customer: {content}")
+                elif isinstance(message, ToolMessage):
+                    lines.append(f"Tool {message.name or ''}: {content}")
+                elif isinstance(message, AIMessage) and content:
+                    lines.append(f"Assistant: {content}")
+        return "\n".join(lines)
+
+    async def _summarize(self, session_id, summary, pending):
+        try:
+            result = await self.summary_llm.ainvoke([
+                SystemMessage(content=SUMMARY_PROMPT),
+                HumanMessage(content=f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{self._render(pending)}"),
+            ])
+            stored = orjson.dumps({"through": turn_digest(pending[-1]), "summary": str(result.content).strip()})
+            await self.redis.set(self._key(session_id), stored.decode(), ex=self.ttl)
+            self.summaries += 1
+        except Exception as e:
+            self.summary_errors += 1
+            logger.warning(f"[{session_id}] Conversation summary update failed: {str(e)}")
+        finally:
+            self._summarizing.discard(session_id)
+
+    async def clear(self, session_id):
+        return await self.redis.delete(self._key(session_id))
+
+    def stats(self) -> dict:
+        saved = self.tokens_full - self.tokens_sent
+        return {
+            "prompts": self.prompts,
+            "tokens_full": self.tokens_full,
+            "tokens_sent": self.tokens_sent,
+            "tokens_saved": saved,
+            "saved_ratio": round(saved / self.tokens_full, 4) if self.tokens_full else 0.0,
+            "turns_summarized": self.turns_summarized,
+            "turns_dropped": self.turns_dropped,
+            "summaries": self.summaries,
+            "summary_errors": self.summary_errors,
+        }
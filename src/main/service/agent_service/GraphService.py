@@ -7,7 +7,6 @@ from langgraph.graph import StateGraph, START
 from langgraph.prebuilt import tools_condition, ToolNode
 
 import logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
@@ -16,7 +15,7 @@ def graph_builder():
     """Builds and returns an async-compatible LangGraph for the agent"""
     logger.debug("Constructing async graph")
 
-    tools = [tool.query_database_tool]
+    tools = [tool.search_products_tool, tool.query_database_tool]
     graph_builder = StateGraph(State)
     graph_builder.add_node("chatbot", chatbot)
     tool_node = ToolNode(tools=tools)
@@ -3,14 +3,14 @@ import json
 import logging
 import uuid
 import asyncio
+import threading
 from redis.asyncio import Redis
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langchain_community.utilities import SQLDatabase
 from langchain.agents import create_sql_agent
 from langchain.agents.agent_toolkits import SQLDatabaseToolkit
-from langchain_groq import ChatGroq
+from src.main.service.agent_service.AgentRuntimeService import get_agent_runtime
 from langchain.tools import tool
 from langgraph.prebuilt import tools_condition, ToolNode
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolCall
@@ -18,26 +18,44 @@ from typing import Annotated, Dict, Any
 from typing_extensions import TypedDict
 
 # Setup logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Load environment
 logger.info("Initializing Groq Agent")
 load_dotenv()
-api_token_groq = os.getenv("grop_db_query_model_api_key") or os.getenv("chat_assistant_api_1")
 db_api = os.getenv("db_info")
 redis_url = os.getenv("REDIS_URL")
 
-# Connect to Redis async client
-redis_client = Redis.from_url(redis_url, decode_responses=True)
 
-# LLM and DB setup
-logger.info(f"Using Groq model: llama3-70b-8192")
-llm_query = ChatGroq(api_key=api_token_groq, model_name="llama3-70b-8192", temperature=0.1)
-llm = ChatGroq(api_key=api_token_groq, model_name="llama3-70b-8192", temperature=0.7)
-db = SQLDatabase.from_uri(db_api)
-toolkit = SQLDatabaseToolkit(db=db, llm=llm_query)
-agent_executor = create_sql_agent(llm=llm_query, toolkit=toolkit, verbose=False)
+class _Components:
+    """Redis client, LLMs, SQL agent and compiled graph, built in the worker on first request"""
+
+    def __init__(self):
+        # Connect to Redis async client
+        self.redis_client = Redis.from_url(redis_url, decode_responses=True)
+
+        # LLM and DB setup
+        logger.info(f"Using Groq model: llama3-70b-8192")
+        from src.main.service.agent_service.LLMGatewayService import llm_gateway, SUPERVISOR, TOOL
+        self.llm_query = llm_gateway.chat_model(model_name="llama3-70b-8192", temperature=0.1, priority=TOOL)
+        self.llm = llm_gateway.chat_model(model_name="llama3-70b-8192", temperature=0.7, priority=SUPERVISOR)
+        self.toolkit = SQLDatabaseToolkit(db=get_agent_runtime().db, llm=self.llm_query)
+        self.agent_executor = create_sql_agent(llm=self.llm_query, toolkit=self.toolkit, verbose=False)
+        self.llm_with_tools = self.llm.bind_tools(tools)
+        self.graph = _build_graph()
+
+
+_components = None
+_components_lock = threading.Lock()
+
+
+def components() -> _Components:
+    global _components
+    if _components is None:
+        with _components_lock:
+            if _components is None:
+                _components = _Components()
+    return _components
 
 class State(TypedDict):
     messages: Annotated[list, add_messages]
@@ -57,7 +75,7 @@ async def query_database_tool(query: str) -> str:
             )),
             HumanMessage(content=query)
         ]
-        response = await agent_executor.ainvoke({"input": structured_input})
+        response = await components().agent_executor.ainvoke({"input": structured_input})
         output = response.get("output", "")
         logger.debug(f"Tool response: {output[:100]}")
         try:
@@ -80,7 +98,6 @@ async def query_database_tool(query: str) -> str:
 
 
 tools = [query_database_tool]
-llm_with_tools = llm.bind_tools(tools)
 
 async def chatbot(state: State) -> State:
     logger.info("Supervisor chatbot activated")
@@ -102,7 +119,7 @@ async def chatbot(state: State) -> State:
     logger.debug(f"Processing {len(messages)} messages")
 
     try:
-        result = await llm_with_tools.ainvoke(messages)
+        result = await components().llm_with_tools.ainvoke(messages)
         if hasattr(result, "tool_calls") and result.tool_calls:
             return {
                 "messages": [AIMessage(content=result.content, tool_calls=result.tool_calls)],
@@ -135,20 +152,23 @@ async def chatbot(state: State) -> State:
             }
         }
 
-logger.debug("Constructing graph")
-graph_builder = StateGraph(State)
-graph_builder.add_node("chatbot", chatbot)
-tool_node = ToolNode(tools=tools)
-graph_builder.add_node("tools", tool_node)
-graph_builder.add_edge(START, "chatbot")
-graph_builder.add_conditional_edges("chatbot", tools_condition)
-graph_builder.add_edge("tools", "chatbot")
+def _build_graph():
+    logger.debug("Constructing graph")
+    graph_builder = StateGraph(State)
+    graph_builder.add_node("chatbot", chatbot)
+    tool_node = ToolNode(tools=tools)
+    graph_builder.add_node("tools", tool_node)
+    graph_builder.add_edge(START, "chatbot")
+    graph_builder.add_conditional_edges("chatbot", tools_condition)
+    graph_builder.add_edge("tools", "chatbot")
 
-logger.info("Compiling the LangGraph")
-graph = graph_builder.compile()
+    logger.info("Compiling the LangGraph")
+    return graph_builder.compile()
 
 # Entrypoint function with UUID + Redis
 async def agent_calling(user_input: str, session_id: str = None) -> Dict[str, Any]:
+    redis_client = components().redis_client
+    graph = components().graph
     if not session_id:
         session_id = str(uuid.uuid4())
         logger.info(f"New session started with UUID: {session_id}")
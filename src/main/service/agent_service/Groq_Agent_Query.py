@@ -1,45 +1,84 @@
 import os
 import json
 import time
+import asyncio
 import logging
-import ast
+import threading
+import re
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langchain_community.utilities import SQLDatabase
 from langchain.agents import create_sql_agent
 from langchain.agents.agent_toolkits import SQLDatabaseToolkit
-from langchain_groq import ChatGroq
+from src.main.service.agent_service.AgentRuntimeService import get_agent_runtime
+from src.main.service.agent_service.LLMGatewayService import TOOL, BACKGROUND
+from src.main.common.Metrics import metrics, span
 from typing import Annotated
 from typing_extensions import TypedDict
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 logger.info("Initializing Groq Query Agent")
 load_dotenv()
-api_token_groq = os.getenv("grop_db_query_model_api_key")
 db_api = os.getenv("db_info")
 
-logger.info("Connecting to database")
-db = SQLDatabase.from_uri(db_api)
-logger.info(f"Using Groq model: llama3-70b-8192")
-llm = ChatGroq(api_key=api_token_groq, model_name="llama3-70b-8192", temperature=0.7)
-# llm = ChatGroq(api_key=api_token_groq, model_name="llama3-8b-8192", temperature=0.)
+# Batch limits: queries run at once per request, queries per request, seconds per query
+QUERY_BATCH_CONCURRENCY = int(os.getenv("query_batch_concurrency", "8"))
+QUERY_BATCH_MAX_ITEMS = int(os.getenv("query_batch_max_items", "500"))
+QUERY_BATCH_ITEM_TIMEOUT = float(os.getenv("query_batch_item_timeout_seconds", "120"))
 
-logger.debug("Setting up SQL toolkit and agent")
-toolkit = SQLDatabaseToolkit(db=db, llm=llm)
-agent_executor = create_sql_agent(llm=llm, toolkit=toolkit, verbose=False)
+batch_items = metrics.counter("shop_query_batch_items_total", "Batch query agent items, by outcome (ok, error, timeout)")
+
+_agent_executors = {}
+_agent_lock = threading.Lock()
+
+
+def get_agent_executor(priority=TOOL):
+    """SQL agent for the query endpoints, built in the worker on first request; one per gateway priority"""
+    executor = _agent_executors.get(priority)
+    if executor is None:
+        with _agent_lock:
+            executor = _agent_executors.get(priority)
+            if executor is None:
+                logger.info(f"Using Groq model: llama3-70b-8192")
+                from src.main.service.agent_service.LLMGatewayService import llm_gateway
+                llm = llm_gateway.chat_model(model_name="llama3-70b-8192", temperature=0.7, priority=priority)
+                # llm = ChatGroq(api_key=api_token_groq, model_name="llama3-8b-8192", temperature=0.)
+
+                logger.debug("Setting up SQL toolkit and agent")
+                toolkit = SQLDatabaseToolkit(db=get_agent_runtime().db, llm=llm)
+                executor = _agent_executors[priority] = create_sql_agent(llm=llm, toolkit=toolkit, verbose=False)
+    return executor
+
+
+_FENCED_JSON = re.compile(r'```(?:json)?\s*({[\s\S]*?})\s*```')
+
+
+class AgentOutputError(ValueError):
+    """The query agent's answer was not the JSON object it was asked for"""
+
+
+def _parse_output(output: str) -> dict:
+    """The agent's answer as a dict; it must be a JSON object, optionally in a ```json fence"""
+    match = _FENCED_JSON.search(output)
+    try:
+        parsed = json.loads(match.group(1) if match else output)
+    except json.JSONDecodeError as e:
+        raise AgentOutputError(f"Query agent returned invalid JSON ({e.msg} at position {e.pos}): {output[:200]}")
+    if not isinstance(parsed, dict):
+        raise AgentOutputError(f"Query agent returned JSON {type(parsed).__name__}, expected an object")
+    return parsed
 
 
 class State(TypedDict):
     messages: Annotated[list, add_messages]
     final_result: dict
+    priority: int
 
 logger.debug("Initializing StateGraph")
 graph_builder = StateGraph(State)
 
-def chatbot(state: State) -> State:
+async def chatbot(state: State) -> State:
     logger.info("Processing SQL query request")
     system_prompt = {
         "role": "system",
@@ -48,7 +87,7 @@ def chatbot(state: State) -> State:
             "Your task:\n"
             "1. Generate a valid SQL query from the user's request.\n"
             "2. Execute the query using the database.\n"
-            "3. Return a dictionary with keys: 'query', 'result', and 'message'."
+            "3. Return a JSON object with keys: \"query\", \"result\", and \"message\", and nothing else."
             "4. remmember that you must return the id and shopify_id for each result"
         )
     }
@@ -56,38 +95,17 @@ def chatbot(state: State) -> State:
     messages = [system_prompt] + state["messages"]
     logger.debug(f"Processing messages count: {len(messages)}")
 
-    try:
-        logger.debug("Invoking agent executor")
-        result = agent_executor.invoke({"input": messages})
-        output = result.get("output", "")
-        logger.info("Agent execution completed successfully")
-
-        try:
-            parsed = json.loads(output)
-            logger.debug("Successfully parsed JSON output")
-        except Exception as e:
-            logger.warning(f"Failed to parse JSON output: {str(e)}")
-            parsed = {
-                "query": "",
-                "result": [],
-                "message": output
-            }
-
-        return {
-            "messages": [{"role": "assistant", "content": output}],  # Format as proper message
-            "final_result": parsed
-        }
+    # Errors propagate, so batch items can report them as errors
+    logger.debug("Invoking agent executor")
+    executor = get_agent_executor(state.get("priority", TOOL))
+    result = await executor.ainvoke({"input": messages})
+    output = result.get("output", "")
+    logger.info("Agent execution completed successfully")
 
-    except Exception as e:
-        logger.error(f"Error in chatbot processing: {str(e)}", exc_info=True)
-        return {
-            "messages": [{"role": "assistant", "content": f"Agent error: {str(e)}"}],  # Format as proper message
-            "final_result": {
-                "query": "",
-                "result": [],
-                "message": f"Agent error: {str(e)}"
-            }
-        }
+    return {
+        "messages": [{"role": "assistant", "content": output}],  # Format as proper message
+        "final_result": _parse_output(output)
+    }
 
 logger.debug("Adding nodes and edges to graph")
 graph_builder.add_node("chatbot", chatbot)
@@ -97,34 +115,82 @@ logger.info("Compiling agent graph")
 graph = graph_builder.compile()
 
 
-def agent_calling_query(user_input: str):
+async def _run_query(user_input: str, priority=TOOL) -> dict:
+    """Run one query through the graph; errors propagate"""
+    final_output = {}
+    with span("query_agent"):
+        async for event in graph.astream({"messages": [{"role": "user", "content": user_input}], "priority": priority}):
+            for value in event.values():
+                if value and "final_result" in value:
+                    final_output = value["final_result"]
+                    logger.debug(f"Received final result: {str(final_output)[:100]}...")
+    return final_output
+
+
+async def agent_calling_query(user_input: str):
     logger.info(f"Query agent called with input: {user_input[:50]}...")
-    
+
     if user_input.lower() in ["exit", "quit", "q"]:
         logger.info("User requested exit")
         return "Goodbye!"
 
     try:
-        logger.debug("Streaming graph execution")
-        final_output = {}
-        for event in graph.stream({"messages": [{"role": "user", "content": user_input}]}):
-            for value in event.values():
-                if "final_result" in value:
-                    final_output = value["final_result"]
-                    logger.debug(f"Received final result: {str(final_output)[:100]}...")
-            time.sleep(1)  # Throttle each 
-
-        logger.info("Processing final output")
-        data_dict = ast.literal_eval(final_output['message'])
-        logger.debug(f"Returning data dictionary with {len(data_dict) if isinstance(data_dict, dict) else 'non-dict'} entries")
-        return data_dict
+        return await _run_query(user_input)
 
     except Exception as e:
         logger.error(f"Error in agent execution: {str(e)}", exc_info=True)
-        return json.dumps({
+        return {
             "query": "",
             "result": [],
             "message": f"Error: {str(e)}"
-        }, indent=2)
+        }
 
 
+async def agent_query_batch(queries: list, concurrency: int = None):
+    """Run `queries` concurrently, yielding (event, data) pairs; the last event is always `done`.
+
+    An `item` event is yielded per query as it completes, carrying its
+    `index` in `queries` and either `response` or `error`; one query failing
+    or timing out does not affect the others. `done` carries the counts. At
+    most `concurrency` (capped at `query_batch_concurrency`) run at once, at
+    background priority so interactive chat keeps the LLM keys first.
+    """
+    batch_started = time.perf_counter()
+    limit = max(1, min(concurrency or QUERY_BATCH_CONCURRENCY, QUERY_BATCH_CONCURRENCY))
+    semaphore = asyncio.Semaphore(limit)
+    logger.info(f"Query batch of {len(queries)} queries, {limit} at a time")
+
+    async def run(index, user_input):
+        async with semaphore:
+            started = time.perf_counter()
+            item = {"index": index, "query": user_input}
+            try:
+                item["response"] = await asyncio.wait_for(_run_query(user_input, BACKGROUND), QUERY_BATCH_ITEM_TIMEOUT)
+                outcome = "ok"
+            except asyncio.TimeoutError:
+                item["error"] = f"Timed out after {QUERY_BATCH_ITEM_TIMEOUT:g}s"
+                outcome = "timeout"
+            except Exception as e:
+                logger.warning(f"Batch query {index} failed: {str(e)}")
+                item["error"] = str(e)
+                outcome = "error"
+            batch_items.inc(outcome=outcome)
+            item["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            return item
+
+    tasks = [asyncio.ensure_future(run(index, user_input)) for index, user_input in enumerate(queries)]
+    errors = 0
+    try:
+        for next_item in asyncio.as_completed(tasks):
+            item = await next_item
+            errors += "error" in item
+            yield "item", item
+        yield "done", {
+            "count": len(tasks),
+            "errors": errors,
+            "elapsed_ms": round((time.perf_counter() - batch_started) * 1000, 1),
+        }
+    finally:
+        # A disconnected client stops the rest of the batch
+        for task in tasks:
+            task.cancel()
@@ -1,22 +1,143 @@
 import json
 import logging
 import uuid
+import time
 import asyncio
 import re
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 
-from src.main.service.agent_service.RedisService import RediceService
-from src.main.service.agent_service.GraphService import graph_builder
+from src.main.service.agent_service.SessionHistoryService import SessionHistoryService
+from src.main.service.agent_service.AgentRuntimeService import get_agent_runtime
+from src.main.service.agent_service.SemanticCacheService import SemanticCacheService
+from src.main.service.agent_service.IntentRouterService import IntentRouterService, SUPERVISOR, PRODUCT_SEARCH, GREETING
+from src.main.service.agent_service import AgentToolsService as tool
+from src.main.service.agent_service.ChatBotService import conversation_context
+from src.main.service.agent_service.TextToSQLService import current_sql_mode
+from src.main.service.CatalogVersionService import CatalogVersionService
+from src.main.service.ProductEnrichmentService import product_enrichment
+from src.main.common.Metrics import RequestTimings, current_timings, observe_span
 
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
-redis = RediceService()
+session_history = SessionHistoryService()
+semantic_cache = SemanticCacheService()
+intent_router = IntentRouterService()
+catalog_version = CatalogVersionService()
 
 
-async def agent_calling_service(user_input: str, session_id: str = None):
-    """Asynchronous agent service that processes user input and maintains session state"""
-    graph = graph_builder()
+async def _fast_path(route: str, user_input: str):
+    """Answer a routed turn with a single tool call; None sends it back to the supervisor"""
+    if route == PRODUCT_SEARCH:
+        output = json.loads(await tool.search_products_tool.ainvoke({"query": user_input}))
+        if not output.get("result"):
+            return None
+        message = "Here are some products that match what you're looking for!"
+    else:
+        output = await tool.get_random_product.ainvoke({"query": ""})
+        message = ("Hi there! Here are a few products you might like." if route == GREETING
+                   else "Here are some products you might be interested in!")
+    return {"message": message, "query": output.get("query", ""), "result": output.get("result", [])}
+
+
+def _tool_output(message):
+    """Parsed JSON payload of a tool message, or None"""
+    try:
+        output = json.loads(message.content)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    return output if isinstance(output, dict) else None
+
+
+def _paging(messages) -> dict:
+    """`next_cursor`/`total` of the latest tool result this turn, when it was paginated"""
+    for message in reversed(messages):
+        if isinstance(message, ToolMessage):
+            output = _tool_output(message)
+            if not output or not output.get("next_cursor"):
+                return {}
+            return {"next_cursor": output["next_cursor"], "total": output.get("total")}
+    return {}
+
+
+def _format_final(final_output: dict) -> dict:
+    """Normalize the supervisor's final result into the response contract"""
+    # Ensure the final output is properly formatted
+    if not final_output:
+        final_output = {
+            "query": "",
+            "result": [],
+            "message": "No response generated."
+        }
+
+    # Process result to ensure correct format
+    if "result" in final_output and final_output["result"]:
+        # Convert dict format to list format if needed
+        if isinstance(final_output["result"], list):
+            if isinstance(final_output["result"][0], dict):
+                final_output["result"] = [
+                    [item.get("id", ""), item.get("shopify_id", ""), item.get("title", "")]
+                    for item in final_output["result"]
+                ]
+
+    # Extract actual user message if embedded in complex response
+    if "message" in final_output and isinstance(final_output["message"], str):
+        # If message appears to contain a JSON structure explanation, try to extract the actual message
+        message = final_output["message"]
+        json_match = re.search(r'```(?:json)?\s*({[\s\S]*?})\s*```', message)
+        if json_match:
+            try:
+                json_part = json.loads(json_match.group(1))
+                if "message" in json_part:
+                    final_output["message"] = json_part["message"]
+            except json.JSONDecodeError:
+                # Keep original message if parsing fails
+                pass
+
+    return {
+        "message": final_output.get("message", ""),
+        "query": final_output.get("query", ""),
+        "result": final_output.get("result", [])
+    }
+
+
+async def agent_event_stream(user_input: str, session_id: str = None, sql_mode: str = None,
+                             stream_tokens: bool = True, timings: bool = False, enrich=None):
+    """Run one agent turn, yielding (event, data) pairs as it progresses; the last event is always `done`.
+
+    Events: `node` when a graph node finishes, `tool_result` as soon as a tool
+    returns products, `token` for the supervisor's answer text (only with
+    `stream_tokens`) and `done` with the full response. Every event carries
+    `t_ms`, milliseconds since the turn started. With `timings`, `done` also
+    carries the turn's span breakdown (LLM, SQL, Redis, graph nodes). With
+    `enrich` (fields from `parse_fields`), the `done` response also carries
+    `products`, the display data for its result rows.
+    """
+    started = time.perf_counter()
+    request_timings = RequestTimings() if timings else None
+    if request_timings is not None:
+        # Graph tasks and tool threads inherit this context, so their spans land here too
+        current_timings.set(request_timings)
+
+    def event(name, **data):
+        elapsed = time.perf_counter() - started
+        data["t_ms"] = round(elapsed * 1000, 1)
+        if name == "done":
+            path = data.get("route") or ("cache" if data.get("cached") else
+                                         "coalesced" if data.get("coalesced") else "supervisor")
+            observe_span("agent_turn", elapsed, path=path)
+            if request_timings is not None:
+                data["timings"] = request_timings.summary()
+        return name, data
+
+    async def done(**data):
+        # Enrichment runs after the graph, so cached and coalesced answers get it too
+        data["response"] = await product_enrichment.aenrich_response(data["response"], enrich)
+        return event("done", **data)
+
+    if sql_mode:
+        # Read by query_database_tool; graph tasks inherit this context
+        current_sql_mode.set(sql_mode)
+    graph = get_agent_runtime().graph
     if not session_id:
         session_id = str(uuid.uuid4())
         logger.info(f"New session started with UUID: {session_id}")
@@ -25,108 +146,123 @@ async def agent_calling_service(user_input: str, session_id: str = None):
 
     # Exit and clean session memory
     if user_input.lower() in ["exit", "quit", "q"]:
-        await redis.delete(session_id)
+        await session_history.clear(session_id)
+        await conversation_context.clear(session_id)
         logger.info(f"[{session_id}] Session ended and memory cleared")
-        return {
-            "session_id": session_id,
-            "response": {
-                "message": "Session ended. Goodbye!",
-                "query": "",
-                "result": []
-            }
-        }
+        yield await done(session_id=session_id, response={
+            "message": "Session ended. Goodbye!",
+            "query": "",
+            "result": []
+        })
+        return
 
     # Load memory
-    history_json = await redis.get(session_id)
-    history = json.loads(history_json) if history_json else []
+    history = await session_history.load(session_id)
+
+    # Messages added this turn; only these are written back
+    turn_messages = [HumanMessage(content=user_input)]
 
-    # Append new user message
-    history.append(HumanMessage(content=user_input))
+    # First-turn queries can be answered from the semantic cache without touching the LLM
+    first_turn = not history
+    use_cache = first_turn and semantic_cache.enabled
+    version = await catalog_version.aget_version() if use_cache else 0
+    if use_cache:
+        cached = await semantic_cache.alookup(user_input, version)
+        if cached is not None:
+            turn_messages.append(AIMessage(content=json.dumps(cached)))
+            await session_history.append(session_id, turn_messages)
+            yield await done(session_id=session_id, response=dict(cached), cached=True)
+            return
 
+    # Trivial first turns skip the supervisor LLM entirely
+    start = time.perf_counter()
+    route = await intent_router.aroute(user_input) if first_turn else SUPERVISOR
+    if route != SUPERVISOR:
+        response = await _fast_path(route, user_input)
+        if response is not None:
+            intent_router.record(route, (time.perf_counter() - start) * 1000)
+            turn_messages.append(AIMessage(content=json.dumps(response)))
+            await session_history.append(session_id, turn_messages)
+            yield await done(session_id=session_id, response=response, route=route)
+            return
+        route = SUPERVISOR
+
+    flight = None
     try:
+        # Identical first turns already running share that run's answer instead of starting their own
+        if first_turn and tool.single_flight.enabled:
+            flight = await tool.single_flight.begin(tool.FIRST_TURN, f"{current_sql_mode.get() or ''}|{user_input}")
+            shared = await flight.wait()
+            if shared is not None:
+                turn_messages.append(AIMessage(content=json.dumps(shared)))
+                await session_history.append(session_id, turn_messages)
+                yield await done(session_id=session_id, response=shared, coalesced=True)
+                return
+
         final_output = {}
-        async for event in graph.astream({"messages": history}):
-            for value in event.values():
+        node_started = time.perf_counter()
+        stream_mode = ["updates", "messages"] if stream_tokens else ["updates"]
+        async for mode, chunk in graph.astream({"messages": history + turn_messages, "session_id": session_id},
+                                              stream_mode=stream_mode):
+            if mode == "messages":
+                message, metadata = chunk
+                # Only the supervisor's own answer; tool-internal LLM calls stream under the tools node
+                if metadata.get("langgraph_node") == "chatbot" and isinstance(message.content, str) and message.content:
+                    yield event("token", text=message.content)
+                continue
+
+            for node, value in chunk.items():
+                now = time.perf_counter()
+                observe_span("graph_node", now - node_started, node=node)
+                yield event("node", node=node, elapsed_ms=round((now - node_started) * 1000, 1))
+                node_started = now
+                if not value:
+                    continue
+                new_messages = value.get("messages", [])
+                turn_messages += new_messages
+                for message in new_messages:
+                    output = _tool_output(message) if isinstance(message, ToolMessage) else None
+                    if output is not None and output.get("result"):
+                        yield event("tool_result", tool=message.name, result=output["result"],
+                                    next_cursor=output.get("next_cursor"), total=output.get("total"))
                 if "final_result" in value:
                     final_output = value["final_result"]
-                    history += value["messages"]
-
-        # Save back to Redis
-        serialized_history = []
-        for msg in history:
-            if isinstance(msg, HumanMessage):
-                serialized_history.append({"type": "human", "content": msg.content})
-            elif isinstance(msg, AIMessage):
-                if hasattr(msg, "tool_calls") and msg.tool_calls:
-                    tool_calls_data = [
-                        {"name": t.name, "args": t.args, "id": t.id} 
-                        for t in msg.tool_calls
-                    ]
-                    serialized_history.append({
-                        "type": "ai",
-                        "content": msg.content,
-                        "tool_calls": tool_calls_data
-                    })
-                else:
-                    serialized_history.append({"type": "ai", "content": msg.content})
-            elif isinstance(msg, SystemMessage):
-                serialized_history.append({"type": "system", "content": msg.content})
-            elif isinstance(msg, dict) and "type" in msg and "content" in msg:
-                serialized_history.append(msg)
-            else:
-                serialized_history.append({"type": "unknown", "content": str(msg)})
-
-        # Save history to Redis
-        await redis.set(session_id, json.dumps(serialized_history))
-
-        # Ensure the final output is properly formatted
-        if not final_output:
-            final_output = {
-                "query": "",
-                "result": [],
-                "message": "No response generated."
-            }
-        
-        # Process result to ensure correct format
-        if "result" in final_output and final_output["result"]:
-            # Convert dict format to list format if needed
-            if isinstance(final_output["result"], list):
-                if isinstance(final_output["result"][0], dict):
-                    final_output["result"] = [
-                        [item.get("id", ""), item.get("shopify_id", ""), item.get("title", "")]
-                        for item in final_output["result"]
-                    ]
-        
-        # Extract actual user message if embedded in complex response
-        if "message" in final_output and isinstance(final_output["message"], str):
-            # If message appears to contain a JSON structure explanation, try to extract the actual message
-            message = final_output["message"]
-            json_match = re.search(r'```(?:json)?\s*({[\s\S]*?})\s*```', message)
-            if json_match:
-                try:
-                    json_part = json.loads(json_match.group(1))
-                    if "message" in json_part:
-                        final_output["message"] = json_part["message"]
-                except json.JSONDecodeError:
-                    # Keep original message if parsing fails
-                    pass
-
-        return {
-            "session_id": session_id,
-            "response": {
-                "message": final_output.get("message", ""),
-                "query": final_output.get("query", ""),
-                "result": final_output.get("result", [])
-            }
-        }
+        intent_router.record(route, (time.perf_counter() - start) * 1000)
+
+        # Save this turn to Redis
+        await session_history.append(session_id, turn_messages)
+
+        response = _format_final(final_output)
+        if use_cache and response["result"]:
+            # Cursors expire with their Redis list, so cached answers carry the first page only
+            await semantic_cache.astore(user_input, dict(response), version)
+        response.update(_paging(turn_messages))
+        if flight is not None:
+            await flight.finish(response)
+
+        yield await done(session_id=session_id, response=response)
 
     except Exception as e:
         logger.error(f"[{session_id}] Error in graph execution: {str(e)}", exc_info=True)
-        return {
-            "session_id": session_id,
-            "response": {
-                "query": "",
-                "result": [],
-                "message": f"Execution error: {str(e)}"
-            }
-        }
+        yield await done(session_id=session_id, response={
+            "query": "",
+            "result": [],
+            "message": f"Execution error: {str(e)}"
+        })
+    finally:
+        # Errors, cancellation and disconnected clients release the waiters, which then run the turn themselves
+        if flight is not None:
+            await flight.abandon()
+
+
+async def agent_calling_service(user_input: str, session_id: str = None, sql_mode: str = None, timings: bool = False,
+                                enrich=None):
+    """Asynchronous agent service that processes user input and maintains session state"""
+    result = None
+    async for name, data in agent_event_stream(user_input, session_id, sql_mode, stream_tokens=False, timings=timings,
+                                               enrich=enrich):
+        if name == "done":
+            result = {"session_id": data["session_id"], "response": data["response"]}
+            if "timings" in data:
+                result["timings"] = data["timings"]
+    return result
@@ -0,0 +1,131 @@
+import os
+import re
+import asyncio
+import logging
+import threading
+
+import numpy as np
+
+from src.main.service.EmbeddingService import EmbeddingService
+
+logger = logging.getLogger(__name__)
+
+GREETING = "greeting"
+RANDOM_PRODUCT = "random_product"
+PRODUCT_SEARCH = "product_search"
+SUPERVISOR = "supervisor"
+
+# Example utterances per route; a query is routed to the closest prototype set
+PROTOTYPES = {
+    GREETING: [
+        "hi", "hello", "hey there", "good morning", "good evening", "thanks", "thank you so much",
+        "how are you", "hello, anyone there?",
+    ],
+    RANDOM_PRODUCT: [
+        "show me something random", "surprise me", "show me anything", "what do you have",
+        "recommend me something", "show me some products", "what's popular", "i'm just browsing",
+    ],
+    PRODUCT_SEARCH: [
+        "red dress", "running shoes for men", "black leather jacket", "summer t-shirts",
+        "show me wireless headphones", "i'm looking for a wool scarf", "do you have yoga pants",
+        "blue denim jeans", "gold necklace",
+    ],
+    SUPERVISOR: [
+        "what is your return policy", "what are your store hours", "how long does shipping take",
+        "compare these two products", "which one is better for running and hiking",
+        "i need a gift for my mom and something for my dad", "can you help me with my order",
+        "do you ship internationally",
+    ],
+}
+
+_GREETING_RULE = re.compile(r"^\s*(hi+|hello|hey+|hiya|yo|good (morning|afternoon|evening)|thanks?( you)?|thank you)\b[\s!.,?]*$", re.I)
+_RANDOM_RULE = re.compile(r"\b(random|surprise me|anything|whatever you (have|got))\b", re.I)
+# Exact filters the vector index cannot express go through the supervisor and SQL
+_FILTER_RULE = re.compile(r"(\$|\d|\b(under|below|over|above|less than|more than|cheap\w*|expensive|price|in stock|stock|sku|between)\b)", re.I)
+_MULTI_PART_RULE = re.compile(r"(\?.*\?|\b(and also|as well as|compare|versus|vs\.?|or)\b)", re.I)
+
+
+class IntentRouterService:
+    """Cheap local pre-classifier deciding whether a turn needs the supervisor LLM.
+
+    Keyword rules catch unambiguous greetings, random-product requests and turns
+    needing exact filters or several steps; the rest is matched against
+    prototype utterances with the shared embedding model. Only confident,
+    single-intent first turns skip the supervisor.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("intent_router_enabled", "true").lower() == "true"
+        self.threshold = float(os.getenv("intent_router_threshold", "0.55"))
+        self.margin = float(os.getenv("intent_router_margin", "0.05"))
+        self.embedding = EmbeddingService()
+        self._lock = threading.Lock()
+        self._prototype_vectors = None
+        self._prototype_routes = None
+        self.route_counts = {route: 0 for route in PROTOTYPES}
+        self.fast_path_ms = 0.0
+        self.supervisor_ms_avg = None
+        self.latency_saved_ms = 0.0
+
+    def _prototypes(self):
+        if self._prototype_vectors is None:
+            with self._lock:
+                if self._prototype_vectors is None:
+                    routes, texts = [], []
+                    for route, examples in PROTOTYPES.items():
+                        routes.extend([route] * len(examples))
+                        texts.extend(examples)
+                    self._prototype_routes = np.asarray(routes)
+                    self._prototype_vectors = self.embedding.encode(texts)
+        return self._prototype_vectors, self._prototype_routes
+
+    def classify(self, query: str) -> str:
+        text = query.strip()
+        if _GREETING_RULE.match(text):
+            return GREETING
+        if _MULTI_PART_RULE.search(text) or len(text.split()) > 20:
+            return SUPERVISOR
+        if _RANDOM_RULE.search(text):
+            return RANDOM_PRODUCT
+
+        vectors, routes = self._prototypes()
+        scores = vectors @ self.embedding.encode([text.lower()])[0]
+        best = {route: float(scores[routes == route].max()) for route in PROTOTYPES}
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        (route, score), (_, runner_up) = ranked[0], ranked[1]
+        if score < self.threshold or score - runner_up < self.margin:
+            return SUPERVISOR
+        if route == PRODUCT_SEARCH and _FILTER_RULE.search(text):
+            return SUPERVISOR
+        return route
+
+    async def aroute(self, query: str) -> str:
+        """Classify off the event loop; any router error falls back to the supervisor"""
+        if not self.enabled:
+            return SUPERVISOR
+        try:
+            route = await asyncio.to_thread(self.classify, query)
+        except Exception as e:
+            logger.error(f"Intent router error: {str(e)}", exc_info=True)
+            route = SUPERVISOR
+        logger.info(f"Intent router: '{query[:50]}' -> {route}")
+        return route
+
+    def record(self, route: str, elapsed_ms: float):
+        """Count a handled turn; fast-path turns are credited with the average supervisor latency they avoided"""
+        self.route_counts[route] = self.route_counts.get(route, 0) + 1
+        if route == SUPERVISOR:
+            self.supervisor_ms_avg = elapsed_ms if self.supervisor_ms_avg is None else 0.9 * self.supervisor_ms_avg + 0.1 * elapsed_ms
+            return
+        self.fast_path_ms += elapsed_ms
+        if self.supervisor_ms_avg is not None:
+            self.latency_saved_ms += max(self.supervisor_ms_avg - elapsed_ms, 0.0)
+
+    def stats(self) -> dict:
+        fast = sum(count for route, count in self.route_counts.items() if route != SUPERVISOR)
+        return {
+            "routes": dict(self.route_counts),
+            "fast_path_avg_ms": round(self.fast_path_ms / fast, 1) if fast else 0.0,
+            "supervisor_avg_ms": round(self.supervisor_ms_avg or 0.0, 1),
+            "latency_saved_ms": round(self.latency_saved_ms, 1),
+        }
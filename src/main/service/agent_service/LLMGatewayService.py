@@ -0,0 +1,445 @@
+import os
+import re
+import json
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+import threading
+from typing import Any, List, Optional
+
+from langchain_groq import ChatGroq
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from src.main.common.Metrics import metrics, observe_span
+from src.main.repository.db_connector import web_concurrency
+
+logger = logging.getLogger(__name__)
+
+# Scheduling priorities, most urgent first
+SUPERVISOR = 0
+TOOL = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {SUPERVISOR: "supervisor", TOOL: "tool", BACKGROUND: "background"}
+
+
+class LLMQueueTimeout(Exception):
+    """No key had request/token headroom for a call before its queue deadline"""
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount) -> float:
+        """Seconds until `amount` is available (0 if it is now)"""
+        return max(0.0, (amount - self.level) / self.rate) if self.rate else float("inf")
+
+
+class _Key:
+    def __init__(self, api_key, rpm, tpm):
+        self.api_key = api_key
+        self.label = f"...{api_key[-4:]}"
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.cooldown_until = 0.0
+        self.calls = 0
+        self.rate_limited = 0
+
+    def headroom(self) -> float:
+        return min(self.requests.level / self.requests.capacity, self.tokens.level / self.tokens.capacity)
+
+
+class _Waiter:
+    def __init__(self, priority, seq, estimate, deadline, loop=None):
+        self.priority = priority
+        self.seq = seq
+        self.estimate = estimate
+        self.deadline = deadline
+        self.key = None
+        self.charged = 0
+        self.cancelled = False
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+        self.event = threading.Event() if loop is None else None
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def grant(self, key, charged):
+        self.key, self.charged = key, charged
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(lambda: self.future.done() or self.future.set_result(key))
+        else:
+            self.event.set()
+
+
+def _env_keys():
+    """Groq keys from `groq_api_keys` (comma-separated), `chat_assistant_api_<n>` and `grop_db_query_model_api_key`"""
+    keys = [key.strip() for key in os.getenv("groq_api_keys", "").split(",")]
+    numbered = sorted((name for name in os.environ if re.fullmatch(r"chat_assistant_api_\d+", name)),
+                      key=lambda name: int(name.rsplit("_", 1)[1]))
+    keys += [os.getenv(name) for name in numbered]
+    keys.append(os.getenv("grop_db_query_model_api_key"))
+    return list(dict.fromkeys(key for key in keys if key))
+
+
+class LLMGateway:
+    """Process-wide pool of Groq keys that every chat model call is scheduled through.
+
+    Each key has token buckets for requests and tokens per minute, sized to
+    this worker's share (`llm_key_rpm`/`llm_key_tpm` divided by the worker
+    count). A call's tokens are estimated with tiktoken before it is sent,
+    it goes to the key with the most headroom, and when no key can take it
+    the call queues by priority (supervisor, then tool, then background)
+    until `llm_queue_timeout_seconds` instead of failing. Actual usage is
+    charged back after the call; a 429 cools the key down and re-queues the
+    call on another one.
+    """
+
+    # Builds one chat model per key; the offline benchmarks swap in a stand-in model
+    chat_model_factory = ChatGroq
+
+    def __init__(self, keys=None):
+        workers, _ = web_concurrency()
+        self.rpm = float(os.getenv("llm_key_rpm", "30")) / workers
+        self.tpm = float(os.getenv("llm_key_tpm", "6000")) / workers
+        self.queue_timeout = float(os.getenv("llm_queue_timeout_seconds", "30"))
+        self.completion_estimate = int(os.getenv("llm_completion_estimate", "256"))
+        self.default_cooldown = float(os.getenv("llm_rate_limit_cooldown_seconds", "5"))
+        self.encoding_name = os.getenv("llm_token_encoding", "cl100k_base")
+        self.keys = [_Key(key, self.rpm, self.tpm) for key in (keys if keys is not None else _env_keys())]
+        self._lock = threading.Lock()
+        self._queue = []
+        self._seq = itertools.count()
+        self._encoding = None
+        self._encoding_failed = False
+        self.calls = 0
+        self.timeouts = 0
+        self.queued = 0
+        self.wait_ms_total = 0.0
+        logger.info(f"LLM gateway with {len(self.keys)} key(s), {self.rpm:g} rpm / {self.tpm:g} tpm each in this worker")
+
+    # Token estimates
+
+    def _get_encoding(self):
+        if self._encoding is None and not self._encoding_failed:
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding(self.encoding_name)
+            except Exception as e:
+                # tiktoken fetches its BPE file on first use; fall back to ~4 characters per token
+                self._encoding_failed = True
+                logger.warning(f"tiktoken encoding {self.encoding_name} unavailable, estimating by length: {str(e)}")
+        return self._encoding
+
+    def count_tokens(self, text: str) -> int:
+        encoding = self._get_encoding()
+        if encoding is None:
+            return len(text) // 4 + 1
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def estimate_tokens(self, messages, tools=None, max_tokens=None) -> int:
+        """Prompt tokens (messages plus tool schemas) and the expected completion"""
+        prompt = sum(self.count_tokens(str(message.content)) + 4 for message in messages)
+        if tools:
+            prompt += self.count_tokens(json.dumps(tools))
+        return prompt + (max_tokens or self.completion_estimate)
+
+    # Scheduling
+
+    def _pick(self, estimate, now):
+        """(key with the most headroom that can take the call now, or None; seconds until one could)"""
+        best, soonest = None, float("inf")
+        for key in self.keys:
+            key.requests.refill(now)
+            key.tokens.refill(now)
+            if key.cooldown_until > now:
+                soonest = min(soonest, key.cooldown_until - now)
+                continue
+            wait = max(key.requests.time_until(1), key.tokens.time_until(min(estimate, key.tokens.capacity)))
+            if wait > 0:
+                soonest = min(soonest, wait)
+            elif best is None or key.headroom() > best.headroom():
+                best = key
+        return best, soonest
+
+    def _dispatch(self, now):
+        """Grant free capacity to waiters in priority order; returns seconds until more frees up"""
+        while self._queue:
+            waiter = self._queue[0]
+            if waiter.cancelled:
+                heapq.heappop(self._queue)
+                continue
+            key, wait = self._pick(waiter.estimate, now)
+            if key is None:
+                return wait
+            heapq.heappop(self._queue)
+            charged = min(waiter.estimate, key.tokens.capacity)
+            key.requests.level -= 1
+            key.tokens.level -= charged
+            key.calls += 1
+            waiter.grant(key, charged)
+        return None
+
+    def _enqueue(self, estimate, priority, timeout, loop=None):
+        if not self.keys:
+            raise LLMQueueTimeout("No Groq API keys configured")
+        now = time.monotonic()
+        waiter = _Waiter(priority, next(self._seq), estimate, now + (timeout or self.queue_timeout), loop)
+        with self._lock:
+            heapq.heappush(self._queue, waiter)
+            retry_in = self._dispatch(now)
+            if waiter.key is None:
+                self.queued += 1
+        return waiter, retry_in
+
+    def _retry(self, waiter):
+        """After a timed wait: dispatch again, or give up once the deadline has passed"""
+        with self._lock:
+            if waiter.key is not None:
+                return None
+            now = time.monotonic()
+            retry_in = self._dispatch(now)
+            if waiter.key is None and now >= waiter.deadline:
+                waiter.cancelled = True
+                self.timeouts += 1
+                raise LLMQueueTimeout(f"No LLM key had headroom for {waiter.estimate} tokens "
+                                      f"within {self.queue_timeout:g}s ({len(self._queue)} calls queued)")
+            return retry_in
+
+    def _granted(self, waiter, started):
+        waited = time.monotonic() - started
+        with self._lock:
+            self.calls += 1
+            self.wait_ms_total += waited * 1000
+        observe_span("llm_queue", waited, priority=PRIORITY_NAMES.get(waiter.priority, str(waiter.priority)))
+        return waiter.key, waiter.charged
+
+    def _wait_for(self, waiter, retry_in):
+        remaining = waiter.deadline - time.monotonic()
+        return max(0.0, min(remaining, retry_in if retry_in is not None else remaining))
+
+    async def acquire(self, estimate, priority=TOOL, timeout=None):
+        """Wait for a key with headroom for `estimate` tokens; returns (key, tokens charged)"""
+        started = time.monotonic()
+        waiter, retry_in = self._enqueue(estimate, priority, timeout, asyncio.get_running_loop())
+        try:
+            while waiter.key is None:
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter.future), self._wait_for(waiter, retry_in))
+                except asyncio.TimeoutError:
+                    retry_in = self._retry(waiter)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        return self._granted(waiter, started)
+
+    def acquire_sync(self, estimate, priority=TOOL, timeout=None):
+        """Blocking counterpart of `acquire` for calls made from worker threads"""
+        started = time.monotonic()
+        waiter, retry_in = self._enqueue(estimate, priority, timeout)
+        try:
+            while waiter.key is None:
+                if not waiter.event.wait(self._wait_for(waiter, retry_in)):
+                    retry_in = self._retry(waiter)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        return self._granted(waiter, started)
+
+    def _abandon(self, waiter):
+        with self._lock:
+            waiter.cancelled = True
+            if waiter.key is not None:
+                # Granted while being cancelled: hand the capacity back
+                self._settle(waiter.key, waiter.charged, 0, refund_request=True)
+
+    def _settle(self, key, charged, used, refund_request=False):
+        key.tokens.level += charged - used
+        if refund_request:
+            key.requests.level += 1
+        self._dispatch(time.monotonic())
+
+    def release(self, key, charged, used=None):
+        """Charge the call's actual token usage (when known) instead of its estimate"""
+        with self._lock:
+            self._settle(key, charged, charged if used is None else used)
+
+    def rate_limited(self, key, error):
+        """Cool a key down after a 429, for the server's Retry-After when given"""
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                retry_after = None
+        with self._lock:
+            key.rate_limited += 1
+            key.cooldown_until = time.monotonic() + (retry_after or self.default_cooldown)
+        logger.warning(f"Groq key {key.label} rate limited, cooling down for {retry_after or self.default_cooldown:g}s")
+
+    # Models
+
+    def chat_model(self, model_name="llama3-70b-8192", temperature=0.7, priority=TOOL, callbacks=None, **kwargs):
+        """Chat model whose calls are scheduled over every key in the pool; `kwargs` go to each key's client"""
+        clients = [
+            self.chat_model_factory(api_key=key.api_key, model_name=model_name, temperature=temperature,
+                                    max_retries=0, **kwargs)
+            for key in self.keys
+        ]
+        return GatewayChatModel(gateway=self, clients=clients, model_name=model_name,
+                                temperature=temperature, priority=priority, callbacks=callbacks)
+
+    def warm(self):
+        """Load the tiktoken encoding ahead of the first call"""
+        self._get_encoding()
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            keys = {}
+            for key in self.keys:
+                key.requests.refill(now)
+                key.tokens.refill(now)
+                keys[key.label] = {
+                    "calls": key.calls,
+                    "rate_limited": key.rate_limited,
+                    "requests_available": round(key.requests.level, 2),
+                    "tokens_available": round(key.tokens.level),
+                    "cooling_down": key.cooldown_until > now,
+                }
+            return {
+                "keys": keys,
+                "calls": self.calls,
+                "queued": self.queued,
+                "queue_depth": sum(1 for waiter in self._queue if not waiter.cancelled),
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self.wait_ms_total / self.calls, 3) if self.calls else 0.0,
+            }
+
+
+def _is_rate_limit(error) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+def _usage(message):
+    usage = getattr(message, "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+
+class GatewayChatModel(BaseChatModel):
+    """Chat model that runs each call on whichever pooled key the gateway grants"""
+
+    gateway: Any
+    clients: List[Any]
+    model_name: str = "llama3-70b-8192"
+    temperature: float = 0.7
+    priority: int = TOOL
+    queue_timeout: Optional[float] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "groq-gateway"
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        if tool_choice:
+            if tool_choice == "any":
+                tool_choice = "required"
+            if isinstance(tool_choice, str) and tool_choice not in ("auto", "none", "required"):
+                tool_choice = {"type": "function", "function": {"name": tool_choice}}
+            kwargs["tool_choice"] = tool_choice
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _client(self, key):
+        return self.clients[self.gateway.keys.index(key)]
+
+    def _estimate(self, messages, kwargs):
+        return self.gateway.estimate_tokens(messages, kwargs.get("tools"), kwargs.get("max_tokens"))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        estimate = self._estimate(messages, kwargs)
+        while True:
+            key, charged = self.gateway.acquire_sync(estimate, self.priority, self.queue_timeout)
+            try:
+                result = self._client(key)._generate(messages, stop=stop, **kwargs)
+            except Exception as e:
+                self.gateway.release(key, charged, 0 if _is_rate_limit(e) else None)
+                if _is_rate_limit(e):
+                    self.gateway.rate_limited(key, e)
+                    continue
+                raise
+            self.gateway.release(key, charged, _usage(result.generations[0].message))
+            return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        estimate = self._estimate(messages, kwargs)
+        while True:
+            key, charged = await self.gateway.acquire(estimate, self.priority, self.queue_timeout)
+            try:
+                result = await self._client(key)._agenerate(messages, stop=stop, **kwargs)
+            except Exception as e:
+                self.gateway.release(key, charged, 0 if _is_rate_limit(e) else None)
+                if _is_rate_limit(e):
+                    self.gateway.rate_limited(key, e)
+                    continue
+                raise
+            self.gateway.release(key, charged, _usage(result.generations[0].message))
+            return result
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        estimate = self._estimate(messages, kwargs)
+        while True:
+            key, charged = await self.gateway.acquire(estimate, self.priority, self.queue_timeout)
+            client = self._client(key)
+            used, started, retry = None, False, False
+            try:
+                if type(client)._astream is BaseChatModel._astream:
+                    # Client without native streaming: one chunk with the whole answer
+                    result = await client._agenerate(messages, stop=stop, **kwargs)
+                    message = result.generations[0].message
+                    used = _usage(message)
+                    started = True
+                    yield ChatGenerationChunk(message=AIMessageChunk(**message.model_dump(exclude={"type"})))
+                else:
+                    async for chunk in client._astream(messages, stop=stop, **kwargs):
+                        started = True
+                        used = _usage(chunk.message) or used
+                        yield chunk
+            except Exception as e:
+                # Only a call that failed before its first chunk can move to another key
+                retry = _is_rate_limit(e) and not started
+                if not retry:
+                    raise
+                used = 0
+                self.gateway.rate_limited(key, e)
+            finally:
+                # Also runs when the consumer stops reading early
+                self.gateway.release(key, charged, used)
+            if not retry:
+                return
+
+
+def _gateway_gauge():
+    stats = llm_gateway.stats()
+    samples = [({"key": label, "stat": stat}, float(value))
+               for label, key_stats in stats["keys"].items() for stat, value in key_stats.items()]
+    samples.append(({"key": "", "stat": "queue_depth"}, stats["queue_depth"]))
+    return samples
+
+
+llm_gateway = LLMGateway()
+
+metrics.gauge("shop_llm_gateway", "LLM key pool headroom and queue state", _gateway_gauge)
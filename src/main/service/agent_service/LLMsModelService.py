@@ -2,41 +2,106 @@ import os
 import logging
 from dotenv import load_dotenv
 from langchain_community.utilities import SQLDatabase
+from langchain_community.tools.sql_database.tool import QuerySQLDatabaseTool, InfoSQLDatabaseTool
 from langchain.agents import create_sql_agent
 from langchain.agents.agent_toolkits import SQLDatabaseToolkit
-from langchain_groq import ChatGroq
+from src.main.repository.db_connector import get_engine
+from src.main.common.Instrumentation import llm_metrics_callback
 from src.main.service.agent_service import AgentToolsService as tool
+from src.main.service.agent_service.SchemaContextService import SchemaContextService
+from src.main.service.agent_service.LLMGatewayService import llm_gateway, SUPERVISOR, TOOL
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 logger.info("Initializing Groq Agent")
 load_dotenv()
-api_token_groq = os.getenv("chat_assistant_api_1")
 db_api = os.getenv("db_info")
 
 logger.info(f"Using Groq model: llama3-70b-8192")
 
+SCHEMA_CONTEXT_PREFIX = """You are an agent designed to interact with a {dialect} database.
+The schema of the tables relevant to the question, with sample values and join hints, is given in the question.
+Do not look up tables or schemas: write one syntactically correct {dialect} query from that schema and run it with sql_db_query.
+Only if the query fails because the given schema is incomplete, use sql_db_schema for the tables you need and retry.
+Never query for all the columns from a specific table, only ask for the relevant columns given the question.
+DO NOT make any DML statements (INSERT, UPDATE, DELETE, DROP etc.) to the database.
+
+You have access to the following tools:"""
+
+SCHEMA_CONTEXT_SUFFIX = """Begin!
+
+Question: {input}
+Thought: The relevant schema is already given, so I should write the query and run it.
+{agent_scratchpad}"""
+
+
+class SchemaContextToolkit(SQLDatabaseToolkit):
+    """SQL toolkit without the exploration tools made redundant by a precomputed schema context"""
+
+    def get_tools(self):
+        return [t for t in super().get_tools() if isinstance(t, (QuerySQLDatabaseTool, InfoSQLDatabaseTool))]
+
 
 class LLMsModelService:
-    def __init__(self):
-        self.llm_query = ChatGroq(api_key=api_token_groq, model_name="llama3-70b-8192", temperature=0.4)
-        self.llm = ChatGroq(api_key=api_token_groq, model_name="llama3-70b-8192", temperature=0.7)
-        self.db = SQLDatabase.from_uri(db_api)
+    def __init__(self, db: SQLDatabase = None, engine=None):
+        # Both are scheduled over the shared Groq key pool; the supervisor goes ahead of tool calls
+        self.llm_query = llm_gateway.chat_model(model_name="llama3-70b-8192", temperature=0.4, priority=TOOL,
+                                                callbacks=[llm_metrics_callback])
+        self.llm = llm_gateway.chat_model(model_name="llama3-70b-8192", temperature=0.7, priority=SUPERVISOR,
+                                          callbacks=[llm_metrics_callback])
+        # The engine behind `db`, for the direct queries that bypass SQLDatabase
+        self.engine = engine if engine is not None else get_engine(db_api)
+        self.db = db if db is not None else SQLDatabase(self.engine)
         self.toolkit = SQLDatabaseToolkit(db=self.db, llm=self.llm_query)
-        self.agent_executor = create_sql_agent(llm=self.llm_query, toolkit=self.toolkit, verbose=False)
-        
+        self.agent_executor = create_sql_agent(
+            llm=self.llm_query, toolkit=self.toolkit, verbose=False,
+            agent_executor_kwargs={"return_intermediate_steps": True},
+        )
+        self.schema_context = SchemaContextService(self.db, self.engine)
+        self.schema_context_enabled = os.getenv("sql_agent_schema_context", "true").lower() == "true"
+        self.schema_agent_executor = create_sql_agent(
+            llm=self.llm_query, toolkit=SchemaContextToolkit(db=self.db, llm=self.llm_query), verbose=False,
+            prefix=SCHEMA_CONTEXT_PREFIX, suffix=SCHEMA_CONTEXT_SUFFIX,
+            agent_executor_kwargs={"return_intermediate_steps": True},
+        )
+        # Tool steps taken by the SQL agent per mode: [queries, steps]
+        self.agent_steps = {"exploring": [0, 0], "schema_context": [0, 0]}
+        self._llm_with_tools = None
+
+    @property
+    def llm_with_tools(self):
+        """Supervisor LLM with the graph tools bound, built on first use"""
+        # Bound lazily: AgentToolsService is only partially imported while this class is first constructed
+        if self._llm_with_tools is None:
+            tools = [tool.search_products_tool, tool.query_database_tool]
+            self._llm_with_tools = self.llm.bind_tools(tools)
+        return self._llm_with_tools
+
     # Add async methods
     async def ainvoke_llm(self, messages):
         """Invoke the LLM asynchronously"""
-        tools = [tool.query_database_tool]
-        llm_with_tools = self.llm.bind_tools(tools)
-        return await llm_with_tools.ainvoke(messages)
+        return await self.llm_with_tools.ainvoke(messages)
     
     async def ainvoke_llm_query(self, messages):
         """Invoke the query LLM asynchronously"""
         return await self.llm_query.ainvoke(messages)
     
-    async def ainvoke_agent(self, input_data):
-        """Invoke the agent executor asynchronously"""
-        return await self.agent_executor.ainvoke(input_data)
\ No newline at end of file
+    async def ainvoke_agent(self, input_data, use_schema_context=None):
+        """Invoke the SQL agent asynchronously, with the pruned schema context unless disabled"""
+        if use_schema_context is None:
+            use_schema_context = self.schema_context_enabled
+        mode = "schema_context" if use_schema_context else "exploring"
+        executor = self.schema_agent_executor if use_schema_context else self.agent_executor
+        response = await executor.ainvoke(input_data)
+        steps = len(response.get("intermediate_steps", []))
+        self.agent_steps[mode][0] += 1
+        self.agent_steps[mode][1] += steps
+        logger.debug(f"SQL agent ({mode}) finished in {steps} tool steps")
+        return response
+
+    def agent_step_stats(self) -> dict:
+        """Average SQL agent tool steps per query for each mode (LLM calls = steps + 1)"""
+        return {
+            mode: {"queries": queries, "avg_steps": round(steps / queries, 2) if queries else 0.0}
+            for mode, (queries, steps) in self.agent_steps.items()
+        }
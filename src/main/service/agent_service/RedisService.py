@@ -1,6 +1,6 @@
 import os
-import redis.asyncio as redis
 import logging
+from src.main.common.Instrumentation import InstrumentedAsyncRedis
 
 logger = logging.getLogger(__name__)
 
@@ -8,8 +8,15 @@ class RediceService:
     def __init__(self):
         self.db_api = os.getenv("db_info")
         self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-        logger.info(f"Connecting to Redis at {self.redis_url}")
-        self.redis_client = redis.Redis.from_url(self.redis_url, decode_responses=True)
+        self._redis_client = None
+
+    @property
+    def redis_client(self):
+        # Created on first use so module-level services can be imported before fork
+        if self._redis_client is None:
+            logger.info(f"Connecting to Redis at {self.redis_url}")
+            self._redis_client = InstrumentedAsyncRedis.from_url(self.redis_url, decode_responses=True)
+        return self._redis_client
     
     async def get(self, key):
         """Get a value from Redis asynchronously"""
@@ -36,3 +43,44 @@ class RediceService:
         except Exception as e:
             logger.error(f"Redis delete error: {str(e)}", exc_info=True)
             return False
+
+    async def lrange_and_expire(self, key, start=0, end=-1, ex=3600):
+        """Read a list range and refresh its TTL in one pipelined round trip"""
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.lrange(key, start, end)
+                pipe.expire(key, ex)
+                values, _ = await pipe.execute()
+            return values
+        except Exception as e:
+            logger.error(f"Redis lrange error: {str(e)}", exc_info=True)
+            return []
+
+    async def lrange_len_and_expire(self, key, start=0, end=-1, ex=3600):
+        """Read a list range together with the list length and refresh its TTL in one round trip"""
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.lrange(key, start, end)
+                pipe.llen(key)
+                pipe.expire(key, ex)
+                values, length, _ = await pipe.execute()
+            return values, length
+        except Exception as e:
+            logger.error(f"Redis lrange error: {str(e)}", exc_info=True)
+            return [], 0
+
+    async def rpush_trim_expire(self, key, values, max_len=None, ex=3600):
+        """Append values, cap the list to its last `max_len` items and refresh its TTL in one round trip"""
+        if not values:
+            return True
+        try:
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.rpush(key, *values)
+                if max_len:
+                    pipe.ltrim(key, -max_len, -1)
+                pipe.expire(key, ex)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Redis rpush error: {str(e)}", exc_info=True)
+            return False
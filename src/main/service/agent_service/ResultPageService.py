@@ -0,0 +1,78 @@
+import os
+import base64
+import secrets
+import logging
+import orjson
+
+from src.main.service.agent_service.RedisService import RediceService
+
+logger = logging.getLogger(__name__)
+
+
+class ResultPageService:
+    """Server-side pagination of product results behind opaque cursors.
+
+    Tools hand back only the first page; the full ordered rows (capped at
+    `result_max_rows`) are kept in a Redis list so later pages are an LRANGE
+    away, without another LLM call. A cursor encodes the list token and the
+    offset of the next page.
+    """
+
+    prefix = "page:"
+
+    def __init__(self, redis=None):
+        self.redis = redis or RediceService()
+        self.page_size = int(os.getenv("result_page_size", "20"))
+        self.max_rows = int(os.getenv("result_max_rows", "1000"))
+        self.ttl = int(os.getenv("result_cursor_ttl", os.getenv("session_ttl", "3600")))
+
+    @staticmethod
+    def encode_cursor(token: str, offset: int) -> str:
+        return base64.urlsafe_b64encode(f"{token}:{offset}".encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str):
+        """Return (token, offset), or None for a malformed cursor"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+            token, offset = raw.split(":", 1)
+            offset = int(offset)
+        except (ValueError, UnicodeDecodeError):
+            return None
+        if not token.isascii() or offset < 0:
+            return None
+        return token, offset
+
+    async def paginate(self, rows):
+        """Split rows into the first page and a cursor for the rest (None when everything fits)"""
+        rows = rows[:self.max_rows]
+        if len(rows) <= self.page_size:
+            return rows, None, len(rows)
+
+        token = secrets.token_urlsafe(12)
+        stored = await self.redis.rpush_trim_expire(
+            f"{self.prefix}{token}", [orjson.dumps(row).decode() for row in rows], ex=self.ttl,
+        )
+        if not stored:
+            logger.warning(f"Could not store {len(rows)} result rows, returning the first page only")
+            return rows[:self.page_size], None, len(rows)
+        return rows[:self.page_size], self.encode_cursor(token, self.page_size), len(rows)
+
+    async def page(self, cursor: str, page_size: int = None):
+        """Fetch the page a cursor points at; None if the cursor is invalid or expired"""
+        decoded = self.decode_cursor(cursor)
+        if decoded is None:
+            return None
+        token, offset = decoded
+        page_size = max(1, min(int(page_size), self.max_rows)) if page_size else self.page_size
+
+        key = f"{self.prefix}{token}"
+        values, total = await self.redis.lrange_len_and_expire(key, offset, offset + page_size - 1, ex=self.ttl)
+        if not total:
+            return None
+        end = offset + len(values)
+        return {
+            "result": [orjson.loads(value) for value in values],
+            "next_cursor": self.encode_cursor(token, end) if end < total else None,
+            "total": total,
+        }
@@ -0,0 +1,146 @@
+import os
+import re
+import time
+import zlib
+import hashlib
+import logging
+import threading
+from langchain_community.utilities import SQLDatabase
+
+from src.main.common.Instrumentation import InstrumentedRedis
+from src.main.service.CatalogVersionService import CatalogVersionService
+
+logger = logging.getLogger(__name__)
+
+_NON_DETERMINISTIC = re.compile(r"\b(rand|random|uuid|now|current_timestamp|sysdate)\s*\(")
+_QUOTED = re.compile(r"""('(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.)*"|`[^`]*`)""")
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and keyword case outside quoted literals so equivalent statements share a key"""
+    parts = _QUOTED.split(sql.strip().rstrip(";"))
+    for index in range(0, len(parts), 2):
+        parts[index] = re.sub(r"\s+", " ", parts[index]).lower()
+    return "".join(parts).strip()
+
+
+class SQLResultCacheService:
+    """Result cache for agent-generated SELECTs, shared across workers through Redis.
+
+    Keys combine the normalized SQL with the catalog version stamp, so a
+    catalog sync that bumps the version makes every older entry unreachable;
+    they then age out by TTL. Results above `compress_min_bytes` are stored
+    zlib-compressed. Hit/miss and byte counters are kept per process, so
+    reporting them costs no Redis round trip.
+    """
+
+    prefix = "sqlcache:"
+    _COUNTERS = ("hits", "misses", "bytes_saved", "bytes_stored", "compression_saved")
+
+    def __init__(self):
+        self.enabled = os.getenv("sql_cache_enabled", "true").lower() == "true"
+        self.ttl = int(os.getenv("sql_cache_ttl", "3600"))
+        self.compress_min_bytes = int(os.getenv("sql_cache_compress_min_bytes", "1024"))
+        self.max_bytes = int(os.getenv("sql_cache_max_bytes", str(8 * 1024 * 1024)))
+        self.version_refresh_seconds = float(os.getenv("sql_cache_version_refresh_seconds", "2"))
+        self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+        self.catalog_version = CatalogVersionService()
+        self._client = None
+        self._version = 0
+        self._version_read_at = 0.0
+        self._stats_lock = threading.Lock()
+        self.counters = dict.fromkeys(self._COUNTERS, 0)
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = InstrumentedRedis.from_url(self.redis_url)
+        return self._client
+
+    def _current_version(self):
+        # The version only moves on catalog syncs; avoid a Redis round trip per query
+        now = time.monotonic()
+        if now - self._version_read_at > self.version_refresh_seconds:
+            self._version = self.catalog_version.get_version()
+            self._version_read_at = now
+        return self._version
+
+    def key(self, sql, variant=""):
+        digest = hashlib.sha1(f"{variant}|{normalize_sql(sql)}".encode()).hexdigest()
+        return f"{self.prefix}v{self._current_version()}:{digest}"
+
+    @staticmethod
+    def is_cacheable(sql) -> bool:
+        if not isinstance(sql, str):
+            return False
+        normalized = normalize_sql(sql)
+        return normalized.startswith(("select", "with", "(select")) and not _NON_DETERMINISTIC.search(normalized)
+
+    def get(self, key):
+        try:
+            value = self.client.get(key)
+        except Exception as e:
+            logger.error(f"SQL cache get error: {str(e)}", exc_info=True)
+            return None
+        if value is None:
+            self._count(misses=1)
+            return None
+        raw = zlib.decompress(value[1:]) if value[:1] == b"z" else value[1:]
+        self._count(hits=1, bytes_saved=len(raw))
+        return raw.decode()
+
+    def set(self, key, result: str):
+        raw = result.encode()
+        if len(raw) > self.max_bytes:
+            return False
+        value = b"z" + zlib.compress(raw, 6) if len(raw) >= self.compress_min_bytes else b"r" + raw
+        try:
+            self.client.set(key, value, ex=self.ttl)
+            self._count(bytes_stored=len(value), compression_saved=len(raw) + 1 - len(value))
+            return True
+        except Exception as e:
+            logger.error(f"SQL cache set error: {str(e)}", exc_info=True)
+            return False
+
+    def _count(self, **fields):
+        # Called from the SQL tool threads
+        with self._stats_lock:
+            for field, amount in fields.items():
+                self.counters[field] += amount
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            counters = dict(self.counters)
+        hits, misses = counters["hits"], counters["misses"]
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "bytes_saved": counters["bytes_saved"],
+            "bytes_stored": counters["bytes_stored"],
+            "compression_saved": counters["compression_saved"],
+        }
+
+
+class CachedSQLDatabase(SQLDatabase):
+    """SQLDatabase whose SELECT results are served from the shared SQL result cache"""
+
+    def __init__(self, *args, result_cache=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.result_cache = result_cache or SQLResultCacheService()
+
+    def run(self, command, fetch="all", include_columns=False, *, parameters=None, execution_options=None):
+        cache = self.result_cache
+        if not cache.enabled or fetch == "cursor" or parameters or not cache.is_cacheable(command):
+            return super().run(command, fetch, include_columns, parameters=parameters, execution_options=execution_options)
+
+        key = cache.key(command, f"{fetch}:{int(include_columns)}")
+        cached = cache.get(key)
+        if cached is not None:
+            logger.debug(f"SQL cache hit for: {command[:80]}")
+            return cached
+
+        result = super().run(command, fetch, include_columns, parameters=parameters, execution_options=execution_options)
+        if isinstance(result, str):
+            cache.set(key, result)
+        return result
@@ -0,0 +1,144 @@
+import os
+import re
+import logging
+import threading
+import sqlalchemy as sa
+
+logger = logging.getLogger(__name__)
+
+# Columns every product answer needs, kept whenever their table is included
+KEY_COLUMNS = {"id", "shopify_id", "title", "product_id"}
+# Free-text columns worth keeping for LIKE matching even when the query does not name them
+SEARCH_COLUMNS = {"title", "description", "tags", "product_type", "type", "color", "vendor"}
+SAMPLE_SKIP = {"id", "title", "handle", "sku", "description", "body_html", "image_url", "src"}
+
+
+def _tokens(text: str):
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return {word[:-1] if len(word) > 3 and word.endswith("s") else word for word in words}
+
+
+class SchemaContextService:
+    """Precomputed, per-query pruned schema description for SQL generation.
+
+    Table and column descriptions, a few distinct values of low-cardinality
+    text columns and join hints are computed once from the SQLAlchemy
+    inspector. `render` keeps only the tables and columns relevant to a
+    question so the SQL agent can skip its list-tables/schema exploration.
+    """
+
+    def __init__(self, db, engine):
+        self.db = db
+        self.engine = engine
+        self.sample_limit = int(os.getenv("schema_context_sample_values", "12"))
+        self.product_table = os.getenv("schema_context_product_table", "products")
+        self._lock = threading.Lock()
+        self._tables = None
+
+    def _sample_values(self, conn, table, column):
+        query = sa.text(f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL LIMIT {self.sample_limit + 1}")
+        try:
+            values = [str(row[0]) for row in conn.execute(query)]
+        except Exception as e:
+            logger.debug(f"Skipping sample values for {table}.{column}: {e}")
+            return []
+        if len(values) > self.sample_limit or any(len(value) > 40 for value in values):
+            return []
+        return values
+
+    def build(self):
+        """Inspect the database once; safe to call repeatedly"""
+        if self._tables is not None:
+            return self._tables
+        with self._lock:
+            if self._tables is not None:
+                return self._tables
+
+            engine = self.engine
+            inspector = sa.inspect(engine)
+            names = sorted(self.db.get_usable_table_names())
+            tables = {}
+            with engine.connect() as conn:
+                for name in names:
+                    primary = set(inspector.get_pk_constraint(name).get("constrained_columns") or [])
+                    columns = []
+                    for column in inspector.get_columns(name):
+                        type_name = column["type"].__class__.__name__.upper()
+                        samples = []
+                        if isinstance(column["type"], (sa.String, sa.Enum)) and column["name"] not in SAMPLE_SKIP:
+                            samples = self._sample_values(conn, name, column["name"])
+                        columns.append({
+                            "name": column["name"],
+                            "type": type_name,
+                            "pk": column["name"] in primary,
+                            "samples": samples,
+                        })
+                    joins = [
+                        f"{name}.{local} = {fk['referred_table']}.{remote}"
+                        for fk in inspector.get_foreign_keys(name)
+                        for local, remote in zip(fk["constrained_columns"], fk["referred_columns"])
+                    ]
+                    tables[name] = {"columns": columns, "joins": joins}
+
+            # Views carry no foreign keys; infer <x>_id -> <x>s.id
+            for name, table in tables.items():
+                for column in table["columns"]:
+                    if column["name"].endswith("_id") and column["name"] != "shopify_id":
+                        stem = column["name"][:-3]
+                        for target in (f"{stem}s", f"{stem}s_synonym", stem):
+                            hint = f"{name}.{column['name']} = {target}.id"
+                            if target in tables and target != name and hint not in table["joins"]:
+                                table["joins"].append(hint)
+                                break
+
+            self._tables = tables
+            logger.info(f"Schema context built for {len(tables)} tables")
+            return tables
+
+    def _relevant(self, question):
+        tokens = _tokens(question)
+        tables = self.build()
+        scores = {}
+        for name, table in tables.items():
+            score = 2 * len(_tokens(name) & tokens)
+            for column in table["columns"]:
+                score += len(_tokens(column["name"]) & tokens)
+                score += sum(1 for value in column["samples"] if _tokens(value) & tokens)
+            scores[name] = score
+
+        selected = {name for name, score in scores.items() if score > 0}
+        if self.product_table in tables:
+            selected.add(self.product_table)
+        return selected, tokens
+
+    def render(self, question: str) -> str:
+        """Compact schema description pruned to the tables and columns relevant to the question"""
+        tables = self.build()
+        selected, tokens = self._relevant(question)
+        lines = []
+        for name in sorted(selected):
+            parts = []
+            for column in tables[name]["columns"]:
+                keep = (
+                    column["pk"]
+                    or column["name"] in KEY_COLUMNS
+                    or column["name"] in SEARCH_COLUMNS
+                    or column["name"].endswith("_id")
+                    or _tokens(column["name"]) & tokens
+                    or any(_tokens(value) & tokens for value in column["samples"])
+                )
+                if not keep:
+                    continue
+                text = f"{column['name']} {column['type']}{' PK' if column['pk'] else ''}"
+                if column["samples"]:
+                    text += " [" + ", ".join(repr(value) for value in column["samples"]) + "]"
+                parts.append(text)
+            lines.append(f"{name}({', '.join(parts)})")
+
+        joins = sorted({
+            join for name in selected for join in tables[name]["joins"]
+            if join.split(" = ")[1].split(".")[0] in selected
+        })
+        if joins:
+            lines.append("Joins: " + "; ".join(joins))
+        return "\n".join(lines)
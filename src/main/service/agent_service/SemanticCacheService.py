@@ -0,0 +1,182 @@
+import os
+import re
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from src.main.service.EmbeddingService import EmbeddingService
+
+logger = logging.getLogger(__name__)
+
+# Tokens that change which products answer a query; embeddings barely separate them
+_COMPARATORS = {
+    "under": "<", "below": "<", "less": "<", "cheaper": "<", "max": "<", "maximum": "<", "within": "<",
+    "over": ">", "above": ">", "more": ">", "min": ">", "minimum": ">", "least": ">",
+    "between": "between", "exactly": "=",
+}
+_SIZES = {
+    "xxs", "xs", "s", "m", "l", "xl", "xxl", "xxxl", "2xl", "3xl",
+    "small", "medium", "large", "petite", "plus", "tall", "short", "wide", "narrow", "size",
+}
+_COLORS = {
+    "red", "blue", "black", "white", "green", "pink", "beige", "navy", "grey", "gray", "yellow", "orange",
+    "purple", "violet", "brown", "tan", "gold", "silver", "cream", "ivory", "khaki", "olive", "maroon",
+    "burgundy", "teal", "turquoise", "coral", "lavender", "charcoal", "multicolor",
+}
+_NUMBER = re.compile(r"^\$?(\d+(?:\.\d+)?)(k)?\.?$")
+
+
+def filter_signature(normalized: str) -> tuple:
+    """Numbers, price comparators, sizes and colors in a normalized query, as a comparable tuple"""
+    tokens = set()
+    for word in normalized.replace(",", "").split():
+        number = _NUMBER.match(word)
+        if number:
+            value = float(number.group(1)) * (1000 if number.group(2) else 1)
+            tokens.add(f"#{value:g}")
+        elif word in _COMPARATORS:
+            tokens.add(_COMPARATORS[word])
+        elif word in _SIZES or word in _COLORS:
+            tokens.add(word)
+    return tuple(sorted(tokens))
+
+
+class SemanticCacheService:
+    """In-process cache of final agent payloads keyed by a normalized query embedding.
+
+    Entries are matched by cosine similarity above `threshold` and must also
+    have the same `filter_signature` (numbers, price bounds, sizes, colors)
+    as the query, since "shoes under $50" and "shoes under $500" embed
+    almost identically. They expire after `ttl` seconds, are evicted
+    least-recently-used beyond `max_entries`, and are dropped wholesale when
+    the catalog version changes.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("semantic_cache_enabled", "true").lower() == "true"
+        self.threshold = float(os.getenv("semantic_cache_threshold", "0.9"))
+        self.ttl = int(os.getenv("semantic_cache_ttl", "3600"))
+        self.max_entries = int(os.getenv("semantic_cache_max_entries", "5000"))
+        # Nearest entries checked for a matching filter signature
+        self.candidates = int(os.getenv("semantic_cache_candidates", "5"))
+        self.embedding = EmbeddingService()
+        self._lock = threading.Lock()
+        self._index = None
+        self._entries = OrderedDict()  # entry id -> (normalized query, payload, stored_at, filter signature)
+        self._next_id = 0
+        self._catalog_version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.filter_mismatches = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        query = re.sub(r"[^\w\s$.]", " ", query.lower())
+        return re.sub(r"\s+", " ", query).strip()
+
+    def _new_index(self, dimension):
+        import faiss
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+
+    def _remove(self, entry_ids):
+        if not entry_ids:
+            return
+        for entry_id in entry_ids:
+            self._entries.pop(entry_id, None)
+        self._index.remove_ids(np.asarray(entry_ids, dtype=np.int64))
+
+    def _check_version(self, catalog_version):
+        if catalog_version != self._catalog_version:
+            if self._entries:
+                logger.info(f"Catalog version changed to {catalog_version}, invalidating semantic cache")
+            self._catalog_version = catalog_version
+            self._entries.clear()
+            if self._index is not None:
+                self._index.reset()
+
+    def invalidate(self):
+        """Drop every cached payload"""
+        with self._lock:
+            self._entries.clear()
+            if self._index is not None:
+                self._index.reset()
+
+    def lookup(self, query: str, catalog_version=0):
+        """Return the cached payload for a semantically equivalent query with the same filters, or None"""
+        normalized = self.normalize(query)
+        signature = filter_signature(normalized)
+        vector = self.embedding.encode([normalized])
+        with self._lock:
+            self._check_version(catalog_version)
+            if self._index is None or self._index.ntotal == 0:
+                self.misses += 1
+                return None
+
+            scores, ids = self._index.search(vector, min(self.candidates, self._index.ntotal))
+            for score, entry_id in zip(scores[0].tolist(), ids[0].tolist()):
+                entry = self._entries.get(entry_id)
+                if entry is None or score < self.threshold:
+                    break
+                if entry[3] != signature:
+                    self.filter_mismatches += 1
+                    continue
+                if time.time() - entry[2] > self.ttl:
+                    self._remove([entry_id])
+                    continue
+
+                self._entries.move_to_end(entry_id)
+                self.hits += 1
+                logger.info(f"Semantic cache hit ({score:.3f}): '{query[:50]}' ~ '{entry[0][:50]}'")
+                return entry[1]
+
+            self.misses += 1
+            return None
+
+    def store(self, query: str, payload: dict, catalog_version=0):
+        """Cache the final payload for a query"""
+        normalized = self.normalize(query)
+        vector = self.embedding.encode([normalized])
+        with self._lock:
+            self._check_version(catalog_version)
+            if self._index is None:
+                self._index = self._new_index(vector.shape[1])
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(vector, np.asarray([entry_id], dtype=np.int64))
+            self._entries[entry_id] = (normalized, payload, time.time(), filter_signature(normalized))
+
+            overflow = len(self._entries) - self.max_entries
+            if overflow > 0:
+                self._remove(list(self._entries.keys())[:overflow])
+                self.evictions += overflow
+
+    async def alookup(self, query: str, catalog_version=0):
+        """Lookup off the event loop; cache errors count as a miss"""
+        try:
+            return await asyncio.to_thread(self.lookup, query, catalog_version)
+        except Exception as e:
+            logger.error(f"Semantic cache lookup error: {str(e)}", exc_info=True)
+            return None
+
+    async def astore(self, query: str, payload: dict, catalog_version=0):
+        try:
+            await asyncio.to_thread(self.store, query, payload, catalog_version)
+        except Exception as e:
+            logger.error(f"Semantic cache store error: {str(e)}", exc_info=True)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "size": len(self._entries),
+            "evictions": self.evictions,
+            "filter_mismatches": self.filter_mismatches,
+        }
@@ -0,0 +1,150 @@
+import os
+import logging
+import orjson
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage
+
+from src.main.service.agent_service.RedisService import RediceService
+
+logger = logging.getLogger(__name__)
+
+
+def encode_message(message) -> str:
+    """Compact orjson encoding of one chat message"""
+    if isinstance(message, HumanMessage):
+        data = {"t": "h", "c": message.content}
+    elif isinstance(message, AIMessage):
+        data = {"t": "a", "c": message.content}
+        if message.tool_calls:
+            data["tc"] = [[call["name"], call["args"], call["id"]] for call in message.tool_calls]
+    elif isinstance(message, ToolMessage):
+        data = {"t": "t", "c": message.content, "i": message.tool_call_id}
+        if message.name:
+            data["n"] = message.name
+    elif isinstance(message, SystemMessage):
+        data = {"t": "s", "c": message.content}
+    else:
+        data = {"t": "h", "c": str(getattr(message, "content", message))}
+    return orjson.dumps(data).decode()
+
+
+def decode_message(value):
+    return _message(orjson.loads(value))
+
+
+def _message(data):
+    kind = data["t"]
+    if kind == "a":
+        tool_calls = [{"name": name, "args": args, "id": call_id} for name, args, call_id in data.get("tc", [])]
+        return AIMessage(content=data["c"], tool_calls=tool_calls)
+    if kind == "t":
+        return ToolMessage(content=data["c"], tool_call_id=data["i"], name=data.get("n"))
+    if kind == "s":
+        return SystemMessage(content=data["c"])
+    return HumanMessage(content=data["c"])
+
+
+def _legacy_message(data):
+    """Message from the JSON history kept under the bare session id before the per-turn list"""
+    kind = data.get("type")
+    if kind == "human":
+        return HumanMessage(content=data["content"])
+    if kind == "ai":
+        # Tool results were never stored, so the tool calls are dropped with them
+        return AIMessage(content=data["content"])
+    if kind == "system":
+        return SystemMessage(content=data["content"])
+    return None
+
+
+def split_turns(messages):
+    """Group messages into turns, each starting at a user message; anything before the first is dropped"""
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            turns.append([message])
+        elif turns:
+            turns[-1].append(message)
+    return turns
+
+
+class SessionHistoryService:
+    """Per-session chat history kept as a Redis list with one element per turn.
+
+    A turn is the user message plus every message the agent added answering
+    it, so capping the list to its last `session_max_turns` elements never
+    separates a tool result from its tool call. `session_max_messages` then
+    bounds what is loaded, again dropping whole turns only.
+    """
+
+    prefix = "history:"
+
+    def __init__(self, redis=None):
+        self.redis = redis or RediceService()
+        self.ttl = int(os.getenv("session_ttl", "3600"))
+        self.max_turns = int(os.getenv("session_max_turns", "20"))
+        self.max_messages = int(os.getenv("session_max_messages", "40"))
+
+    def _key(self, session_id):
+        return f"{self.prefix}{session_id}"
+
+    @staticmethod
+    def _encode_turn(messages):
+        return "[" + ",".join(encode_message(message) for message in messages) + "]"
+
+    @staticmethod
+    def _decode_turn(value):
+        data = orjson.loads(value)
+        return [_message(item) for item in data] if isinstance(data, list) else [_message(data)]
+
+    async def load(self, session_id):
+        """Load the stored history as message objects, refreshing the session TTL"""
+        values = await self.redis.lrange_and_expire(self._key(session_id), 0, -1, ex=self.ttl)
+        if values:
+            turns = split_turns(message for value in values for message in self._decode_turn(value))
+        else:
+            turns = await self._migrate_legacy(session_id)
+
+        # Newest turns first until the message budget runs out; the latest turn is always kept
+        kept, count = [], 0
+        for turn in reversed(turns):
+            if kept and count + len(turn) > self.max_messages:
+                break
+            kept.append(turn)
+            count += len(turn)
+        return [message for turn in reversed(kept) for message in turn]
+
+    async def _migrate_legacy(self, session_id):
+        """Move a session stored under the bare session id by earlier releases into the turn list"""
+        legacy = await self.redis.get(session_id)
+        if not legacy:
+            return []
+        try:
+            data = orjson.loads(legacy)
+            messages = [message for message in map(_legacy_message, data) if message is not None]
+        except (orjson.JSONDecodeError, TypeError, KeyError, AttributeError) as e:
+            logger.warning(f"[{session_id}] Ignoring unreadable legacy history: {str(e)}")
+            return []
+
+        turns = split_turns(messages)[-self.max_turns:]
+        if turns:
+            await self.redis.rpush_trim_expire(
+                self._key(session_id), [self._encode_turn(turn) for turn in turns], max_len=self.max_turns, ex=self.ttl
+            )
+        await self.redis.delete(session_id)
+        logger.info(f"[{session_id}] Migrated {len(turns)} legacy history turns")
+        return turns
+
+    async def append(self, session_id, messages):
+        """Append this turn's messages, starting with the user message, as one element and cap the turns kept"""
+        if not messages:
+            return True
+        return await self.redis.rpush_trim_expire(
+            self._key(session_id),
+            [self._encode_turn(messages)],
+            max_len=self.max_turns,
+            ex=self.ttl,
+        )
+
+    async def clear(self, session_id):
+        await self.redis.delete(session_id)
+        return await self.redis.delete(self._key(session_id))
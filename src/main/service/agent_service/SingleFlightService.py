@@ -0,0 +1,235 @@
+import os
+import re
+import uuid
+import asyncio
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+
+import orjson
+
+from src.main.service.agent_service.RedisService import RediceService
+from src.main.common.Metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+single_flight_calls = metrics.counter(
+    "shop_single_flight_total", "Single-flight calls by namespace and outcome (leader, local, remote, fallback)"
+)
+
+# Published instead of a result when the leader gives up, so waiters stop early
+_ABANDONED = ""
+
+
+def normalize_key(text: str) -> str:
+    text = re.sub(r"[^\w\s$.|]", " ", text.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class Flight:
+    """One caller's share of an in-flight call.
+
+    Every caller awaits `wait` first: it returns the shared value, or None
+    when the caller should compute the value itself. Leaders then `finish`
+    with the value (or `abandon` on failure).
+    """
+
+    def __init__(self, service, namespace, key, future, leader):
+        self.service = service
+        self.namespace = namespace
+        self.key = key
+        self.future = future
+        self.leader = leader
+        # Set while another worker holds the Redis lock for this key
+        self.remote = False
+        self.token = None
+        self.done = False
+
+    async def wait(self):
+        if not self.leader:
+            try:
+                payload = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(self.future)), self.service.wait_seconds)
+            except asyncio.TimeoutError:
+                payload = None
+            return self.service._shared(self.namespace, payload, "local")
+
+        if self.remote:
+            self.remote = False
+            try:
+                payload = await self.service._await_remote(self.key)
+            except BaseException:
+                # Cancelled while waiting on another worker: release local waiters before unwinding
+                self._resolve(_ABANDONED)
+                raise
+            if payload:
+                self._resolve(payload)
+            return self.service._shared(self.namespace, payload, "remote")
+        self.service._count(self.namespace, "leader")
+        return None
+
+    def _resolve(self, payload):
+        if self.done:
+            return
+        self.done = True
+        self.service._release_local(self.key, self.future, payload)
+
+    async def finish(self, value):
+        """Hand the leader's value to every waiter in this process and, through Redis, in the others"""
+        if not self.leader or self.done:
+            return
+        payload = orjson.dumps(value).decode()
+        self._resolve(payload)
+        if self.token:
+            await self.service._publish(self.key, self.token, payload)
+
+    async def abandon(self):
+        """Release waiters without a value; they compute it themselves"""
+        if not self.leader or self.done:
+            return
+        self._resolve(_ABANDONED)
+        if self.token:
+            await self.service._publish(self.key, self.token, _ABANDONED)
+
+
+class SingleFlightService:
+    """Coalesces identical in-flight calls so only one of them does the work.
+
+    Within a process the first caller for a key leads and later callers wait
+    on its future. Across workers the leader also takes a Redis lock
+    (`SET NX` with a TTL); a process that finds the lock held waits for the
+    result on a pub/sub channel instead, with the result also kept briefly
+    under a key for waiters that subscribe late. Every wait is bounded by
+    `single_flight_wait_seconds`, after which the caller runs the call
+    itself. Values must be JSON-serializable.
+    """
+
+    prefix = "singleflight:"
+
+    def __init__(self, redis=None):
+        self.enabled = os.getenv("single_flight_enabled", "true").lower() == "true"
+        self.distributed = os.getenv("single_flight_distributed", "true").lower() == "true"
+        self.wait_seconds = float(os.getenv("single_flight_wait_seconds", "20"))
+        self.lock_ttl_ms = int(float(os.getenv("single_flight_lock_seconds", "60")) * 1000)
+        self.result_ttl = int(os.getenv("single_flight_result_ttl", "10"))
+        self.redis = redis or RediceService()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        # leader: computed straight away; local/remote: got another caller's value;
+        # fallback: waited, then computed itself (timeout or abandoned leader)
+        self.counts = {"leader": 0, "local": 0, "remote": 0, "fallback": 0}
+
+    def _key(self, namespace, text):
+        digest = hashlib.sha1(normalize_key(text).encode()).hexdigest()
+        return f"{namespace}:{digest}"
+
+    def _count(self, namespace, outcome):
+        self.counts[outcome] += 1
+        single_flight_calls.inc(namespace=namespace, outcome=outcome)
+
+    def _shared(self, namespace, payload, outcome):
+        if not payload:
+            self._count(namespace, "fallback")
+            return None
+        self._count(namespace, outcome)
+        return orjson.loads(payload)
+
+    async def begin(self, namespace: str, text: str) -> Flight:
+        """Join the in-flight call for `text`, or lead it"""
+        key = self._key(namespace, text)
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        flight = Flight(self, namespace, key, future, leader)
+        if leader and self.distributed:
+            token = uuid.uuid4().hex
+            try:
+                if await self.redis.redis_client.set(f"{self.prefix}lock:{key}", token, nx=True, px=self.lock_ttl_ms):
+                    flight.token = token
+                else:
+                    flight.remote = True
+            except Exception as e:
+                logger.warning(f"Single-flight lock unavailable, coalescing in-process only: {str(e)}")
+            except BaseException:
+                # Cancelled before the caller got the flight, so nobody else would release it
+                flight._resolve(_ABANDONED)
+                raise
+        return flight
+
+    async def run(self, namespace: str, text: str, factory):
+        """Await `factory()` unless an identical call is already in flight, then share its value"""
+        if not self.enabled:
+            return await factory()
+        flight = await self.begin(namespace, text)
+        try:
+            value = await flight.wait()
+            if value is not None:
+                return value
+            value = await factory()
+            await flight.finish(value)
+            return value
+        finally:
+            # No-op once finished; otherwise errors and cancellation release the waiters
+            await flight.abandon()
+
+    def _release_local(self, key, future, payload):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        future.set_result(payload)
+
+    async def _await_remote(self, key):
+        """Payload published by the worker holding the lock, or None once the wait runs out"""
+        client = self.redis.redis_client
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(f"{self.prefix}done:{key}")
+            # The leader may have finished before we subscribed
+            payload = await client.get(f"{self.prefix}result:{key}")
+            if payload is not None:
+                return payload
+            deadline = asyncio.get_running_loop().time() + self.wait_seconds
+            while (remaining := deadline - asyncio.get_running_loop().time()) > 0:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+                if message is not None and message["type"] == "message":
+                    return message["data"]
+            return None
+        except Exception as e:
+            logger.warning(f"Single-flight wait on another worker failed: {str(e)}")
+            return None
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception as e:
+                logger.debug(f"Single-flight pubsub close error: {str(e)}")
+
+    async def _publish(self, key, token, payload):
+        client = self.redis.redis_client
+        lock_key = f"{self.prefix}lock:{key}"
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                if payload:
+                    pipe.set(f"{self.prefix}result:{key}", payload, ex=self.result_ttl)
+                pipe.publish(f"{self.prefix}done:{key}", payload)
+                await pipe.execute()
+            # Release the lock only while it is still ours; it may have expired and been taken over
+            async with client.pipeline(transaction=True) as pipe:
+                await pipe.watch(lock_key)
+                if await pipe.get(lock_key) == token:
+                    pipe.multi()
+                    pipe.delete(lock_key)
+                    await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Single-flight publish failed: {str(e)}")
+
+    def stats(self) -> dict:
+        coalesced = self.counts["local"] + self.counts["remote"]
+        calls = coalesced + self.counts["leader"]
+        return {
+            **self.counts,
+            "coalesced": coalesced,
+            "coalesced_rate": round(coalesced / calls, 4) if calls else 0.0,
+            "in_flight": len(self._inflight),
+        }
@@ -4,4 +4,5 @@ from langgraph.graph.message import add_messages
 
 class State(TypedDict):
     messages: Annotated[list, add_messages]
-    final_result: dict
\ No newline at end of file
+    final_result: dict
+    session_id: str
\ No newline at end of file
@@ -0,0 +1,345 @@
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+import contextvars
+import sqlalchemy as sa
+from langchain_core.messages import SystemMessage, HumanMessage
+
+logger = logging.getLogger(__name__)
+
+AGENT = "agent"
+SINGLE_SHOT = "single_shot"
+SQL_MODES = (AGENT, SINGLE_SHOT)
+
+# Per-request SQL mode; set by the endpoint, read by query_database_tool
+current_sql_mode = contextvars.ContextVar("sql_mode", default=None)
+
+PROJECTION = ("id", "shopify_id", "title")
+
+_TOKEN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<comment>--[^\n]*|\#[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")
+  | (?P<quoted>`[^`]+`)
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<op><=|>=|<>|!=|\|\||[-+*/%=<>.,();])
+""", re.X | re.S)
+
+_FORBIDDEN = {
+    "insert", "update", "delete", "replace", "merge", "drop", "alter", "create", "truncate", "rename",
+    "grant", "revoke", "call", "exec", "execute", "handler", "load", "lock", "unlock", "set", "into",
+    "outfile", "dumpfile", "load_file", "sleep", "benchmark", "get_lock", "union", "for", "procedure",
+}
+_KEYWORDS = {
+    "select", "distinct", "from", "where", "and", "or", "not", "in", "is", "null", "like", "between",
+    "join", "inner", "left", "right", "outer", "cross", "on", "as", "order", "by", "asc", "desc", "limit",
+    "offset", "group", "having", "exists", "case", "when", "then", "else", "end", "true", "false",
+    "escape", "regexp", "rlike", "collate", "interval", "binary", "all", "any", "some", "using", "with",
+}
+# Scalar and aggregate functions a product search needs; any other `name(` is rejected
+_FUNCTIONS = {
+    "lower", "upper", "lcase", "ucase", "concat", "concat_ws", "coalesce", "ifnull", "nullif", "if",
+    "abs", "round", "floor", "ceil", "ceiling", "mod", "greatest", "least",
+    "length", "char_length", "trim", "ltrim", "rtrim", "substring", "substr", "locate", "instr", "find_in_set",
+    "now", "curdate", "current_date", "date", "year", "month", "datediff",
+    "count", "min", "max", "sum", "avg",
+}
+_JOIN_STOP = {"where", "on", "using", "join", "inner", "left", "right", "outer", "cross", "order",
+              "group", "having", "limit", "offset", "union"}
+
+
+class SQLValidationError(ValueError):
+    pass
+
+
+def tokenize(sql: str):
+    """Split SQL into (kind, text) tokens; raises on characters the grammar does not know"""
+    tokens, position = [], 0
+    while position < len(sql):
+        match = _TOKEN.match(sql, position)
+        if match is None:
+            raise SQLValidationError(f"Unexpected character {sql[position]!r} at {position}")
+        kind = match.lastgroup
+        if kind == "comment":
+            raise SQLValidationError("Comments are not allowed")
+        if kind != "space":
+            text = match.group()
+            tokens.append((kind, text.strip("`") if kind == "quoted" else text))
+        position = match.end()
+    return tokens
+
+
+class TextToSQLService:
+    """Single-shot text-to-SQL with local read-only validation.
+
+    One LLM call writes a SELECT from the pruned schema context. The statement
+    is tokenized and checked locally (SELECT only, known tables and columns),
+    its projection is rewritten to the product `id, shopify_id, title`, and it
+    runs directly on the SQLAlchemy engine. Anything that fails validation is
+    reported so the caller can fall back to the SQL agent.
+    """
+
+    def __init__(self, db, llm, schema_context, engine=None):
+        self.db = db
+        self.engine = engine
+        self.llm = llm
+        self.schema_context = schema_context
+        self.default_mode = os.getenv("sql_mode", AGENT).lower()
+        self.max_rows = int(os.getenv("result_max_rows", "1000"))
+        self.product_table = schema_context.product_table
+        self.latency_ms = {mode: [0, 0.0] for mode in SQL_MODES}
+        self.fallbacks = 0
+
+    def mode(self) -> str:
+        """SQL mode for the current request: request override, then the `sql_mode` env default"""
+        mode = (current_sql_mode.get() or self.default_mode).lower()
+        return mode if mode in SQL_MODES else AGENT
+
+    def _columns(self):
+        return {
+            name: {column["name"].lower() for column in table["columns"]}
+            for name, table in self.schema_context.build().items()
+        }
+
+    def validate(self, sql: str) -> str:
+        """Check a generated statement and return it with the forced product projection"""
+        tokens = tokenize(sql.strip())
+        while tokens and tokens[-1] == ("op", ";"):
+            tokens.pop()
+        if not tokens or tokens[0][1].lower() != "select":
+            raise SQLValidationError("Only SELECT statements are allowed")
+        if ("op", ";") in tokens:
+            raise SQLValidationError("Multiple statements are not allowed")
+
+        columns = self._columns()
+        missing = set(PROJECTION) - columns.get(self.product_table, set())
+        if missing:
+            raise SQLValidationError(f"The {self.product_table} table has no {', '.join(sorted(missing))} column")
+        known_tables = {name.lower(): name for name in columns}
+        aliases, top_level_aliases, derived_names = {}, {}, set()
+        depth, from_index, limit_index = 0, None, None
+
+        # First pass: structure, forbidden words and table references with their aliases
+        for index, (kind, text) in enumerate(tokens):
+            lower = text.lower()
+            if kind == "op" and text == "(":
+                depth += 1
+            elif kind == "op" and text == ")":
+                depth -= 1
+                if depth < 0:
+                    raise SQLValidationError("Unbalanced parentheses")
+            elif kind == "word" and lower in _FORBIDDEN:
+                raise SQLValidationError(f"'{text}' is not allowed")
+            elif kind == "word" and lower == "from" and depth == 0 and from_index is None:
+                from_index = index
+            elif kind == "word" and lower == "limit" and depth == 0:
+                limit_index = index
+            elif kind == "word" and lower in ("group", "having") and depth == 0:
+                raise SQLValidationError("Aggregate statements cannot be projected to products")
+
+            previous = tokens[index - 1][1].lower() if index else ""
+            if kind in ("word", "quoted") and (previous in ("from", "join") or (previous == "," and self._in_from_list(tokens, index))):
+                if lower not in known_tables:
+                    raise SQLValidationError(f"Unknown table '{text}'")
+                alias = lower
+                following = tokens[index + 1:index + 3]
+                if following and following[0][1].lower() == "as":
+                    following = following[1:]
+                if following and following[0][0] in ("word", "quoted") and following[0][1].lower() not in _KEYWORDS | _JOIN_STOP:
+                    alias = following[0][1].lower()
+                aliases[alias] = known_tables[lower]
+                aliases[lower] = known_tables[lower]
+                if depth == 0:
+                    top_level_aliases[alias] = known_tables[lower]
+            # Names given with AS after the top-level FROM (derived tables, subquery select lists)
+            # can be referenced later, and so can derived tables named without AS. Aliases in the top-level select list cannot: the forced
+            # projection drops them, so they are rejected below as unknown columns.
+            if previous == "as" and kind in ("word", "quoted") and from_index is not None:
+                derived_names.add(lower)
+            # `(SELECT ...) name` without AS
+            elif previous == ")" and kind in ("word", "quoted") and lower not in _KEYWORDS | _JOIN_STOP:
+                derived_names.add(lower)
+        if depth != 0:
+            raise SQLValidationError("Unbalanced parentheses")
+        if from_index is None:
+            raise SQLValidationError("Statement has no FROM clause")
+
+        # The forced projection is evaluated at the top level, so the product table must be read there
+        if self.product_table not in top_level_aliases.values():
+            raise SQLValidationError(f"Statement does not read the {self.product_table} table outside a subquery")
+        product_alias = next((alias for alias, table in top_level_aliases.items()
+                              if table == self.product_table and alias != self.product_table.lower()), self.product_table)
+
+        # Second pass: every identifier must be a keyword, allowed function, table/alias or known column
+        referenced = set(aliases.values())
+        known_columns = set().union(*(columns[table] for table in referenced))
+        for index, (kind, text) in enumerate(tokens):
+            if kind not in ("word", "quoted"):
+                continue
+            lower = text.lower()
+            following = tokens[index + 1][1] if index + 1 < len(tokens) else ""
+            previous = tokens[index - 1][1] if index else ""
+            if kind == "word" and lower in _KEYWORDS:
+                continue
+            if following == "(":
+                if kind == "word" and lower in _FUNCTIONS:
+                    continue
+                raise SQLValidationError(f"Function '{text}' is not allowed")
+            if lower in aliases and following == ".":
+                column = tokens[index + 2][1].lower() if index + 2 < len(tokens) else ""
+                if column != "*" and column not in columns[aliases[lower]]:
+                    raise SQLValidationError(f"Unknown column '{text}.{column}'")
+                continue
+            if lower in aliases or lower in derived_names:
+                continue
+            if previous == ".":
+                continue
+            if lower not in known_columns:
+                raise SQLValidationError(f"Unknown column '{text}'")
+
+        # Bound what MySQL sends back however broad the question was
+        if limit_index is not None:
+            self._clamp_limit(tokens, limit_index)
+        limit = "" if limit_index is not None else f" LIMIT {self.max_rows}"
+
+        # Force the projection: everything between SELECT [DISTINCT] and the top-level FROM
+        projection = ", ".join(f"{product_alias}.{column}" for column in PROJECTION)
+        body = tokens[from_index:]
+        return f"SELECT {projection} " + self._render(body) + limit
+
+    def _clamp_limit(self, tokens, index):
+        """Lower the row count of the top-level `LIMIT n`, `LIMIT offset, n` or `LIMIT n OFFSET m` to max_rows"""
+        following = tokens[index + 1:index + 4]
+        if len(following) >= 3 and following[1] == ("op", ","):
+            count_index = index + 3
+        else:
+            count_index = index + 1
+        operands = [tokens[count_index]] if count_index < len(tokens) else []
+        if count_index == index + 3:
+            operands.append(tokens[index + 1])
+        for kind, text in operands or [("", "")]:
+            if kind != "number" or not text.isdigit():
+                raise SQLValidationError("LIMIT takes integer literals only")
+        tokens[count_index] = ("number", str(min(int(tokens[count_index][1]), self.max_rows)))
+
+    @staticmethod
+    def _in_from_list(tokens, index):
+        # A comma continues a table list when the nearest preceding clause keyword is FROM
+        for kind, text in reversed(tokens[:index]):
+            lower = text.lower()
+            if kind == "word" and lower in ("from", "join"):
+                return True
+            if kind == "word" and lower in _KEYWORDS - {"as"}:
+                return False
+        return False
+
+    @staticmethod
+    def _render(tokens) -> str:
+        parts, glue, previous = [], False, ("", "")
+        for kind, text in tokens:
+            # MySQL only treats `name(` without a space as a function call
+            call = text == "(" and previous[0] == "word" and previous[1].lower() not in _KEYWORDS
+            previous = (kind, text)
+            if kind == "quoted":
+                text = f"`{text}`"
+            elif kind == "string":
+                # sa.text would read ':name' inside a literal as a bind parameter
+                text = text.replace(":", "\\:")
+            if parts and (glue or call or (kind == "op" and text in (",", ")", "."))):
+                parts[-1] += text
+            else:
+                parts.append(text)
+            glue = kind == "op" and text in ("(", ".")
+        return " ".join(parts)
+
+    def _prompt(self, question: str):
+        schema = self.schema_context.render(question)
+        return [
+            SystemMessage(content=(
+                f"You write one {self.db.dialect} SELECT statement answering a shopper's catalog question.\n"
+                f"Use only these tables and columns:\n{schema}\n"
+                f"The statement must read from the {self.product_table} table and select "
+                f"{', '.join(PROJECTION)} of the matching products.\n"
+                "Match several similar keywords with LIKE so every relevant product is returned. Do not use LIMIT.\n"
+                f"The only functions you may call are {', '.join(sorted(f.upper() for f in _FUNCTIONS))}.\n"
+                "Reply with the SQL statement only, no explanation."
+            )),
+            HumanMessage(content=question),
+        ]
+
+    @staticmethod
+    def _extract_sql(content: str) -> str:
+        fenced = re.search(r"```(?:sql)?\s*([\s\S]*?)```", content, re.I)
+        sql = fenced.group(1) if fenced else content
+        start = re.search(r"\bselect\b", sql, re.I)
+        return sql[start.start():].strip() if start else sql.strip()
+
+    def _execute(self, sql: str):
+        cache = getattr(self.db, "result_cache", None)
+        key = cache.key(sql, "text_to_sql") if cache is not None and cache.enabled else None
+        if key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return json.loads(cached)
+
+        rows, seen = [], set()
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(sa.text(sql))
+            for row in result:
+                # Joins to variants repeat a product once per matching variant
+                if row[0] in seen:
+                    continue
+                seen.add(row[0])
+                rows.append([row[0], row[1], row[2]])
+                if len(rows) >= self.max_rows:
+                    break
+        if key is not None:
+            cache.set(key, json.dumps(rows))
+        return rows
+
+    def run(self, sql: str):
+        """Validate and run a statement written elsewhere (e.g. by the SQL agent); returns (sql, rows)"""
+        sql = self.validate(sql)
+        return sql, self._execute(sql)
+
+    async def agenerate(self, question: str):
+        """Generate, validate and run a statement; returns the tool payload or None to fall back"""
+        start = time.perf_counter()
+        raw = ""
+        try:
+            messages = await asyncio.to_thread(self._prompt, question)
+            raw = self._extract_sql((await self.llm.ainvoke(messages)).content)
+            sql = self.validate(raw)
+            rows = await asyncio.to_thread(self._execute, sql)
+        except SQLValidationError as e:
+            logger.warning(f"Single-shot SQL rejected ({str(e)}): {raw[:120]}")
+            self.fallbacks += 1
+            return None
+        except Exception as e:
+            logger.error(f"Single-shot SQL failed: {str(e)}", exc_info=True)
+            self.fallbacks += 1
+            return None
+        self.record(SINGLE_SHOT, (time.perf_counter() - start) * 1000)
+        return {
+            "query": sql,
+            "result": rows,
+            "message": "" if rows else "No products matched the query.",
+        }
+
+    def record(self, mode: str, elapsed_ms: float):
+        self.latency_ms[mode][0] += 1
+        self.latency_ms[mode][1] += elapsed_ms
+
+    def stats(self) -> dict:
+        return {
+            "default_mode": self.default_mode,
+            "fallbacks": self.fallbacks,
+            "modes": {
+                mode: {"queries": count, "avg_ms": round(total / count, 1) if count else 0.0}
+                for mode, (count, total) in self.latency_ms.items()
+            },
+        }
@@ -0,0 +1,19 @@
+import pytest
+
+from benchmarks.fake_redis import FakeRedisServer
+from src.main.service.agent_service.RedisService import RediceService
+
+
+@pytest.fixture
+def redis_server():
+    server = FakeRedisServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def redis(redis_server):
+    """RediceService connected to the test's fake Redis"""
+    service = RediceService()
+    service.redis_url = redis_server.url
+    return service
@@ -0,0 +1,144 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+import sqlalchemy as sa
+
+from benchmarks.fixture_catalog import build
+from src.main.repository.AgentRepository import ProductRepository as CatalogProductRepository
+
+from src.main.service.ProductIndexService import ProductIndexService
+
+
+@pytest.fixture(autouse=True)
+def no_background_threads(monkeypatch):
+    # search() schedules refreshes; keep them out of these tests
+    monkeypatch.setattr(ProductIndexService, "refresh_in_background", lambda self: False)
+
+
+class HashEmbedding:
+    """Deterministic unit vectors so the tests need no sentence-transformers model"""
+
+    def encode(self, texts):
+        vectors = np.stack([np.random.default_rng(abs(hash(text)) % 2 ** 32).random(8) for text in texts])
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors.astype(np.float32)
+
+
+class ProductRepository:
+    def __init__(self, products):
+        self.products = products  # id -> updated_at
+
+    def get_product_ids(self):
+        return set(self.products)
+
+    def iter_product_batches(self, batch_size=500, since=None):
+        rows = [({"id": product_id, "shopify_id": f"gid://{product_id}", "title": f"product {product_id}",
+                  "updated_at": updated_at}, [{"updated_at": updated_at}])
+                for product_id, updated_at in sorted(self.products.items()) if since is None or updated_at >= since]
+        for start in range(0, len(rows), batch_size):
+            yield rows[start:start + batch_size]
+
+
+class ModelRepository:
+    def __init__(self):
+        self.saved = []
+
+    def save_model(self, name, model_blob, watermark=None, meta=None):
+        self.saved.append((model_blob, meta, watermark))
+        return True
+
+    def load_latest_model(self, name):
+        return self.saved[-1] if self.saved else (None, None, None)
+
+
+def _service(products, models=None, redis_server=None):
+    service = ProductIndexService()
+    if redis_server is not None:
+        service.redis_url = redis_server.url
+    service.embedding = HashEmbedding()
+    service._product_repository = ProductRepository(products)
+    service._model_repository = models or ModelRepository()
+    return service
+
+
+def test_snapshot_round_trip_without_pickle():
+    products = {1: datetime(2024, 1, 1), 2: datetime(2024, 1, 2)}
+    builder = _service(products)
+    assert builder.refresh(full=True) == 2
+
+    blob, meta, watermark = builder.model_repository.saved[-1]
+    assert isinstance(blob, bytes) and not blob.startswith(b"\x80")
+    assert watermark == datetime(2024, 1, 2)
+
+    loader = _service(products, builder.model_repository)
+    assert loader.load()
+    assert loader._watermark == datetime(2024, 1, 2)
+    assert loader._products == builder._products
+    assert loader._index.ntotal == 2
+    assert sorted(row[0] for row in loader.search("product 1", k=5)) == [1, 2]
+
+
+def test_snapshot_without_meta_is_ignored():
+    models = ModelRepository()
+    models.saved.append((b"\x80\x04legacy pickle", None, None))
+    assert not _service({}, models).load()
+
+
+def test_warm_leaves_the_build_to_one_worker(monkeypatch, redis_server):
+    monkeypatch.setattr(ProductIndexService, "refresh_in_background", ProductIndexService._background_refresh)
+    products = {1: datetime(2024, 1, 1), 2: datetime(2024, 1, 2)}
+    models = ModelRepository()
+    workers = [_service(products, models, redis_server) for _ in range(3)]
+
+    # Another worker is mid-build: nobody else embeds or saves
+    workers[0].redis.set(ProductIndexService.build_lock_key, "other")
+    for worker in workers:
+        worker.warm()
+    assert not models.saved and all(worker._index is None for worker in workers)
+
+    # The lock is free again: the first retry builds and saves once, the rest load that snapshot
+    workers[0].redis.delete(ProductIndexService.build_lock_key)
+    for worker in workers:
+        worker._background_refresh()
+    assert len(models.saved) == 1
+    assert all(worker._index.ntotal == 2 for worker in workers)
+    assert workers[0].redis.get(ProductIndexService.build_lock_key) is None
+
+
+def test_incremental_refreshes_save_once_per_interval(redis_server):
+    products = {1: datetime(2024, 1, 1)}
+    models = ModelRepository()
+    workers = [_service(products, models, redis_server) for _ in range(3)]
+    workers[0].refresh(full=True)
+    for worker in workers[1:]:
+        assert worker.load()
+
+    products[2] = datetime(2024, 1, 3)
+    for worker in workers:
+        assert worker.refresh()
+    assert len(models.saved) == 2
+    assert all(worker._index.ntotal == 2 for worker in workers)
+
+
+def test_refresh_picks_up_watermark_ties_and_drops_deleted_products(tmp_path, redis_server):
+    engine = build(f"sqlite:///{tmp_path / 'catalog.db'}", products=20)
+    repository = CatalogProductRepository.__new__(CatalogProductRepository)
+    repository.engine = engine
+    service = _service({}, redis_server=redis_server)
+    service._product_repository = repository
+
+    assert service.refresh(full=True) == 20
+    watermark = service._watermark
+    with engine.begin() as conn:
+        # Written after the refresh, but stamped with the watermark it already read
+        products = sa.Table("products", sa.MetaData(), autoload_with=conn)
+        conn.execute(products.update().where(products.c.id == 3).values(title="renamed", updated_at=watermark))
+        conn.execute(sa.text("DELETE FROM variants WHERE product_id = 4"))
+        conn.execute(sa.text("DELETE FROM products WHERE id = 4"))
+
+    assert service.refresh()
+    assert service._products[3][1] == "renamed"
+    assert 4 not in service._products
+    assert service._index.ntotal == 19
+    assert 4 not in [row[0] for row in service.search("anything", k=20)]
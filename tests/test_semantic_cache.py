@@ -0,0 +1,66 @@
+import zlib
+
+import numpy as np
+import pytest
+
+from src.main.service.agent_service.SemanticCacheService import SemanticCacheService, filter_signature
+
+
+class BagOfWordsEmbedding:
+    """Stand-in encoder at its worst: numbers, sizes, colors and price bounds do not move the vector"""
+
+    dimension = 64
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.split():
+                if filter_signature(word):
+                    continue
+                vectors[row, zlib.crc32(word.encode()) % self.dimension] += 1
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def cache():
+    cache = SemanticCacheService()
+    cache.embedding = BagOfWordsEmbedding()
+    return cache
+
+
+@pytest.mark.parametrize("query, other", [
+    ("shoes under $50", "shoes under $500"),
+    ("shoes under $50", "shoes over $50"),
+    ("running shoes size 9", "running shoes size 10"),
+    ("red dress", "blue dress"),
+    ("jacket size m", "jacket size xl"),
+    ("sneakers", "sneakers under 100"),
+])
+def test_different_filters_miss(cache, query, other):
+    cache.store(query, {"result": [[1, 1, query]]})
+    assert cache.lookup(other) is None
+    assert cache.filter_mismatches == 1
+
+
+@pytest.mark.parametrize("query, other", [
+    ("shoes under $50", "Shoes under 50!"),
+    ("shoes under $50", "shoes under $50.00"),
+    ("red dress size 9", "size 9 dress, red"),
+])
+def test_same_filters_hit(cache, query, other):
+    payload = {"result": [[1, 1, query]]}
+    cache.store(query, payload)
+    assert cache.lookup(other) == payload
+
+
+def test_nearest_entry_with_matching_filters_wins(cache):
+    cache.store("shoes under $50", {"result": [[50, 50, "cheap"]]})
+    cache.store("shoes under $500", {"result": [[500, 500, "pricey"]]})
+    assert cache.lookup("shoes under $500") == {"result": [[500, 500, "pricey"]]}
+    assert cache.lookup("shoes under $50") == {"result": [[50, 50, "cheap"]]}
+
+
+def test_filter_signature():
+    assert filter_signature("shoes under $1.5k") == ("#1500", "<")
+    assert filter_signature("black boots size 10") == ("#10", "black", "size")
+    assert filter_signature("comfortable boots") == ()
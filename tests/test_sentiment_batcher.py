@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.main.service.SentimentService.SentimentService import SentimentBatcher
+
+
+class GatedPredict:
+    """Stand-in model whose first batch blocks until released"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        self.started.set()
+        self.release.wait(5)
+        return [{"label": "5 stars", "score": float(len(text))} for text in texts]
+
+
+def test_cancelled_future_does_not_stop_the_worker():
+    predict = GatedPredict()
+    batcher = SentimentBatcher(predict, max_batch_size=4, max_wait_ms=1)
+
+    first = batcher.submit("a")
+    assert predict.started.wait(5)
+    # Queued while the first batch runs, then given up on by its caller
+    cancelled = batcher.submit("bb")
+    assert cancelled.cancel()
+    predict.release.set()
+
+    assert first.result(5)["score"] == 1.0
+    assert batcher.submit("ccc").result(5)["score"] == 3.0
+    assert ["bb"] not in predict.batches
+    assert batcher._thread.is_alive()
+
+
+def test_cancelled_ascore_leaves_the_batcher_usable():
+    predict = GatedPredict()
+    batcher = SentimentBatcher(predict, max_batch_size=4, max_wait_ms=1)
+
+    async def scenario():
+        blocker = batcher.submit("a")
+        assert await asyncio.to_thread(predict.started.wait, 5)
+        waiting = asyncio.ensure_future(asyncio.wrap_future(batcher.submit("bb")))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.sleep(0)
+        predict.release.set()
+        await asyncio.wrap_future(blocker)
+        return await asyncio.wait_for(asyncio.wrap_future(batcher.submit("ccc")), 5)
+
+    assert asyncio.run(scenario())["score"] == 3.0
+
+
+def test_bad_model_output_fails_the_batch_not_the_worker():
+    calls = []
+
+    def predict(texts):
+        calls.append(texts)
+        # Fewer results than texts on the first call
+        return [] if len(calls) == 1 else [{"label": "1 star", "score": 1.0} for _ in texts]
+
+    batcher = SentimentBatcher(predict, max_batch_size=4, max_wait_ms=1)
+    with pytest.raises(ValueError):
+        batcher.submit("a").result(5)
+    assert batcher.submit("b").result(5)["label"] == "1 star"
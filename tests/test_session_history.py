@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+
+from src.main.service.agent_service.SessionHistoryService import SessionHistoryService
+
+
+def _service(redis, max_turns=20, max_messages=40):
+    service = SessionHistoryService(redis)
+    service.max_turns = max_turns
+    service.max_messages = max_messages
+    return service
+
+
+def _tool_turn(n):
+    call_id = f"call-{n}"
+    return [
+        HumanMessage(content=f"question {n}"),
+        AIMessage(content="", tool_calls=[{"name": "search", "args": {"q": n}, "id": call_id}]),
+        ToolMessage(content="[]", tool_call_id=call_id, name="search"),
+        AIMessage(content=f"answer {n}"),
+    ]
+
+
+def _assert_whole_turns(messages):
+    assert isinstance(messages[0], HumanMessage)
+    calls = {call["id"] for message in messages if isinstance(message, AIMessage) for call in message.tool_calls}
+    assert all(message.tool_call_id in calls for message in messages if isinstance(message, ToolMessage))
+
+
+def test_turn_cap_keeps_whole_turns(redis):
+    service = _service(redis, max_turns=3)
+
+    async def scenario():
+        for n in range(5):
+            await service.append("s", _tool_turn(n))
+        return await service.load("s")
+
+    messages = asyncio.run(scenario())
+    _assert_whole_turns(messages)
+    assert [m.content for m in messages if isinstance(m, HumanMessage)] == ["question 2", "question 3", "question 4"]
+
+
+def test_message_budget_drops_oldest_whole_turns(redis):
+    # 10 messages allow two 4-message turns, not two and a half
+    service = _service(redis, max_messages=10)
+
+    async def scenario():
+        for n in range(4):
+            await service.append("s", _tool_turn(n))
+        return await service.load("s")
+
+    messages = asyncio.run(scenario())
+    _assert_whole_turns(messages)
+    assert len(messages) == 8
+    assert messages[0].content == "question 2"
+
+
+def test_legacy_history_is_migrated(redis):
+    service = _service(redis)
+    legacy = [
+        {"type": "ai", "content": "orphan"},
+        {"type": "human", "content": "red dress"},
+        {"type": "ai", "content": "", "tool_calls": [{"name": "search", "args": {}, "id": "x"}]},
+        {"type": "ai", "content": "found 3"},
+        {"type": "unknown", "content": "?"},
+    ]
+
+    async def scenario():
+        await service.redis.set("s", json.dumps(legacy))
+        first = await service.load("s")
+        await service.append("s", [HumanMessage(content="in blue"), AIMessage(content="found 1")])
+        second = await service.load("s")
+        return first, second, await service.redis.get("s")
+
+    first, second, leftover = asyncio.run(scenario())
+    assert [m.content for m in first] == ["red dress", "", "found 3"]
+    assert not any(m.tool_calls for m in first if isinstance(m, AIMessage))
+    assert [m.content for m in second] == ["red dress", "", "found 3", "in blue", "found 1"]
+    assert leftover is None
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from src.main.api.shop_handlers import JSON_ROUTES, STREAM_ROUTES, respond, open_stream
+
+HANDLERS = {name: handler for _, name, handler in JSON_ROUTES + STREAM_ROUTES}
+
+
+@pytest.mark.parametrize("name, data, error", [
+    ("Grog_Agent", {}, "Missing query"),
+    ("Grog_Agent", None, "Missing query"),
+    ("Grog_Agent", ["not", "an", "object"], "Missing query"),
+    ("Grog_Agent", {"query": "x", "sql_mode": "nope"}, "Unknown sql_mode"),
+    ("Grog_Agent_Query", {"query": ""}, "Missing query"),
+    ("Grog_Agent_page", {}, "Missing cursor"),
+    ("Grog_Agent_page", {"cursor": ["c"]}, "cursor must be a string"),
+    ("Grog_Agent_page", {"cursor": "c", "page_size": "abc"}, "page_size must be a positive integer"),
+    ("Grog_Agent_page", {"cursor": "c", "page_size": [10]}, "page_size must be a positive integer"),
+    ("Grog_Agent_page", {"cursor": "c", "page_size": 0}, "page_size must be a positive integer"),
+])
+def test_json_validation(name, data, error):
+    body, status = asyncio.run(respond(name, HANDLERS[name], data))
+    assert status == 400
+    assert body["error"].startswith(error)
+
+
+@pytest.mark.parametrize("name, data, error", [
+    ("Grog_Agent_stream", {}, "Missing query"),
+    ("Grog_Agent_stream", {"query": "x", "enrich": 5}, "enrich must be"),
+    ("Grog_Agent_Query_batch", {"queries": []}, "Missing queries"),
+    ("Grog_Agent_Query_batch", {"queries": ["a", ""]}, "queries must be non-empty strings"),
+    ("Grog_Agent_Query_batch", {"queries": ["a"], "concurrency": True}, "concurrency must be a positive integer"),
+])
+def test_stream_validation_fails_before_streaming(name, data, error):
+    frames, (body, status) = open_stream(name, HANDLERS[name], data)
+    assert frames is None
+    assert status == 400
+    assert body["error"].startswith(error)
+
+
+def test_stream_errors_become_error_events():
+    async def failing(data):
+        yield "item", {}
+        raise RuntimeError("boom")
+
+    async def collect():
+        frames, error = open_stream("Grog_Agent_stream", failing, {})
+        assert error is None
+        return [frame async for frame in frames]
+
+    frames = asyncio.run(collect())
+    assert frames[0].startswith("event: item")
+    assert frames[-1].startswith("event: error") and "boom" in frames[-1]
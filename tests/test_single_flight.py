@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from src.main.service.agent_service.SingleFlightService import SingleFlightService
+
+
+def _service(redis, distributed=True):
+    service = SingleFlightService(redis)
+    service.distributed = distributed
+    service.wait_seconds = 5
+    return service
+
+
+async def _drain():
+    # Let spawned tasks reach their first await
+    for _ in range(20):
+        await asyncio.sleep(0.01)
+
+
+def test_leader_cancelled_while_waiting_on_another_worker(redis):
+    service = _service(redis)
+
+    async def scenario():
+        # Another worker holds the lock, so this process's leader waits on pub/sub
+        await service.redis.redis_client.set(f"{service.prefix}lock:{service._key('sql', 'q')}", "other")
+
+        async def call():
+            flight = await service.begin("sql", "q")
+            return await flight.wait()
+
+        leader = asyncio.create_task(call())
+        await _drain()
+        waiter = asyncio.create_task(call())
+        await _drain()
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        # The local waiter is released straight away and falls back to running the call itself
+        assert await asyncio.wait_for(waiter, 1) is None
+        assert service._inflight == {}
+
+    asyncio.run(scenario())
+
+
+def test_run_cancelled_in_factory_releases_the_key(redis):
+    service = _service(redis, distributed=False)
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(10)
+
+        task = asyncio.create_task(service.run("sql", "q", slow))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert service._inflight == {}
+
+        async def fast():
+            return {"rows": 1}
+
+        assert await service.run("sql", "q", fast) == {"rows": 1}
+        assert service.counts["fallback"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_run_shares_the_leaders_value(redis):
+    service = _service(redis)
+    calls = []
+
+    async def scenario():
+        async def factory():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"rows": [1, 2]}
+
+        results = await asyncio.gather(*(service.run("sql", "Q", factory) for _ in range(5)))
+        assert results == [{"rows": [1, 2]}] * 5
+        assert len(calls) == 1
+        assert service._inflight == {}
+
+    asyncio.run(scenario())
@@ -0,0 +1,111 @@
+import pytest
+
+from src.main.service.agent_service.TextToSQLService import SQLValidationError, TextToSQLService
+
+
+class SchemaContext:
+    product_table = "products"
+
+    def __init__(self, tables=None):
+        self.tables = tables or {
+            "products": ("id", "shopify_id", "title", "vendor", "product_type", "status", "updated_at"),
+            "variants": ("id", "product_id", "price", "color", "inventory_quantity", "sku"),
+        }
+
+    def build(self):
+        return {name: {"columns": [{"name": column} for column in columns]} for name, columns in self.tables.items()}
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("result_max_rows", "100")
+    return TextToSQLService(db=None, llm=None, schema_context=SchemaContext())
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM products WHERE vendor = 'Acme'",
+     "SELECT products.id, products.shopify_id, products.title FROM products WHERE vendor = 'Acme' LIMIT 100"),
+    ("select p.title from products p join variants v on v.product_id = p.id where v.price < 50;",
+     "SELECT p.id, p.shopify_id, p.title from products p join variants v on v.product_id = p.id "
+     "where v.price < 50 LIMIT 100"),
+    ("SELECT DISTINCT p.id FROM products AS p, variants AS v WHERE v.product_id = p.id",
+     "SELECT p.id, p.shopify_id, p.title FROM products AS p, variants AS v WHERE v.product_id = p.id LIMIT 100"),
+    ("SELECT id FROM products WHERE LOWER(title) LIKE '%shirt%' AND ROUND(id) > 0",
+     "SELECT products.id, products.shopify_id, products.title FROM products WHERE LOWER(title) LIKE '%shirt%' "
+     "AND ROUND(id) > 0 LIMIT 100"),
+])
+def test_forced_projection(service, sql, expected):
+    assert service.validate(sql) == expected
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT p.id FROM products p WHERE p.id IN (SELECT product_id FROM variants WHERE color = 'red')",
+    "SELECT p.id FROM products p WHERE EXISTS (SELECT 1 FROM variants v WHERE v.product_id = p.id AND v.price > 10)",
+    "SELECT p.id FROM products p JOIN (SELECT product_id, MIN(price) AS low FROM variants GROUP BY product_id) AS cheap "
+    "ON cheap.product_id = p.id WHERE cheap.low < 20",
+    "SELECT p.id FROM products p JOIN (SELECT product_id FROM variants WHERE sku LIKE 'A%') s ON s.product_id = p.id",
+])
+def test_subqueries_and_derived_tables(service, sql):
+    assert service.validate(sql).startswith("SELECT p.id, p.shopify_id, p.title FROM products p ")
+    assert service.validate(sql).endswith(" LIMIT 100")
+
+
+@pytest.mark.parametrize("sql, error", [
+    ("SELECT id FROM customers", "Unknown table 'customers'"),
+    ("SELECT p.id FROM products p JOIN orders o ON o.product_id = p.id", "Unknown table 'orders'"),
+    ("SELECT id FROM products WHERE id IN (SELECT product_id FROM secrets)", "Unknown table 'secrets'"),
+    ("SELECT id FROM products; DROP TABLE products", "Multiple statements"),
+    ("SELECT id FROM products; SELECT id FROM variants", "Multiple statements"),
+    ("SELECT id FROM products -- WHERE status = 'active'", "Comments"),
+    ("SELECT id FROM products /* hint */ WHERE id = 1", "Comments"),
+    ("SELECT id FROM products # trailing", "Comments"),
+    ("SELECT id FROM products UNION SELECT id FROM variants", "'UNION' is not allowed"),
+    ("SELECT id FROM products WHERE id IN (SELECT id FROM variants UNION ALL SELECT 1)", "'UNION' is not allowed"),
+    ("DELETE FROM products", "Only SELECT"),
+    ("SELECT id INTO OUTFILE '/tmp/x' FROM products", "'INTO' is not allowed"),
+    ("SELECT v.id FROM variants v", "does not read the products table"),
+    ("SELECT id FROM variants WHERE product_id IN (SELECT id FROM products)", "does not read the products table"),
+    ("SELECT p.cost FROM products p", "Unknown column 'p.cost'"),
+    ("SELECT title AS name FROM products ORDER BY name", "Unknown column 'name'"),
+    ("SELECT vendor, COUNT(*) FROM products GROUP BY vendor", "Aggregate"),
+    ("SELECT id FROM products WHERE (id = 1", "Unbalanced"),
+    ("SELECT 1", "no FROM"),
+    ("SELECT id FROM products WHERE MASTER_POS_WAIT('bin.000001', 4, 60) IS NULL", "Function 'MASTER_POS_WAIT'"),
+    ("SELECT id FROM products WHERE IS_FREE_LOCK('a') = RELEASE_ALL_LOCKS()", "Function 'IS_FREE_LOCK'"),
+    ("SELECT id FROM products WHERE title = REPEAT('a', 999999999)", "Function 'REPEAT'"),
+    ("SELECT id FROM products WHERE title = LOWER(REPEAT('a', 9))", "Function 'REPEAT'"),
+    ("SELECT id FROM products WHERE `title`('a') = 1", "Function 'title'"),
+])
+def test_rejected(service, sql, error):
+    with pytest.raises(SQLValidationError, match=error):
+        service.validate(sql)
+
+
+@pytest.mark.parametrize("sql, limit", [
+    ("SELECT id FROM products", "LIMIT 100"),
+    ("SELECT id FROM products LIMIT 5", "LIMIT 5"),
+    ("SELECT id FROM products LIMIT 100000", "LIMIT 100"),
+    ("SELECT id FROM products LIMIT 20, 5000", "LIMIT 20, 100"),
+    ("SELECT id FROM products LIMIT 5000 OFFSET 20", "LIMIT 100 OFFSET 20"),
+])
+def test_limit_clamped_to_max_rows(service, sql, limit):
+    validated = service.validate(sql)
+    assert validated.endswith(limit)
+    assert validated.count("LIMIT") == 1
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT id FROM products LIMIT 2.5",
+    "SELECT id FROM products LIMIT id",
+    "SELECT id FROM products LIMIT",
+])
+def test_limit_must_be_an_integer(service, sql):
+    with pytest.raises(SQLValidationError, match="LIMIT"):
+        service.validate(sql)
+
+
+def test_projection_columns_checked_against_product_table():
+    schema = SchemaContext({"products": ("id", "title"), "variants": ("id", "product_id")})
+    service = TextToSQLService(db=None, llm=None, schema_context=schema)
+    with pytest.raises(SQLValidationError, match="has no shopify_id column"):
+        service.validate("SELECT id FROM products")
@@ -1,3 +1,5 @@
 from app import create_app
+from src.main.common.WorkerLifecycle import preload_enabled
 
-app = create_app() 
\ No newline at end of file
+# When gunicorn preloads this module in the master, warming waits for post_fork
+app = create_app(warm=not preload_enabled())
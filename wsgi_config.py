@@ -1,14 +1,32 @@
-import multiprocessing
+import gc
+from src.main.repository.db_connector import web_concurrency
+from src.main.common.WorkerLifecycle import preload_enabled, freeze_shared_state, prepare_worker
 
-workers = max(multiprocessing.cpu_count() - 2, 1)
+# Shared with the DB engine registry, which splits the connection budget across the workers
+workers, threads = web_concurrency()
 
 bind = "0.0.0.0:8000"
 
 worker_class = "gthread"
-threads = 2
 
 timeout = 120
 
+# Import LangChain/LangGraph and the app once in the master; workers share those pages copy-on-write.
+# DB, Redis and LLM clients are only created after fork (see prepare_worker).
+preload_app = preload_enabled()
+if preload_app:
+    # No collections while the master imports, so long-lived objects are not scattered across freed pages
+    gc.disable()
+
 loglevel = "info"
 accesslog = "-"
 errorlog = "-"
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        freeze_shared_state()
+
+
+def post_fork(server, worker):
+    prepare_worker()